@@ -5,9 +5,50 @@ Wrapper around common google drive (pydrive) api calls
 for uploading and downloading
 """
 
+import importlib
+
 __version__ = "0.0.2"
 __author__ = "Kevin Yu"
 __credits__ = "Theunissen Lab, UC Berkeley"
 
 
-from .access import GDriveCommands
+# The public names and the modules they live in. Modules are only imported when one of their
+# names is first used, so importing the package (e.g. just for MetadataCache) doesn't load
+# pydrive2 and googleapiclient.
+_EXPORTS = {
+    "GDriveCommands": "access",
+    "AsyncGDriveCommands": "aio",
+    "BatchResult": "batch",
+    "MetadataBatch": "batch",
+    "BlobStore": "blobstore",
+    "MetadataCache": "cache",
+    "ChecksumCache": "checksum",
+    "Metrics": "metrics",
+    "PlannedUpload": "plan",
+    "UploadAction": "plan",
+    "UploadPlan": "plan",
+    "FileRecord": "records",
+    "TransferReport": "report",
+    "TransferResult": "report",
+    "TransferStatus": "report",
+    "DriveSnapshot": "snapshot",
+    "SyncAction": "sync",
+    "SyncDirection": "sync",
+    "SyncItem": "sync",
+    "SyncPlan": "sync",
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module("." + _EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_EXPORTS))
+
+
+__all__ = list(_EXPORTS)
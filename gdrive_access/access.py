@@ -1,16 +1,36 @@
+import collections
+import concurrent.futures
+import datetime
 import enum
-import hashlib
+import functools
 import logging
 import glob
+import hashlib
+import io
 import os
+import threading
 import time
 
 from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
 from pydrive2.files import GoogleDriveFile
 
+from .batch import MetadataBatch
+from .blobstore import BlobStore
+from . import bundle
+from .cache import MetadataCache, PathCache
+from .checksum import ChecksumCache, md5_file, md5_many
 from .display import *
+from .metrics import Metrics
 from .errors import CredentialsNotFound, FileExists, FolderExists, MultipleFilesError, NotFoundError
+from .plan import PlannedUpload, UploadAction, UploadPlan
+from .ratelimit import RequestScheduler
+from .records import FileRecord
+from . import resumable
+from .stream import DEFAULT_BLOCK_SIZE, DriveFileReader
+from .snapshot import FOLDER_MIME_TYPE, SHORTCUT_MIME_TYPE, SNAPSHOT_FIELDS, DriveSnapshot, is_folder
+from . import sync
+from .report import TransferReport, TransferResult, TransferStatus
 
 
 def get_auth(settings_file="settings.yaml", webauth=False):
@@ -23,12 +43,101 @@ def get_auth(settings_file="settings.yaml", webauth=False):
 
 
 def _md5(file_):
-    with open(file_, "rb") as f:
-        return hashlib.md5(f.read()).hexdigest()
+    return md5_file(file_)
+
+
+def _quote(value):
+    """Escape a string for use inside a quoted google drive query"""
+    return value.replace("\\", "\\\\").replace("'", "\\'")
+
+
+def _filter_clauses(mime_type=None, modified_after=None, title_prefix=None):
+    """Google drive query clauses for the filters of iter_ls() and walk()"""
+    clauses = []
+    if mime_type is not None:
+        mime_types = [mime_type] if isinstance(mime_type, str) else list(mime_type)
+        clauses.append("({})".format(" or ".join("mimeType = '{}'".format(_quote(m)) for m in mime_types)))
+    if modified_after is not None:
+        clauses.append("modifiedDate > '{}'".format(_rfc3339(modified_after)))
+    if title_prefix is not None:
+        # "contains" matches title prefixes (of words); the exact check is done client side
+        clauses.append("title contains '{}'".format(_quote(title_prefix)))
+    return clauses
+
+
+def _matches_filters(file_, mime_type=None, modified_after=None, title_prefix=None):
+    """Client side check of the filters of iter_ls() and walk()"""
+    if mime_type is not None:
+        if file_["mimeType"] not in ([mime_type] if isinstance(mime_type, str) else list(mime_type)):
+            return False
+    if modified_after is not None and not file_["modifiedDate"] > _rfc3339(modified_after):
+        return False
+    return title_prefix is None or file_["title"].startswith(title_prefix)
+
+
+def _rfc3339(date):
+    """Format a datetime as google drive expects in queries (naive datetimes are taken as UTC)"""
+    if isinstance(date, str):
+        return date
+    if date.tzinfo is not None:
+        date = date.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return date.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def _item_fields(fields, required=()):
+    """Partial response fields for a files.list query that returns fields (plus required) of each item"""
+    if isinstance(fields, str):
+        fields = [f.strip() for f in fields.split(",")]
+    fields = list(fields) + [f for f in required if f not in fields]
+    return "nextPageToken,items({})".format(",".join(fields))
+
+
+def _timed(method_name):
+    """Record the duration of every call of a GDriveCommands method in the method_seconds histogram"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.timer("method_seconds", method=method_name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _local_tree(local_folder_path):
+    """Map every folder under local_folder_path to the files directly inside it
+
+    Folders are keyed by their path relative to local_folder_path as a tuple of
+    folder names (the top folder is ()). Hidden files are skipped, like glob("*").
+    """
+    tree = {}
+
+    def walk(path, rel_path):
+        tree[rel_path] = []
+        for content in sorted(glob.glob(os.path.join(path, "*"))):
+            if os.path.isdir(content):
+                walk(content, rel_path + (os.path.basename(content),))
+            else:
+                tree[rel_path].append(content)
+
+    walk(local_folder_path, ())
+    return tree
 
 
 logger = logging.getLogger()
-logging.basicConfig()
+
+# GoogleAuth objects (credentials and drive api service) by settings file, shared by every
+# GDriveCommands in the process so each settings file is only authenticated once
+_auths = {}
+_auths_lock = threading.Lock()
+
+
+# Names per query and the most candidates fetched when find() resolves several levels at once
+# (the most files that a files.list request can return)
+_TITLES_PER_QUERY = 20
+_MAX_PATH_CANDIDATES = 1000
+
+# Seconds by which the local clock may differ from google drive's when checking an empty cached listing
+_CLOCK_SKEW = 60
 
 
 class RootDrive(GoogleDriveFile):
@@ -54,6 +163,10 @@ class GDriveCommands(object):
     # Initialize the object and authenticate
     g = GDriveCommands()
 
+    # Or use it as a context manager to shut down its hashing processes when done (see close())
+    with GDriveCommands() as g:
+        ...
+
     List root directory
     ===================
     g.ls_root() -> List[pydrive2.files.GoogleDriveFile]
@@ -71,12 +184,42 @@ class GDriveCommands(object):
     g.exists(GDRIVE_DIRECTORY, *path_elements) -> bool
     g.exists(*path_elements) -> bool
 
+    # Look up many paths together, listing each folder they go through once
+    g.find_many([path_elements1, path_elements2, ...], root=GDRIVE_DIRECTORY) -> {path: GDRIVE_FILE or None}
+    g.exists_many([path_elements1, path_elements2, ...]) -> {path: bool}
+
+    # Stream large folders page by page, with only some fields and server side filters
+    g.iter_ls(*path_elements, fields="id,title,fileSize", mime_type="audio/wav") -> generator of GDRIVE_FILEs
+    g.walk(*path_elements) -> generator of (path, folders, files) like os.walk
+
+    # Index a whole folder tree with concurrent listings; the snapshot answers
+    # find/ls/exists/walk without further api calls
+    snapshot = g.snapshot(GDRIVE_DIRECTORY, max_workers=8)
+    snapshot.find(*path_elements) -> GDRIVE_FILE/GDRIVE_DIRECTORY
+
+    # Resolved paths are cached for cache_ttl seconds, and folder listings can be shared
+    # between processes with metadata_cache (see GDriveCommands.__init__)
+    g.clear_cache()
+
     Download Files
     ==============
     g.download_file(GDRIVE_FILE, local_path, overwrite=g.Overwrite.NEVER)
     g.download_files([GDRIVE_FILE1, GDRIVE_FILE2, ...], local_folder_path, overwrite=g.Overwrite.NEVER)
     g.download_folder(GDRIVE_DIRECTORY, local_folder_path)
 
+    # Bulk downloads can run several transfers at once and return a TransferReport
+    g.download_folder(GDRIVE_DIRECTORY, local_folder_path, max_workers=8) -> TransferReport
+
+    # Keep a local copy of a folder up to date, fetching only what changed since the last run
+    g.sync_down(GDRIVE_DIRECTORY, local_folder_path, max_workers=8) -> TransferReport
+
+    # Keep downloads in a local store keyed by md5, so identical contents are only fetched once
+    g = GDriveCommands("settings.yaml", blob_store=True, blob_store_size=50 * 1024 ** 3)
+
+    # Read a file in place; only the parts that are read are fetched
+    with g.open(GDRIVE_FILE, "rb") as f:
+        header = f.read(44)
+
     Overwrite Modes
     ===============
     g.Overwrite.NEVER
@@ -88,6 +231,31 @@ class GDriveCommands(object):
     ===========================
     g.create_folder(GDRIVE_DIRECTORY, folder_name)
     g.upload_file(local_file_path, GDRIVE_DIRECTORY)
+    g.upload_data(bytes_or_file_object_or_generator, GDRIVE_DIRECTORY, uploaded_name)
+    g.upload_folder(local_folder_path, GDRIVE_DIRECTORY, max_workers=8) -> TransferReport
+
+    # Pack files under 1MB into compressed bundles (download_folder unpacks them)
+    g.upload_folder(local_folder_path, GDRIVE_DIRECTORY, bundle_threshold=1024 * 1024) -> TransferReport
+
+    # Two-way sync, transferring only files that differ; dry_run returns the SyncPlan instead
+    g.sync(local_folder_path, GDRIVE_DIRECTORY, direction="both", dry_run=True) -> SyncPlan
+    g.sync(local_folder_path, GDRIVE_DIRECTORY, direction="up", max_workers=8) -> TransferReport
+
+    # Check what an upload would do with a single listing of the destination folder
+    g.plan_upload([local_file_path1, local_file_path2, ...], GDRIVE_DIRECTORY) -> UploadPlan
+
+    Metrics
+    =======
+    # Api calls, retries, cache hits, bytes transferred and method latencies
+    g.metrics.to_prometheus() / g.metrics.to_json() / g.metrics.export(path)
+    g.metrics.add_hook(lambda type, name, value, labels: ...)
+
+    Batch Requests
+    ==============
+    # Send up to 100 metadata requests (create_folder, get, shortcut_target, trash, rename) at once
+    batch = g.batch()
+    batch.rename(GDRIVE_FILE["id"], new_name)
+    batch.execute() -> list of BatchResult
     """
     class Overwrite(enum.Enum):
         NEVER = 0
@@ -95,12 +263,256 @@ class GDriveCommands(object):
         ON_FILESIZE_CHANGE = 2
         ON_MD5_CHECKSUM_CHANGE = 3
 
-    def __init__(self, settings_file="settings.yaml", log_level=logging.INFO):
-        self.drive = GoogleDrive(self._get_auth(settings_file))
+    def __init__(
+            self,
+            settings_file="settings.yaml",
+            log_level=logging.INFO,
+            cache_ttl=60,
+            cache_size=10000,
+            drive=None,
+            checksum_cache=None,
+            hash_processes=None,
+            resumable_threshold=None,
+            chunk_size=resumable.DEFAULT_CHUNK_SIZE,
+            resume_dir=resumable.DEFAULT_RESUME_DIR,
+            metadata_cache=None,
+            metadata_max_age=300,
+            qps=20,
+            max_retries=5,
+            compact_listings=False,
+            metrics=None,
+            blob_store=None,
+            blob_store_size=None,
+            ):
+        """Set up the google drive connection (authenticating when the first request is made)
 
+        Params
+        settings_file (str, default="settings.yaml"): path to the pydrive settings file
+        log_level (default=logging.INFO): log level of the GDriveCommands logger
+        cache_ttl (float, default=60): seconds that a path resolved by find() is reused
+            without querying google drive again. Set to 0 to disable the path cache.
+        cache_size (int, default=10000): maximum number of resolved paths to keep cached
+        drive (pydrive2.drive.GoogleDrive, optional): an already authenticated drive (or a
+            stand-in for one, such as a local fake server) to use instead of authenticating
+            with settings_file. Otherwise authentication happens on the first request, and
+            the credentials are reused by every GDriveCommands using the same settings file.
+        checksum_cache (str or ChecksumCache, optional): sqlite file in which to remember the md5
+            checksums of local files, so unchanged files are not hashed again by
+            Overwrite.ON_MD5_CHECKSUM_CHANGE checks
+        hash_processes (int, optional): number of processes used to hash many local files at once
+            (defaults to the number of CPUs). The pool is started once and shared by all worker threads
+            until close() is called.
+        resumable_threshold (int, optional): files of at least this many bytes are transferred in
+            chunks that survive interruptions: downloads continue from a hidden .partial file next to the
+            destination and uploads continue their google drive upload session. Disabled if None.
+        chunk_size (int, default=16MB): bytes per request for resumable transfers
+        resume_dir (str, default=~/.cache/gdrive_access/uploads): where unfinished resumable
+            uploads are remembered
+        metadata_cache (bool, str or MetadataCache, optional): keep folder listings in a sqlite
+            database that other processes can share, so find(), ls() and the overwrite checks of
+            uploads are answered from it once any process has listed a folder. A cached listing is
+            checked against google drive (see _listing_is_current) at most once every cache_ttl
+            seconds. True puts the database next to settings_file, a string is used as its path.
+        metadata_max_age (float, default=300): seconds a listing in the metadata cache stays valid
+        qps (float, default=20): maximum google drive api requests per second, shared by all worker
+            threads. The rate is lowered automatically while google drive reports rate limits.
+            None disables rate limiting.
+        max_retries (int, default=5): times a request is retried with exponential backoff after a
+            rate limit, server error or dropped connection before the error is raised
+        compact_listings (bool, default=False): return listings (ls, iter_ls, walk, snapshot, find) as
+            FileRecord objects, which keep only the metadata fields this package uses and take much less
+            memory than GoogleDriveFile objects. FileRecords are accepted wherever a GoogleDriveFile is.
+        metrics (Metrics, optional): where to record api calls, retries, cache hits, bytes transferred and
+            method latencies (see Metrics). A new Metrics object is created if None; it is available as
+            the metrics attribute either way.
+        blob_store (bool, str or BlobStore, optional): keep every downloaded file in a local store keyed
+            by md5 checksum, so files with contents that were downloaded before (under any name, to any
+            folder) are linked or copied from the store instead of downloaded again. True puts the
+            store in a "blobs" folder next to settings_file, a string is used as its path.
+        blob_store_size (int, optional): maximum size of the blob store in bytes; the least recently
+            used blobs are deleted beyond it. Unbounded if None.
+        """
+        # Authentication waits for the first request (see the drive property)
+        if drive is None:
+            self._check_settings_file(settings_file)
+        self._settings_file = settings_file
+        self._drive = drive
+        self._drive_lock = threading.Lock()
+        self.metrics = metrics if metrics is not None else Metrics()
+        self._scheduler = RequestScheduler(qps=qps, max_retries=max_retries, metrics=self.metrics)
+        self.compact_listings = compact_listings
+
+        # Default log output is set up here rather than when the package is imported
+        logging.basicConfig()
         self.logger = logging.getLogger("gdrive_access.access.GDriveCommands")
         self.logger.setLevel(log_level)
 
+        self._path_cache = PathCache(ttl=cache_ttl, max_size=cache_size)
+
+        if isinstance(checksum_cache, str):
+            checksum_cache = ChecksumCache(checksum_cache)
+        self._checksum_cache = checksum_cache
+        self._hash_processes = hash_processes
+        self._hash_pool = None
+        self._hash_pool_lock = threading.Lock()
+
+        self.resumable_threshold = resumable_threshold
+        self.chunk_size = chunk_size
+        self.resume_dir = resume_dir
+
+        if metadata_cache is True:
+            metadata_cache = os.path.join(os.path.dirname(os.path.abspath(settings_file)), "metadata_cache.db")
+        if isinstance(metadata_cache, str):
+            metadata_cache = MetadataCache(metadata_cache, max_age=metadata_max_age)
+        self._metadata_cache = metadata_cache
+        # When each cached folder listing was last found to be current, by folder id
+        self._checked_listings = {}
+        self._checked_listings_lock = threading.Lock()
+
+        if blob_store is True:
+            blob_store = os.path.join(os.path.dirname(os.path.abspath(settings_file)), "blobs")
+        if isinstance(blob_store, str):
+            blob_store = BlobStore(blob_store, max_size=blob_store_size)
+        self._blob_store = blob_store
+
+    def clear_cache(self):
+        """Forget all paths resolved by find() and all cached folder listings"""
+        self._path_cache.clear()
+        if self._metadata_cache is not None:
+            self._metadata_cache.clear()
+        with self._checked_listings_lock:
+            self._checked_listings.clear()
+
+    def close(self):
+        """Shut down the pool of hashing processes, if one was started
+
+        A new pool is started if more files are hashed afterwards.
+        """
+        with self._hash_pool_lock:
+            pool, self._hash_pool = self._hash_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _invalidate(self, folder_id, name, added=None, removed=None):
+        """Forget cached lookups that a change to the file called name in the folder folder_id makes stale
+
+        The file that was added to (or updated in) the folder, or removed from it, is applied to the
+        folder's cached listing in the metadata cache. Without either, the listing is dropped.
+        """
+        self._path_cache.invalidate(folder_id, name)
+        if self._metadata_cache is None:
+            return
+        if added is not None:
+            self._metadata_cache.add_child(folder_id, added)
+        elif removed is not None:
+            self._metadata_cache.remove_child(folder_id, removed["id"])
+        else:
+            self._metadata_cache.invalidate(folder_id)
+
+    def _call(self, func, *args, kind=None, cost=1, idempotent=True, **kwargs):
+        """Make a google drive api call through the rate limiter, retrying transient errors
+
+        kind names the call in the metrics (e.g. "files.list"). See RequestScheduler.call for
+        cost and idempotent (False for calls that create files).
+        """
+        return self._scheduler.call(func, *args, kind=kind, cost=cost, idempotent=idempotent, **kwargs)
+
+    def batch(self):
+        """Start a batch of metadata requests (folder creation, gets, shortcut lookups, trash, rename)
+
+        The requests are sent 100 at a time when the batch's execute() is called. See MetadataBatch.
+        """
+        return MetadataBatch(self)
+
+    def _resolve_shortcuts(self, files):
+        """Fetch the missing shortcutDetails of any shortcuts among files, in batches"""
+        shortcuts = [f for f in files if f["mimeType"] == SHORTCUT_MIME_TYPE and "shortcutDetails" not in f]
+        if not shortcuts:
+            return
+        batch = self.batch()
+        for i, f in enumerate(shortcuts):
+            batch.shortcut_target(f["id"], key=i)
+        for result in batch.execute():
+            if not result.ok:
+                raise result.error
+            shortcuts[result.key]["shortcutDetails"] = result.file["shortcutDetails"]
+
+    def _create_folders(self, folders, max_workers: int=1, empty_folder_ids=()):
+        """Create many folders with batch requests, reusing folders that already exist
+
+        Each folder to create in is listed once (up to max_workers at a time), except those in
+        empty_folder_ids which are known to be empty, then all missing folders are created in batches.
+
+        Params
+        folders (list of (create_in, folder_name) tuples): the folders to create
+        max_workers (int, default=1): number of folders to list at the same time
+        empty_folder_ids (collection of str): ids of folders known to be empty (e.g. just created)
+
+        Returns:
+            tuple of (list of GoogleDriveFile, one for each requested folder, set of ids of the new folders)
+        """
+        parents = {}
+        for create_in, _ in folders:
+            parents.setdefault(self._to_id(create_in), create_in)
+        to_list = [folder_id for folder_id in parents if folder_id not in empty_folder_ids]
+        listings = dict(zip(to_list, self._map(lambda folder_id: self._list_children(parents[folder_id]), to_list, max_workers)))
+
+        results = {}
+        requested = set()
+        batch = self.batch()
+        for create_in, folder_name in folders:
+            key = (self._to_id(create_in), folder_name)
+            if key in results or key in requested:
+                continue
+            matches = [f for f in listings.get(key[0], []) if f["title"] == folder_name]
+            if len(matches) > 1:
+                raise MultipleFilesError("{}/{} matches {} files".format(create_in["title"], folder_name, len(matches)))
+            if len(matches):
+                results[key] = matches[0]
+            else:
+                batch.create_folder(key[0], folder_name, key=key)
+                requested.add(key)
+
+        created_ids = set()
+        for result in batch.execute():
+            if not result.ok:
+                raise result.error
+            self._invalidate(*result.key, added=result.file)
+            results[result.key] = result.file
+            created_ids.add(result.file["id"])
+
+        return [results[(self._to_id(create_in), folder_name)] for create_in, folder_name in folders], created_ids
+
+    def _iter_pages(self, param):
+        """Run a files.list query, yielding each page of results as it arrives
+
+        Each page is one rate limited (and retried) request.
+        """
+        file_list = self.drive.ListFile(dict(param, maxResults=param.get("maxResults", 1000)))
+        # pydrive2 sets pageToken to None after the last page
+        while file_list.get("pageToken", "") is not None:
+            page = self._next_page(file_list)
+            if page is None:
+                return
+            yield page
+
+    def _next_page(self, file_list):
+        """Fetch the next page of a pydrive2 file list (None if there are no more pages)"""
+        page = self._call(next, file_list, None, kind="files.list")
+        if page is not None and self.compact_listings:
+            page = [FileRecord(f.metadata) for f in page]
+        return page
+
+    def _get_list(self, param):
+        """Run a files.list query, returning the results of every page"""
+        return [f for page in self._iter_pages(param) for f in page]
+
     def _split_root_and_path(self, *path):
         """Split a list of path elements into the root and string path
 
@@ -109,8 +521,8 @@ class GDriveCommands(object):
         if not len (path) or isinstance(path[0], str):
             return RootDrive(), path
 
-        if not isinstance(path[0], GoogleDriveFile):
-            raise ValueError("The path must either be all strings or start with a GoogleDriveFile")
+        if not isinstance(path[0], (GoogleDriveFile, FileRecord)):
+            raise ValueError("The path must either be all strings or start with a GoogleDriveFile or FileRecord")
 
         return path[0], path[1:]
 
@@ -126,13 +538,13 @@ class GDriveCommands(object):
             pydrive.GoogleDriveFile object of the root location
         """
         if shared is False:
-            result_list = PyDriveListWrapper(self.drive.ListFile({
-                "q": "title = '{}'".format(folder_name)
-            }).GetList())
+            result_list = PyDriveListWrapper(self._get_list({
+                "q": "title = '{}'".format(_quote(folder_name))
+            }))
         else:
-            result_list = PyDriveListWrapper(self.drive.ListFile({
-                "q": "title = '{}' and sharedWithMe".format(folder_name)
-            }).GetList())
+            result_list = PyDriveListWrapper(self._get_list({
+                "q": "title = '{}' and sharedWithMe".format(_quote(folder_name))
+            }))
 
         if len(result_list) > 1:
             logger.warning("Located {} files by name {}. Selecting the first one".format(
@@ -144,23 +556,53 @@ class GDriveCommands(object):
 
         return result_list[0]
 
-    def _get_auth(self, settings_file="settings.yaml"):
+    @property
+    def drive(self):
+        """The pydrive2 GoogleDrive, authenticated on first use"""
+        if self._drive is None:
+            with self._drive_lock:
+                if self._drive is None:
+                    self._drive = GoogleDrive(self._get_auth(self._settings_file))
+        return self._drive
+
+    @drive.setter
+    def drive(self, drive):
+        self._drive = drive
+
+    def _check_settings_file(self, settings_file):
         if not os.path.exists(settings_file):
             raise CredentialsNotFound("Settings file {} was not found.\n"
                     "Please fix the path to the settings.yaml file or set up credentials with\n"
                     "'python -m gdrive_access.setup_credentials --dir CREDENTIALDIR'".format(settings_file))
-        try:
-            return get_auth(settings_file)
-        except FileNotFoundError:
-            raise CredentialsNotFound("Credentials were not found; Perhaps you should try running\n"
-                    "'python -m gdrive_access.setup_credentials --dir CREDENTIALDIR'\n"
-                    "or fixing the location of the credentials location set in {}".format(settings_file))
+
+    def _get_auth(self, settings_file="settings.yaml"):
+        """Authenticate with a settings file, reusing the credentials of an earlier authentication with it"""
+        self._check_settings_file(settings_file)
+        key = os.path.abspath(settings_file)
+        with _auths_lock:
+            if key not in _auths:
+                try:
+                    _auths[key] = get_auth(settings_file)
+                except FileNotFoundError:
+                    raise CredentialsNotFound("Credentials were not found; Perhaps you should try running\n"
+                            "'python -m gdrive_access.setup_credentials --dir CREDENTIALDIR'\n"
+                            "or fixing the location of the credentials location set in {}".format(settings_file))
+            return _auths[key]
+
+    def _as_file(self, file_):
+        """The GoogleDriveFile of a FileRecord, for calling pydrive2 methods on it"""
+        if isinstance(file_, FileRecord):
+            return file_.to_file(self.drive.auth)
+        return file_
 
     def _to_id(self, file_: GoogleDriveFile):
         """Return the id of the object unless it is a shortcut, then find the true id.
         """
         if file_["mimeType"] == "application/vnd.google-apps.shortcut":
-            file_.FetchMetadata(fields="shortcutDetails")
+            if "shortcutDetails" not in file_:
+                fetched = self._as_file(file_)
+                self._call(fetched.FetchMetadata, fields="shortcutDetails", kind="files.get")
+                file_["shortcutDetails"] = fetched["shortcutDetails"]
             return file_["shortcutDetails"]["targetId"]
         else:
             return file_["id"]
@@ -169,7 +611,8 @@ class GDriveCommands(object):
             self,
             overwrite: Overwrite,
             gdrive_file: GoogleDriveFile,
-            download_to_path: str
+            download_to_path: str,
+            local_checksum: str=None,
             ):
         if overwrite is self.Overwrite.NEVER:
             return False
@@ -177,13 +620,42 @@ class GDriveCommands(object):
             return True
         elif overwrite is self.Overwrite.ON_FILESIZE_CHANGE:
             local_filesize = os.path.getsize(download_to_path)
-            gdrive_filesize = gdrive_file.metadata["fileSize"]
+            gdrive_filesize = int(gdrive_file.metadata["fileSize"])
             return local_filesize != gdrive_filesize
         elif overwrite is self.Overwrite.ON_MD5_CHECKSUM_CHANGE:
-            local_checksum = _md5(download_to_path)
+            if local_checksum is None:
+                local_checksum = self._local_md5(download_to_path)
             gdrive_checksum = gdrive_file.metadata["md5Checksum"]
             return local_checksum != gdrive_checksum
 
+    def _use_resumable(self, size):
+        return self.resumable_threshold is not None and size is not None and int(size) >= self.resumable_threshold
+
+    @_timed("md5")
+    def _local_md5(self, path):
+        if self._checksum_cache is not None:
+            return self._checksum_cache.md5(path)
+        return _md5(path)
+
+    @_timed("md5_many")
+    def _local_md5s(self, paths):
+        """md5 checksums of many local files at once, as a dict keyed by path"""
+        return md5_many(paths, cache=self._checksum_cache, processes=self._hash_processes, executor=self._hash_executor())
+
+    def _hash_executor(self):
+        """The process pool shared by every _local_md5s call (None if hashing in one process)
+
+        Worker threads (e.g. of upload_folder) hash through this one pool, rather than each
+        starting its own. Its processes are only started when it is first given work.
+        """
+        if self._hash_processes == 1:
+            return None
+        with self._hash_pool_lock:
+            if self._hash_pool is None:
+                self._hash_pool = concurrent.futures.ProcessPoolExecutor(max_workers=self._hash_processes)
+            return self._hash_pool
+
+    @_timed("find_one_level")
     def _find_one_level(self, dir: GoogleDriveFile, filename: str):
         """Look for a filename in google drive directory
 
@@ -194,17 +666,7 @@ class GDriveCommands(object):
         Returns:
             pydrive.GoogleDriveFile object representing the file being searched for
         """
-        time.sleep(0.01)
-        query = "title = '{}' and trashed = false".format(filename)
-
-        if isinstance(dir, RootDrive):
-            query += " and (('{}' in parents) or (sharedWithMe = true))".format(self._to_id(dir))
-        else:
-            query += " and '{}' in parents".format(self._to_id(dir))
-
-        file_list = PyDriveListWrapper(self.drive.ListFile({
-            "q": query,
-        }).GetList())
+        file_list = self._list_children(dir, title=filename)
 
         if not len(file_list):
             raise NotFoundError("{}/{} not found".format(dir["title"], filename))
@@ -217,6 +679,9 @@ class GDriveCommands(object):
     def find(self, *path):
         """Get for a specific path in google drive directory
 
+        Below the first level, the rest of the path is resolved with a single query for all of
+        its names (see _find_chain), so deep paths take about as long as shallow ones.
+
         Params
         *path: each individual path element. The first one can optionally be a
             GoogleDriveFile representing a directory to start from
@@ -225,23 +690,319 @@ class GDriveCommands(object):
             pydrive.GoogleDriveFile object representing the file being searched for
         """
         root, path = self._split_root_and_path(*path)
-        result = root
-        for path_element in path:
-            result = self._find_one_level(result, path_element)
+        path = tuple(path)
+
+        n, parent_ids, result = self._path_cache.longest_prefix(root["id"], path)
+        if result is None:
+            result = root
+        if len(path):
+            self.metrics.inc("cache_hits" if n == len(path) else "cache_misses", cache="path")
+
+        i = n
+        while i < len(path):
+            chain = []
+            if len(path) - i > 1 and not isinstance(result, RootDrive) and self._metadata_cache is None:
+                chain = self._find_chain(result, path[i:])
+            if not chain:
+                # The root level (which includes files shared with me), the last level and
+                # whatever could not be stitched together are looked up one level at a time
+                chain = [self._find_one_level(result, path[i])]
+            for found in chain:
+                parent_ids += (self._to_id(result),)
+                result = found
+                i += 1
+                self._path_cache.put(root["id"], path[:i], parent_ids, result)
+
         return result
 
-    def ls(self, *path):
-        dir = self.find(*path)
-        time.sleep(0.01)
-        id_ = self._to_id(self.find(*path))
+    @_timed("find_chain")
+    def _find_chain(self, dir: GoogleDriveFile, names):
+        """Resolve several path levels below a folder with one query per batch of distinct names
+
+        Every untrashed file called any of the names is fetched (in concurrent queries of up to
+        _TITLES_PER_QUERY names, with only the metadata fields that snapshot() requests) and the
+        path is stitched together from dir by matching each file's parents, following shortcuts
+        to folders.
+
+        Returns:
+            list of the files found for names[0], names[1], ... This stops early where no candidate
+            matches, or is empty if the names are too common to fetch, so that the caller can fall
+            back to looking up the remaining levels one at a time.
+
+        Raises:
+            MultipleFilesError if a level has more than one match
+        """
+        titles = sorted(set(names))
+        batches = [titles[i:i + _TITLES_PER_QUERY] for i in range(0, len(titles), _TITLES_PER_QUERY)]
+
+        def fetch(batch):
+            query = "({}) and trashed = false".format(
+                " or ".join("title = '{}'".format(_quote(title)) for title in batch))
+            file_list = self.drive.ListFile({
+                "q": query,
+                "fields": _item_fields("id,title,mimeType,fileSize,md5Checksum,modifiedDate,parents(id),shortcutDetails"),
+                "maxResults": _MAX_PATH_CANDIDATES,
+            })
+            candidates = self._next_page(file_list) or []
+            # One page is enough to tell whether there are too many candidates: pydrive2 keeps
+            # the token of the next page, if there is one
+            if file_list.get("pageToken"):
+                return None
+            return candidates
+
+        results = self._map(fetch, batches, max_workers=len(batches))
+        if any(candidates is None for candidates in results):
+            return []
+
+        children = {}
+        for candidates in results:
+            for candidate in candidates:
+                for parent in candidate.get("parents") or []:
+                    children.setdefault((parent["id"], candidate["title"]), []).append(candidate)
+
+        chain = []
+        for name in names:
+            matches = children.get((self._to_id(dir), name), [])
+            if not matches:
+                break
+            if len(matches) > 1:
+                raise MultipleFilesError
+            dir = matches[0]
+            chain.append(dir)
+        return chain
+
+    def _list_children(self, dir: GoogleDriveFile, title: str=None, fields: str=None):
+        """List the (untrashed) contents of a google drive directory in one query
+
+        Params
+        dir: a GoogleDriveFile representing the folder to list. The root also lists
+            files shared with me.
+        title (optional): only list files with this exact name
+        fields (optional): partial response fields to request instead of the full metadata
+
+        Returns:
+            PyDriveListWrapper of pydrive.GoogleDriveFile objects
+        """
+        # Names in the root are looked up by title rather than from a cached listing of the
+        # whole root, which would also list every file shared with me
+        if self._metadata_cache is not None and not (title is not None and isinstance(dir, RootDrive)):
+            return self._list_children_cached(dir, title)
+        return self._query_children(dir, title, fields)
+
+    def _list_children_cached(self, dir: GoogleDriveFile, title: str=None):
+        """List a directory through the metadata cache
+
+        A miss lists the whole folder (even to look up a single title) so that the
+        listing can be shared with every later lookup in the folder. Files created
+        through this object are added to the cached listing (see _invalidate), so
+        uploading into a folder doesn't list it again.
+        """
+        folder_id = self._to_id(dir)
+
+        listing = self._metadata_cache.get_children(folder_id)
+        if listing is not None and not self._listing_is_current(dir, folder_id, *listing):
+            listing = None
+        self.metrics.inc("cache_misses" if listing is None else "cache_hits", cache="metadata")
+        if listing is None:
+            children = self._query_children(dir, fields=SNAPSHOT_FIELDS)
+            self._metadata_cache.put_children(folder_id, children)
+            with self._checked_listings_lock:
+                self._checked_listings[folder_id] = time.monotonic()
+        else:
+            _, cached = listing
+            if self.compact_listings:
+                children = [FileRecord(m) for m in cached]
+            else:
+                children = [GoogleDriveFile(auth=self.drive.auth, metadata=m, uploaded=True) for m in cached]
+
+        if title is not None:
+            children = [child for child in children if child["title"] == title]
+        return PyDriveListWrapper(children)
+
+    def _listing_is_current(self, dir: GoogleDriveFile, folder_id: str, listed_at: float, cached):
+        """Check a cached folder listing against the modifiedDate of the folder's contents on google drive
+
+        Queries for the files in the folder modified at or after the newest modifiedDate in the
+        listing (or shortly before it was made, if it is empty). That normally returns nothing but
+        the newest files themselves; anything else was added or changed elsewhere. Files trashed
+        or moved away elsewhere are only noticed once the listing is metadata_max_age old.
+        The check is skipped if the listing was found current within the last cache_ttl seconds.
+        """
+        with self._checked_listings_lock:
+            checked = self._checked_listings.get(folder_id)
+        if checked is not None and self._path_cache.enabled and time.monotonic() - checked < self._path_cache.ttl:
+            return True
+
+        known = {m["id"]: m.get("modifiedDate") for m in cached}
+        since = max(filter(None, known.values()), default=None)
+        if since is None:
+            since = _rfc3339(datetime.datetime.fromtimestamp(listed_at - _CLOCK_SKEW, datetime.timezone.utc))
+        param = {
+            "q": self._children_query(dir, clauses=["modifiedDate >= '{}'".format(since)]),
+            "fields": _item_fields("id,modifiedDate"),
+        }
+        for page in self._iter_pages(param):
+            if any(known.get(f["id"]) != f["modifiedDate"] for f in page):
+                return False
+
+        with self._checked_listings_lock:
+            self._checked_listings[folder_id] = time.monotonic()
+        return True
+
+    def _children_query(self, dir: GoogleDriveFile, title: str=None, clauses=()):
+        """Query for the untrashed contents of a folder, with optional extra clauses"""
         if isinstance(dir, RootDrive):
-            return PyDriveListWrapper(self.drive.ListFile({
-                "q": "(('{}' in parents) or (sharedWithMe = true)) and trashed = false".format(id_)
-            }).GetList())
+            query = "(('{}' in parents) or (sharedWithMe = true)) and trashed = false".format(self._to_id(dir))
         else:
-            return PyDriveListWrapper(self.drive.ListFile({
-                "q": "'{}' in parents and trashed = false".format(id_)
-            }).GetList())
+            query = "'{}' in parents and trashed = false".format(self._to_id(dir))
+
+        if title is not None:
+            query = "title = '{}' and {}".format(_quote(title), query)
+
+        return " and ".join([query] + list(clauses))
+
+    def _query_children(self, dir: GoogleDriveFile, title: str=None, fields: str=None):
+        param = {"q": self._children_query(dir, title)}
+        if fields is not None:
+            param["fields"] = fields
+            param["maxResults"] = 1000
+
+        return PyDriveListWrapper(self._get_list(param))
+
+    @_timed("ls")
+    def ls(self, *path):
+        return self._list_children(self.find(*path))
+
+    def iter_ls(
+            self,
+            *path,
+            fields=None,
+            mime_type=None,
+            modified_after=None,
+            title_prefix: str=None,
+            page_size: int=1000,
+            ):
+        """Iterate over the contents of a folder, one page of results at a time
+
+        Unlike ls(), files are yielded as soon as their page arrives and nothing is kept, so very
+        large folders can be processed with flat memory use. The filters are applied by google drive.
+
+        Params
+        *path: path to the folder to list (see find())
+        fields (str or list of str, optional): only request these metadata fields of each file
+            (e.g. "id,title,mimeType,fileSize,md5Checksum") instead of the full metadata
+        mime_type (str or list of str, optional): only list files of these mime types
+        modified_after (datetime or RFC 3339 str, optional): only list files modified after this time
+            (naive datetimes are taken as UTC)
+        title_prefix (str, optional): only list files whose title starts with this
+        page_size (int, default=1000): files requested per page
+
+        Yields:
+            pydrive.GoogleDriveFile objects
+        """
+        folder = self.find(*path)
+        filters = dict(mime_type=mime_type, modified_after=modified_after, title_prefix=title_prefix)
+        param = {"q": self._children_query(folder, clauses=_filter_clauses(**filters)), "maxResults": page_size}
+        if fields is not None:
+            param["fields"] = _item_fields(fields, required=["title"] if title_prefix is not None else [])
+
+        for page in self._iter_pages(param):
+            for file_ in page:
+                if title_prefix is None or file_["title"].startswith(title_prefix):
+                    yield file_
+
+    def walk(
+            self,
+            *path,
+            fields=None,
+            mime_type=None,
+            modified_after=None,
+            title_prefix: str=None,
+            page_size: int=1000,
+            ):
+        """Walk a folder tree top-down like os.walk, listing each folder only when it is reached
+
+        Yields tuples of (path: tuple of folder names relative to the top folder, folders, files).
+        Like os.walk, removing folders from the yielded folders list skips them. The filters only
+        apply to files; every subfolder is listed so that it can be walked.
+
+        Params
+        *path: path to the folder to walk (see find())
+        fields, mime_type, modified_after, title_prefix, page_size: see iter_ls()
+        """
+        top = self.find(*path)
+        filters = dict(mime_type=mime_type, modified_after=modified_after, title_prefix=title_prefix)
+        clauses = _filter_clauses(**filters)
+        if clauses:
+            # Folders (and shortcuts that may point to folders) are always listed
+            clauses = ["(mimeType = '{}' or mimeType = '{}' or ({}))".format(
+                FOLDER_MIME_TYPE, SHORTCUT_MIME_TYPE, " and ".join(clauses))]
+
+        # Folders are marked when queued, so a folder and a shortcut to it are only walked once
+        visited = {self._to_id(top)}
+        pending = [((), top)]
+        while pending:
+            folder_path, folder = pending.pop()
+            param = {"q": self._children_query(folder, clauses=clauses), "maxResults": page_size}
+            if fields is not None:
+                param["fields"] = _item_fields(fields, required=["id", "title", "mimeType", "modifiedDate", "shortcutDetails"])
+
+            folders, files = [], []
+            for page in self._iter_pages(param):
+                for file_ in page:
+                    if is_folder(file_):
+                        folders.append(file_)
+                    elif _matches_filters(file_, **filters):
+                        files.append(file_)
+
+            yield folder_path, folders, files
+            for f in reversed(folders):
+                if self._to_id(f) not in visited:
+                    visited.add(self._to_id(f))
+                    pending.append((folder_path + (f["title"],), f))
+
+    def snapshot(self, *path, max_workers: int=8):
+        """Index a whole google drive folder tree
+
+        Lists the tree one depth at a time, with up to max_workers folder listings in flight
+        and only the metadata fields the index needs. Shortcuts to folders are followed.
+        The paths in the snapshot are also added to the path cache, so find() calls
+        starting from the snapshot's root folder don't query google drive either.
+
+        Params
+        *path: path to the folder to index (see find())
+        max_workers (int, default=8): number of folders to list at the same time
+
+        Returns:
+            DriveSnapshot whose find(), ls(), exists() and walk() answer without api calls
+        """
+        root = self.find(*path)
+        snapshot = DriveSnapshot(root)
+        parent_ids = {(): ()}
+        visited = {self._to_id(root)}
+
+        level = [((), root)]
+        while level:
+            listings = self._map(
+                lambda item: self._list_children(item[1], fields=SNAPSHOT_FIELDS),
+                level,
+                max_workers
+            )
+            next_level = []
+            for (folder_path, folder), children in zip(level, listings):
+                snapshot.add_listing(folder_path, children)
+                titles = collections.Counter(child["title"] for child in children)
+                for child in children:
+                    child_path = folder_path + (child["title"],)
+                    parent_ids[child_path] = parent_ids[folder_path] + (self._to_id(folder),)
+                    if titles[child["title"]] == 1:
+                        self._path_cache.put(root["id"], child_path, parent_ids[child_path], child)
+                    if is_folder(child) and self._to_id(child) not in visited:
+                        visited.add(self._to_id(child))
+                        next_level.append((child_path, child))
+            level = next_level
+
+        return snapshot
 
     def ls_root(self):
         return self.ls()
@@ -254,6 +1015,83 @@ class GDriveCommands(object):
         else:
             return True
 
+    @_timed("find_many")
+    def find_many(self, paths, root: GoogleDriveFile=None, max_workers: int=8):
+        """Look up many paths at once, resolving each folder they share only once
+
+        The paths are resolved together one depth at a time: each distinct folder that some path
+        goes through is listed once (up to max_workers folders at a time), so thousands of paths
+        under a few folders cost about as many requests as listing those folders. Names directly
+        in the root are looked up by title instead, since listing the root also lists every file
+        shared with me.
+
+        Params
+        paths (iterable of tuples of str): the paths to look up, as the path elements passed to find()
+        root (GoogleDriveFile, optional): folder the paths are relative to. Uses the root directory if None
+        max_workers (int, default=8): number of folders to list at the same time
+
+        Returns:
+            dict mapping each path (as a tuple) to its pydrive.GoogleDriveFile, or to None if it doesn't exist
+
+        Raises:
+            MultipleFilesError if more than one file has the name of a path element
+        """
+        root = RootDrive() if root is None else root
+        paths = [tuple(path) for path in paths]
+        found = {(): root}
+        parent_ids = {(): ()}
+
+        for depth in range(max((len(path) for path in paths), default=0)):
+            wanted = {}
+            for path in paths:
+                if len(path) > depth and found.get(path[:depth]) is not None:
+                    wanted.setdefault(path[:depth], set()).add(path[depth])
+            if not wanted:
+                break
+            self._resolve_shortcuts([found[prefix] for prefix in wanted])
+
+            lookups = []
+            for prefix, names in wanted.items():
+                folder = found[prefix]
+                if isinstance(folder, RootDrive):
+                    lookups.extend((prefix, name) for name in sorted(names))
+                elif is_folder(folder):
+                    lookups.append((prefix, None))
+
+            def look_up(lookup):
+                prefix, name = lookup
+                return self._list_children(found[prefix], title=name)
+
+            children = {}
+            for (prefix, _), listing in zip(lookups, self._map(look_up, lookups, max_workers=max_workers)):
+                for child in listing:
+                    children.setdefault((prefix, child["title"]), []).append(child)
+
+            for prefix, names in wanted.items():
+                for name in names:
+                    path = prefix + (name,)
+                    matches = children.get((prefix, name), [])
+                    if len(matches) > 1:
+                        raise MultipleFilesError("/".join(path))
+                    found[path] = matches[0] if matches else None
+                    if found[path] is not None:
+                        parent_ids[path] = parent_ids[prefix] + (self._to_id(found[prefix]),)
+                        self._path_cache.put(root["id"], path, parent_ids[path], found[path])
+
+        return {path: found.get(path) for path in paths}
+
+    def exists_many(self, paths, root: GoogleDriveFile=None, max_workers: int=8):
+        """Check whether many paths exist at once (see find_many)
+
+        Returns:
+            dict mapping each path (as a tuple) to a bool
+        """
+        return {
+            path: file_ is not None
+            for path, file_ in self.find_many(paths, root=root, max_workers=max_workers).items()
+        }
+
+    @_timed("download_file")
     def download_file(self, gdrive_file, download_to_path, overwrite: Overwrite=Overwrite.NEVER):
         """Download a file from google drive
 
@@ -261,6 +1099,10 @@ class GDriveCommands(object):
         gdrive_file (pydrive file): file to download
         download_to_path (str): location on local filesystem to download data
         overwrite (GDriveCommands.Overwrite, default=NEVER): Overwrite mode
+
+        Returns:
+            TransferResult saying whether the file was downloaded or skipped (a TransferReport
+            if gdrive_file is a folder)
         """
         if gdrive_file["mimeType"] == "application/vnd.google-apps.folder":
             return self.download_folder(gdrive_file, download_to_path, overwrite=overwrite)
@@ -268,10 +1110,85 @@ class GDriveCommands(object):
         if os.path.isdir(download_to_path):
             download_to_path = os.path.join(download_to_path, gdrive_file["title"])
         if os.path.exists(download_to_path) and not self._check_if_overwrite_okay(overwrite, gdrive_file, download_to_path):
-            return
+            return TransferResult(download_to_path, gdrive_file, TransferStatus.SKIPPED)
+
+        md5 = gdrive_file.get("md5Checksum")
+        if self._blob_store is not None and md5:
+            self._download_through_blob_store(gdrive_file, md5, download_to_path)
+        else:
+            self._fetch_contents(gdrive_file, download_to_path)
+        return TransferResult(download_to_path, gdrive_file, TransferStatus.DOWNLOADED)
+
+    def _fetch_contents(self, gdrive_file, download_to_path):
+        # A retried resumable download continues from the bytes already received
+        if self._use_resumable(gdrive_file.get("fileSize")):
+            self._call(
+                resumable.download, self.drive, gdrive_file, download_to_path, chunk_size=self.chunk_size,
+                kind="files.get_media.resumable")
+        else:
+            # Downloaded next to the destination first, so a failed download never leaves a truncated file
+            temp_path = resumable.partial_path(download_to_path)
+            try:
+                self._call(self._as_file(gdrive_file).GetContentFile, temp_path, kind="files.get_media")
+                os.replace(temp_path, download_to_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+        self.metrics.inc("bytes_downloaded", os.path.getsize(download_to_path))
+
+    def _download_through_blob_store(self, gdrive_file, md5, download_to_path):
+        """Place a file from the blob store, downloading it into the store first if it isn't there"""
+        # Holding the lock means identical files in one bulk download are only fetched once
+        with self._blob_store.lock(md5):
+            if self._blob_store.materialize(md5, download_to_path):
+                self.metrics.inc("cache_hits", cache="blob")
+                self.logger.info("Reused {} from the blob store".format(gdrive_file["title"]))
+                return
+            self.metrics.inc("cache_misses", cache="blob")
+            temp_path = self._blob_store.temp_path(md5)
+            self._fetch_contents(gdrive_file, temp_path)
+            self._blob_store.put(md5, temp_path)
+            self._blob_store.materialize(md5, download_to_path)
+        self._blob_store.evict()
+
+    def open(self, gdrive_file, mode="rb", block_size: int=DEFAULT_BLOCK_SIZE, cache_blocks: int=32, read_ahead: int=4):
+        """Open a google drive file for reading without downloading it first
+
+        The returned file object is seekable and fetches the parts of the file that are read with
+        range requests, fetching read_ahead blocks beyond each missing block and keeping up to
+        cache_blocks blocks in memory. Google docs, sheets etc. have no contents to read.
+
+        Params
+        gdrive_file (pydrive file): the file to read (a shortcut is followed to its target)
+        mode (str, default="rb"): only "rb" is supported
+        block_size (int, default=1MB): bytes per range request block
+        cache_blocks (int, default=32): maximum number of blocks kept in memory
+        read_ahead (int, default=4): number of following blocks fetched along with a missing block
 
-        time.sleep(0.01)
-        gdrive_file.GetContentFile(download_to_path)
+        Returns:
+            io.BufferedReader
+        """
+        if mode != "rb":
+            raise ValueError("Google drive files can only be opened with mode 'rb', not '{}'".format(mode))
+
+        file_id = self._to_id(gdrive_file)
+        if file_id != gdrive_file["id"] or "fileSize" not in gdrive_file:
+            gdrive_file = self.drive.CreateFile({"id": file_id})
+            self._call(gdrive_file.FetchMetadata, fields="id,title,mimeType,fileSize", kind="files.get")
+        if "fileSize" not in gdrive_file:
+            raise ValueError("{} ({}) has no contents to read; use download_file to export it".format(
+                gdrive_file["title"], gdrive_file["mimeType"]))
+
+        raw = DriveFileReader(
+            self,
+            file_id,
+            int(gdrive_file["fileSize"]),
+            name=gdrive_file["title"],
+            block_size=block_size,
+            cache_blocks=cache_blocks,
+            read_ahead=read_ahead,
+        )
+        return io.BufferedReader(raw, buffer_size=block_size)
 
     def create_folder(self, create_in, folder_name, return_if_exists=True):
         """Create a folder in google drive
@@ -283,9 +1200,13 @@ class GDriveCommands(object):
         return_if_exists (bool, default True): return the existing folder if it already exists on google
             drive. If set to False, will raise an error if the folder already exists.
         """
-        if self.exists(create_in, folder_name):
+        try:
+            existing_folder = self.find(create_in, folder_name)
+        except NotFoundError:
+            pass
+        else:
             if return_if_exists:
-                return self.find(create_in, folder_name)
+                return existing_folder
             else:
                 raise FolderExists("Folder already exists")
 
@@ -294,10 +1215,11 @@ class GDriveCommands(object):
             "parents":  [{"id": self._to_id(create_in)}],
             "mimeType": "application/vnd.google-apps.folder"
         })
-        time.sleep(0.01)
-        new_folder.Upload()
+        self._call(new_folder.Upload, kind="files.insert", idempotent=False)
+        self._invalidate(self._to_id(create_in), folder_name, added=new_folder)
         return new_folder
 
+    @_timed("upload_file")
     def upload_file(self, local_file_path, upload_to, uploaded_name=None, overwrite: Overwrite=Overwrite.ON_MD5_CHECKSUM_CHANGE):
         """Uploads a file to a gdrive folder
 
@@ -310,6 +1232,9 @@ class GDriveCommands(object):
             If false, won't upload if a file by the same name already exists on google drive.
             (Note that google drive allows for multiple files of the same name, so it wont actually overwrite
             even if it is set)
+
+        Returns:
+            TransferResult of the upload
         """
         if uploaded_name is None:
             filename = os.path.basename(local_file_path)
@@ -318,25 +1243,339 @@ class GDriveCommands(object):
 
         self.logger.info("Uploading {} to {}".format(local_file_path, upload_to["title"]))
 
-        if self.exists(upload_to, filename):
-            existing_file = self.find(upload_to, filename)
-            if not self._check_if_overwrite_okay(overwrite, existing_file, local_file_path):
-                self.logger.info("{} already exists at {}".format(local_file_path, upload_to["title"]))
-                raise FileExists("File already exists on google drive, can't overwrite with overwrite={}".format(overwrite))
+        planned, = self.plan_upload([local_file_path], upload_to, overwrite=overwrite, uploaded_names=[filename])
+        if planned.action is UploadAction.CONFLICT:
+            raise MultipleFilesError("{}/{} matches {} files".format(
+                upload_to["title"], filename, len(planned.existing_files)))
+        elif planned.action is UploadAction.SKIP:
+            self.logger.info("{} already exists at {}".format(local_file_path, upload_to["title"]))
+            raise FileExists("File already exists on google drive, can't overwrite with overwrite={}".format(overwrite))
 
-        new_file = self.drive.CreateFile({
+        return self._upload(local_file_path, upload_to, filename)
+
+    @_timed("upload_data")
+    def upload_data(
+            self,
+            data,
+            upload_to,
+            uploaded_name,
+            overwrite: Overwrite=Overwrite.ON_MD5_CHECKSUM_CHANGE,
+            size: int=None,
+            mime_type: str="application/octet-stream",
+            ):
+        """Upload data from memory, a file object or a generator without writing it to disk first
+
+        The data is sent in chunks of chunk_size bytes with a resumable upload session, so no more than
+        about one chunk is held in memory. Existing files are handled like upload_file does. The md5 checksum
+        and size of bytes are known up front; for file objects and iterators they are unknown (unless size
+        is given), so an existing file counts as changed under ON_MD5_CHECKSUM_CHANGE and ON_FILESIZE_CHANGE.
+
+        Params
+        data (bytes, file object opened in binary mode, or iterable of bytes): the contents to upload
+        upload_to (pydrive object): pydrive folder object (e.g. the output of create_folder() or find())
+        uploaded_name (string): name to call the uploaded file in google drive
+        overwrite (GDriveCommands.Overwrite, default=ON_MD5_CHECKSUM_CHANGE): Overwrite mode
+        size (int, optional): number of bytes in data, if it is a file object or iterator of known length
+        mime_type (str, default="application/octet-stream"): mime type of the uploaded file
+
+        Returns:
+            TransferResult of the upload
+        """
+        checksum = None
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
+            size = len(data)
+            checksum = hashlib.md5(data).hexdigest()
+
+        matches = self._list_children(upload_to, title=uploaded_name)
+        if len(matches) > 1:
+            raise MultipleFilesError("{}/{} matches {} files".format(upload_to["title"], uploaded_name, len(matches)))
+        elif len(matches) and not self._check_if_data_overwrite_okay(overwrite, matches[0], size, checksum):
+            raise FileExists("File already exists on google drive, can't overwrite with overwrite={}".format(overwrite))
+
+        return self._upload_data(data, upload_to, uploaded_name, size=size, mime_type=mime_type)
+
+    @_timed("upload")
+    def _upload_data(self, data, upload_to, uploaded_name, size: int=None, mime_type: str="application/octet-stream"):
+        """Upload data (see upload_data) without checking for existing files of the same name"""
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = bytes(data)
+            size = len(data)
+            chunks = (data[i:i + self.chunk_size] for i in range(0, size, self.chunk_size))
+        elif hasattr(data, "read"):
+            chunks = iter(lambda: data.read(self.chunk_size), b"")
+        else:
+            chunks = data
+
+        metadata = {
             "parents": [{"id": self._to_id(upload_to)}],
-            "title": uploaded_name or filename,
-        })
+            "title": uploaded_name,
+            "mimeType": mime_type,
+        }
+        new_file = resumable.upload_stream(
+            self.drive, chunks, metadata, size=size, chunk_size=self.chunk_size,
+            call=functools.partial(self._call, kind="upload.stream"))
+        self.metrics.inc("bytes_uploaded", int(new_file.get("fileSize", 0)))
+        self._invalidate(self._to_id(upload_to), uploaded_name, added=new_file)
+        self.logger.info("Uploaded {} to {}".format(uploaded_name, upload_to["title"]))
+        return TransferResult(None, new_file, TransferStatus.UPLOADED)
+
+    def _check_if_data_overwrite_okay(self, overwrite: Overwrite, gdrive_file: GoogleDriveFile, size: int=None, checksum: str=None):
+        """Like _check_if_overwrite_okay for data that isn't a local file; unknown sizes and checksums count as changed"""
+        if overwrite is self.Overwrite.NEVER:
+            return False
+        elif overwrite is self.Overwrite.ALWAYS:
+            return True
+        elif overwrite is self.Overwrite.ON_FILESIZE_CHANGE:
+            return size is None or size != int(gdrive_file.metadata["fileSize"])
+        elif overwrite is self.Overwrite.ON_MD5_CHECKSUM_CHANGE:
+            return checksum is None or checksum != gdrive_file.metadata["md5Checksum"]
+
+    def plan_upload(
+            self,
+            local_file_paths,
+            upload_to,
+            overwrite: Overwrite=Overwrite.ON_MD5_CHECKSUM_CHANGE,
+            uploaded_names=None,
+            ):
+        """Decide which local files would be uploaded to a google drive folder
+
+        Lists upload_to once (a single file is looked up by name instead) and compares each
+        local file with the existing file of the same name using the overwrite mode, the same
+        way upload_file does.
+
+        Params
+        local_file_paths (list of string): paths to the files on your computer
+        upload_to (pydrive object): pydrive folder object the files would be uploaded to
+        overwrite (GDriveCommands.Overwrite, default=ON_MD5_CHECKSUM_CHANGE): Overwrite mode
+        uploaded_names (list of string, optional): names to give the files in google drive. Uses
+            the files' actual names if left as None
+
+        Returns:
+            UploadPlan with a PlannedUpload (action UPLOAD, OVERWRITE, SKIP or CONFLICT) per file
+        """
+        if uploaded_names is None:
+            uploaded_names = [os.path.basename(path) for path in local_file_paths]
+
+        if len(uploaded_names) == 1:
+            children = self._list_children(upload_to, title=uploaded_names[0])
+        else:
+            children = self._list_children(upload_to)
+
+        existing = {}
+        for f in children:
+            existing.setdefault(f["title"], []).append(f)
+
+        local_checksums = {}
+        if overwrite is self.Overwrite.ON_MD5_CHECKSUM_CHANGE:
+            local_checksums = self._local_md5s([
+                local_path for local_path, filename in zip(local_file_paths, uploaded_names)
+                if len(existing.get(filename, [])) == 1
+            ])
+
+        plan = UploadPlan(upload_to)
+        for local_path, filename in zip(local_file_paths, uploaded_names):
+            matches = existing.get(filename, [])
+            if not matches:
+                action = UploadAction.UPLOAD
+            elif len(matches) > 1:
+                action = UploadAction.CONFLICT
+            elif self._check_if_overwrite_okay(overwrite, matches[0], local_path, local_checksums.get(local_path)):
+                action = UploadAction.OVERWRITE
+            else:
+                action = UploadAction.SKIP
+            plan.append(PlannedUpload(local_path, filename, action, matches))
+        return plan
+
+    @_timed("upload")
+    def _upload(self, local_file_path, upload_to, filename):
+        """Upload a file without checking for existing files of the same name"""
+        metadata = {
+            "parents": [{"id": self._to_id(upload_to)}],
+            "title": filename,
+        }
+        # A retried resumable upload continues its upload session instead of starting over
+        if self._use_resumable(os.path.getsize(local_file_path)):
+            new_file = self._call(
+                resumable.upload,
+                self.drive, local_file_path, metadata, chunk_size=self.chunk_size, resume_dir=self.resume_dir,
+                kind="upload.resumable")
+        else:
+            new_file = self._call(self._simple_upload, local_file_path, metadata, kind="upload", idempotent=False)
+        self.metrics.inc("bytes_uploaded", int(new_file.get("fileSize", 0)))
+        self._invalidate(self._to_id(upload_to), filename, added=new_file)
+        self.logger.info("Uploaded {} to {}".format(local_file_path, upload_to["title"]))
+        return TransferResult(local_file_path, new_file, TransferStatus.UPLOADED)
+
+    def _simple_upload(self, local_file_path, metadata):
+        new_file = self.drive.CreateFile(metadata)
         new_file.SetContentFile(local_file_path)
-        time.sleep(0.01)
         new_file.Upload()
-        self.logger.info("Uploaded {} to {}".format(local_file_path, upload_to["title"]))
+        return new_file
+
+    @_timed("upload")
+    def _update_contents(self, gdrive_file, local_file_path, folder):
+        """Replace the contents of an existing google drive file (in folder) with a local file, keeping its id"""
+        def update():
+            updated = self.drive.CreateFile({"id": gdrive_file["id"]})
+            updated.SetContentFile(local_file_path)
+            updated.Upload()
+            return updated
+
+        updated = self._call(update, kind="upload.update")
+        self.metrics.inc("bytes_uploaded", os.path.getsize(local_file_path))
+        self._invalidate(self._to_id(folder), gdrive_file["title"], added=updated)
+        self.logger.info("Updated {} from {}".format(gdrive_file["title"], local_file_path))
+        return TransferResult(local_file_path, updated, TransferStatus.UPLOADED)
+
+    def sync_down(
+            self,
+            gdrive_folder,
+            download_to_path,
+            overwrite: Overwrite=Overwrite.ON_MD5_CHECKSUM_CHANGE,
+            max_workers: int=1,
+            delete_removed: bool=True,
+            ):
+        """Mirror a google drive folder into download_to_path/<folder title>, incrementally
+
+        The first call downloads the whole folder (like download_folder) and saves a manifest of
+        its contents, together with a position in the google drive changes feed, in a hidden
+        .gdrive_sync.json file in the mirror. Later calls only read the changes since then: new and
+        modified files are downloaded, moved and renamed files are moved locally and trashed files
+        are deleted, without listing the folder or hashing unchanged files. Files that fail to
+        download are remembered in the manifest and downloaded again by the next call.
+
+        Params
+        gdrive_folder (pydrive object): the folder to mirror
+        download_to_path (str): location on local filesystem to put the mirror in
+        overwrite (GDriveCommands.Overwrite, default=ON_MD5_CHECKSUM_CHANGE): Overwrite mode for
+            files that need to be downloaded
+        max_workers (int, default=1): number of files to download at the same time
+        delete_removed (bool, default=True): delete local files that were trashed, deleted or moved
+            out of the folder on google drive
+
+        Returns:
+            TransferReport of the files downloaded, moved and deleted
+        """
+        return sync.sync_down(
+            self, gdrive_folder, download_to_path, overwrite,
+            max_workers=max_workers, delete_removed=delete_removed)
+
+    def plan_sync(
+            self,
+            local_dir,
+            gdrive_folder,
+            direction: str="both",
+            delete_removed: bool=False,
+            max_workers: int=1,
+            ):
+        """Work out what a sync between a local folder and a google drive folder would transfer
+
+        Both sides are read in one pass: the google drive folder is listed once per subfolder
+        (see snapshot()) and the local folder is walked, hashing (through the checksum cache if
+        there is one) only the local files whose size matches their google drive file. Files
+        differing in size or md5 checksum are transferred in the direction given; with "both",
+        the side modified most recently wins. Hidden local files, google docs and shortcuts to
+        files are left alone.
+
+        Params
+        local_dir (str): the local folder, corresponding to the contents of gdrive_folder
+        gdrive_folder (pydrive object): the google drive folder
+        direction (str or SyncDirection, default="both"): "up" makes google drive match the local
+            folder, "down" makes the local folder match google drive and "both" copies new files
+            each way and keeps the most recently modified version of changed files
+        delete_removed (bool, default=False): with "up" or "down", delete (or trash) files that only
+            exist on the side being updated
+        max_workers (int, default=1): number of folders to list at the same time
+
+        Returns:
+            SyncPlan of the transfers and conflicts (print it to see the diff)
+        """
+        return sync.plan_sync(
+            self, local_dir, gdrive_folder, direction, delete_removed=delete_removed, max_workers=max_workers)
+
+    def apply_sync(self, plan, max_workers: int=1):
+        """Carry out the transfers of a SyncPlan, max_workers at a time
+
+        Missing google drive folders are created in batches, google drive files are trashed in
+        batches and changed google drive files get their contents replaced (keeping their ids).
+        Conflicts are reported as failed.
+
+        Returns:
+            TransferReport with the result of each transfer
+        """
+        return sync.apply_sync(self, plan, max_workers=max_workers)
+
+    def sync(
+            self,
+            local_dir,
+            gdrive_folder,
+            direction: str="both",
+            dry_run: bool=False,
+            delete_removed: bool=False,
+            max_workers: int=1,
+            ):
+        """Sync a local folder and a google drive folder, transferring only the files that differ
+
+        See plan_sync for the parameters.
+
+        Params
+        dry_run (bool, default=False): only plan the sync and log the plan
+
+        Returns:
+            TransferReport with the result of each transfer, or the SyncPlan if dry_run is True
+        """
+        plan = self.plan_sync(local_dir, gdrive_folder, direction, delete_removed=delete_removed, max_workers=max_workers)
+        if dry_run:
+            self.logger.info(repr(plan))
+            return plan
+        return self.apply_sync(plan, max_workers=max_workers)
+
+    def _map(self, func, items, max_workers: int=1):
+        """Apply func to each item, running up to max_workers calls at a time"""
+        if max_workers <= 1:
+            return list(map(func, items))
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(func, items))
 
-    def upload_folder(self, local_folder_path, upload_to, uploaded_name=None, overwrite_file: Overwrite=Overwrite.ON_MD5_CHECKSUM_CHANGE, overwrite_folder=False):
+    def upload_folder(
+            self,
+            local_folder_path,
+            upload_to,
+            uploaded_name=None,
+            overwrite_file: Overwrite=Overwrite.ON_MD5_CHECKSUM_CHANGE,
+            overwrite_folder=False,
+            max_workers: int=1,
+            bundle_threshold: int=None,
+            bundle_size: int=bundle.DEFAULT_BUNDLE_SIZE,
+            ):
         """Upload a local folder and its contents to google drive
 
         Attempts to preserve folder structure. overwrite_folder False will not attempt to write at a folder that exists
+
+        The upload runs in three stages: the folder skeleton is created one depth at a time, each google drive
+        folder is listed once to decide which files to skip, and finally the files are uploaded.
+        Each stage runs up to max_workers requests at a time.
+
+        With bundle_threshold, files smaller than that many bytes are instead packed into compressed tar
+        bundles of about bundle_size bytes (zstd if the zstandard package is installed, gzip otherwise) in
+        the uploaded folder, with an index of their contents, and only the folders holding larger files are
+        created on google drive. download_folder unpacks bundles transparently. Files already in the
+        bundles are skipped or packed again according to overwrite_file.
+
+        Params
+        local_folder_path (string): the folder on your computer to upload
+        upload_to (pydrive object): pydrive folder object to upload the folder into
+        uploaded_name (string, optional): name of the folder in google drive. Uses the folder's actual name if None
+        overwrite_file (GDriveCommands.Overwrite, default=ON_MD5_CHECKSUM_CHANGE): Overwrite mode for files
+        overwrite_folder (bool, default False): upload into the folder even if it already exists
+        max_workers (int, default=1): number of requests to run at the same time
+        bundle_threshold (int, optional): bundle files smaller than this many bytes. Disabled if None
+        bundle_size (int, default=256MB): uncompressed bytes per bundle
+
+        Returns:
+            TransferReport with the result of each file
         """
         if uploaded_name is None:
             foldername = os.path.basename(local_folder_path)
@@ -345,16 +1584,138 @@ class GDriveCommands(object):
 
         gdrive_folder = self.create_folder(upload_to, foldername, return_if_exists=overwrite_folder)
 
-        for content in glob.glob(os.path.join(local_folder_path, "*")):
-            if os.path.isdir(content):
-                self.upload_folder(content, gdrive_folder)
-            else:
-                try:
-                    self.upload_file(content, gdrive_folder, overwrite=overwrite_file)
-                except FileExists:
-                    pass
+        local_tree = _local_tree(local_folder_path)
+        bundled_files, bundled_folders = [], []
+        if bundle_threshold is not None:
+            for rel_path, paths in local_tree.items():
+                small = [path for path in paths if os.path.getsize(path) < bundle_threshold]
+                bundled_files.extend(("/".join(rel_path + (os.path.basename(path),)), path) for path in small)
+                small = set(small)
+                local_tree[rel_path] = [path for path in paths if path not in small]
+            # Only the folders leading to files that are uploaded separately are created on google drive
+            needed = {()} | {rel_path[:i] for rel_path, paths in local_tree.items() if paths for i in range(len(rel_path) + 1)}
+            bundled_folders = ["/".join(rel_path) for rel_path in local_tree if rel_path not in needed]
+            local_tree = {rel_path: paths for rel_path, paths in local_tree.items() if rel_path in needed}
+        gdrive_folders = {(): gdrive_folder}
+        # Folders created here are empty, so only pre-existing folders need listing before creating in them
+        new_folder_ids = set()
+        for depth in range(1, max(map(len, local_tree)) + 1):
+            level = [rel_path for rel_path in local_tree if len(rel_path) == depth]
+            created, created_ids = self._create_folders(
+                [(gdrive_folders[rel_path[:-1]], rel_path[-1]) for rel_path in level],
+                max_workers,
+                empty_folder_ids=new_folder_ids,
+            )
+            gdrive_folders.update(zip(level, created))
+            new_folder_ids.update(created_ids)
+
+        plans = self._map(
+            lambda rel_path: self.plan_upload(local_tree[rel_path], gdrive_folders[rel_path], overwrite=overwrite_file),
+            [rel_path for rel_path in local_tree if local_tree[rel_path]],
+            max_workers
+        )
+
+        def upload(job):
+            local_path, folder, filename = job
+            try:
+                return self._upload(local_path, folder, filename)
+            except Exception as e:
+                self.logger.error("Failed to upload {} to {}: {}".format(local_path, folder["title"], e))
+                return TransferResult(local_path, folder, TransferStatus.FAILED, e)
+
+        report = TransferReport()
+        uploads = []
+        for plan in plans:
+            for planned in plan:
+                if planned.action is UploadAction.SKIP:
+                    report.append(TransferResult(planned.local_path, planned.existing_files[0], TransferStatus.SKIPPED))
+                elif planned.action is UploadAction.CONFLICT:
+                    error = MultipleFilesError("{}/{} matches {} files".format(
+                        plan.upload_to["title"], planned.filename, len(planned.existing_files)))
+                    report.append(TransferResult(planned.local_path, plan.upload_to, TransferStatus.FAILED, error))
+                else:
+                    uploads.append((planned.local_path, plan.upload_to, planned.filename))
+        report.extend(self._map(upload, uploads, max_workers))
+        if bundled_files or bundled_folders:
+            report.extend(bundle.upload_bundles(
+                self, gdrive_folder, bundled_files, bundled_folders, overwrite_file,
+                bundle_size=bundle_size, max_workers=max_workers))
+        return report
+
+    def _folder_download_jobs(self, gdrive_folder, download_to_path, max_workers: int=1):
+        """List a google drive folder recursively, creating the matching local folders
+
+        Returns a tuple of a list of (gdrive_file, local_path) tuples for every file in the folder
+        and a list of (files, local_folder) tuples for every folder holding bundles (see upload_folder),
+        whose bundles and index are left out of the first list
+        """
+        download_to_path = os.path.join(download_to_path, gdrive_folder["title"])
+
+        jobs = []
+        bundled = []
+        for path, _, files in self.snapshot(gdrive_folder, max_workers=max_workers).walk():
+            local_folder = os.path.join(download_to_path, *path)
+            if not os.path.exists(local_folder):
+                os.makedirs(local_folder)
+            if bundle.is_bundled(files):
+                bundled.append((files, local_folder))
+                files = [f for f in files if not bundle.is_bundle_file(f)]
+            jobs.extend((f, os.path.join(local_folder, f["title"])) for f in files)
+        return jobs, bundled
+
+    def _unique_download_jobs(self, jobs):
+        """Keep one (gdrive_file, local_path) job per local path
+
+        Google drive allows several files with the same title in a folder, and downloading them
+        at the same time would mix their contents in one local file. The most recently modified
+        file of each title is downloaded and the others are reported as failed.
 
-    def download_files(self, gdrive_files, download_to_path, overwrite: Overwrite=Overwrite.NEVER):
+        Returns:
+            tuple of (list of jobs, TransferReport of the files left out)
+        """
+        by_path = {}
+        for gdrive_file, local_path in jobs:
+            by_path.setdefault(local_path, []).append(gdrive_file)
+
+        unique = []
+        conflicts = TransferReport()
+        for local_path, gdrive_files in by_path.items():
+            newest = max(gdrive_files, key=lambda f: f.get("modifiedDate") or "")
+            unique.append((newest, local_path))
+            for gdrive_file in gdrive_files:
+                if gdrive_file is not newest:
+                    error = MultipleFilesError("{} matches {} files on google drive".format(local_path, len(gdrive_files)))
+                    conflicts.append(TransferResult(local_path, gdrive_file, TransferStatus.FAILED, error))
+        return unique, conflicts
+
+    def _run_downloads(self, jobs, overwrite: Overwrite, max_workers: int=1, bundled=()):
+        """Download a list of (gdrive_file, local_path) jobs, max_workers at a time
+
+        pydrive2 gives each thread its own authorized http client, so the workers
+        don't share an httplib2 connection. Files with the same local path are only
+        downloaded once (see _unique_download_jobs). The files of bundled folders (see
+        _folder_download_jobs) are unpacked afterwards.
+        """
+        def download(job):
+            gdrive_file, local_path = job
+            try:
+                return self.download_file(gdrive_file, local_path, overwrite=overwrite)
+            except Exception as e:
+                self.logger.error("Failed to download {} to {}: {}".format(gdrive_file["title"], local_path, e))
+                return TransferResult(local_path, gdrive_file, TransferStatus.FAILED, e)
+
+        jobs, conflicts = self._unique_download_jobs(jobs)
+        if overwrite is self.Overwrite.ON_MD5_CHECKSUM_CHANGE and self._checksum_cache is not None:
+            # Hash the existing local files up front (in parallel) so the checks below hit the cache
+            self._local_md5s([local_path for _, local_path in jobs if os.path.isfile(local_path)])
+
+        report = TransferReport(self._map(download, jobs, max_workers))
+        report.extend(conflicts)
+        for files, local_folder in bundled:
+            report.extend(bundle.download_bundles(self, files, local_folder, overwrite, max_workers))
+        return report
+
+    def download_files(self, gdrive_files, download_to_path, overwrite: Overwrite=Overwrite.NEVER, max_workers: int=1):
         """Download files from google drive
 
         Params
@@ -362,6 +1723,12 @@ class GDriveCommands(object):
             a list of ouputs from find())
         download_to_path (str): location on local filesystem to download data
         overwrite (GDriveCommands.Overwrite, default=NEVER): Overwrite mode
+        max_workers (int, default=1): number of files to download at the same time
+
+        Returns:
+            TransferReport with the result of each file. Files that fail to download are
+            reported with status FAILED instead of stopping the other downloads, as are all
+            but the most recently modified of several files with the same title in a folder.
         """
         if not os.path.exists(download_to_path):
             os.makedirs(download_to_path)
@@ -369,32 +1736,35 @@ class GDriveCommands(object):
         if not os.path.isdir(download_to_path):
             raise Exception("download_to_path must be an existing directory")
 
+        gdrive_files = list(gdrive_files)
+        self._resolve_shortcuts(gdrive_files)
+
+        jobs = []
+        bundled = []
         for file in gdrive_files:
-            self.download_file(file, download_to_path, overwrite=overwrite)
+            if is_folder(file):
+                folder_jobs, folder_bundled = self._folder_download_jobs(file, download_to_path, max_workers)
+                jobs.extend(folder_jobs)
+                bundled.extend(folder_bundled)
+            else:
+                jobs.append((file, os.path.join(download_to_path, file["title"])))
+
+        return self._run_downloads(jobs, overwrite, max_workers, bundled)
 
-    def download_folder(self, gdrive_folder, download_to_path, overwrite: Overwrite=Overwrite.NEVER):
+    def download_folder(self, gdrive_folder, download_to_path, overwrite: Overwrite=Overwrite.NEVER, max_workers: int=1):
         """Download files from google drive
 
         Params
-        gdrive_files (list of pydrive files): files to download
+        gdrive_folder (pydrive file): folder to download
         download_to_path (str): location on local filesystem to download data
-        """
-        download_to_path = os.path.join(download_to_path, gdrive_folder["title"])
-        if not os.path.exists(download_to_path):
-            os.makedirs(download_to_path)
+        overwrite (GDriveCommands.Overwrite, default=NEVER): Overwrite mode
+        max_workers (int, default=1): number of files to download at the same time
 
-        for f in self.ls(gdrive_folder):
-            time.sleep(0.01)
-            if f["mimeType"] == "application/vnd.google-apps.folder":
-                self.download_folder(
-                        f,
-                        download_to_path,
-                        overwrite=overwrite)
-            else:
-                self.download_file(
-                        f,
-                        os.path.join(download_to_path, f["title"]),
-                        overwrite=overwrite)
+        Returns:
+            TransferReport with the result of each file in the folder
+        """
+        jobs, bundled = self._folder_download_jobs(gdrive_folder, download_to_path, max_workers)
+        return self._run_downloads(jobs, overwrite, max_workers, bundled)
 
 
 __all__ = [
@@ -0,0 +1,164 @@
+"""
+Asyncio interface to GDriveCommands
+
+pydrive2 (and the google api client under it) only make blocking http requests, so
+each call runs on a bounded pool of worker threads while the event loop stays free.
+All requests still go through the GDriveCommands rate limiter.
+"""
+
+import asyncio
+import concurrent.futures
+import functools
+import os
+import weakref
+
+from . import bundle
+from .access import GDriveCommands
+from .report import TransferReport, TransferResult, TransferStatus
+from .snapshot import is_folder
+
+
+class AsyncGDriveCommands(object):
+    """Coroutine versions of the GDriveCommands methods
+
+    At most max_concurrency calls run at once; any number of coroutines can be awaited
+    together and wait for a free slot. Bulk downloads are split into one call per file,
+    so their transfers share the same concurrency limit as everything else.
+
+    Params
+    ======
+    commands (GDriveCommands, optional): the connection to use. If None, one is created
+        with the remaining keyword arguments
+    max_concurrency (int, default=16): number of calls to google drive in flight at once
+
+    Example
+    =======
+    g = AsyncGDriveCommands(GDriveCommands("settings.yaml"), max_concurrency=32)
+    folders = await asyncio.gather(*[g.find("data", name) for name in names])
+    report = await g.download_folder(folders[0], local_folder_path)
+    """
+    Overwrite = GDriveCommands.Overwrite
+
+    def __init__(self, commands=None, max_concurrency=16, **kwargs):
+        if commands is None:
+            commands = GDriveCommands(**kwargs)
+        self.commands = commands
+        self.max_concurrency = max_concurrency
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        # A semaphore belongs to the event loop it is used in
+        loop = asyncio.get_running_loop()
+        if loop not in self._semaphores:
+            self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[loop]
+
+    async def _run(self, func, *args, **kwargs):
+        async with self._semaphore():
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, functools.partial(func, *args, **kwargs))
+
+    def close(self):
+        """Shut down the worker threads"""
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self._executor.shutdown(wait=False)
+
+    async def find(self, *path):
+        return await self._run(self.commands.find, *path)
+
+    async def ls(self, *path):
+        return await self._run(self.commands.ls, *path)
+
+    async def exists(self, *path):
+        return await self._run(self.commands.exists, *path)
+
+    async def find_many(self, paths, root=None):
+        """See GDriveCommands.find_many"""
+        return await self._run(self.commands.find_many, paths, root=root, max_workers=self.max_concurrency)
+
+    async def exists_many(self, paths, root=None):
+        """See GDriveCommands.exists_many"""
+        return await self._run(self.commands.exists_many, paths, root=root, max_workers=self.max_concurrency)
+
+    async def download_file(self, gdrive_file, download_to_path, overwrite=Overwrite.NEVER):
+        return await self._run(self.commands.download_file, gdrive_file, download_to_path, overwrite=overwrite)
+
+    async def _download(self, gdrive_file, local_path, overwrite):
+        try:
+            return await self.download_file(gdrive_file, local_path, overwrite=overwrite)
+        except Exception as e:
+            self.commands.logger.error("Failed to download {} to {}: {}".format(gdrive_file["title"], local_path, e))
+            return TransferResult(local_path, gdrive_file, TransferStatus.FAILED, e)
+
+    async def _run_downloads(self, jobs, overwrite, bundled=()):
+        jobs, conflicts = self.commands._unique_download_jobs(jobs)
+        results = await asyncio.gather(*[self._download(f, local_path, overwrite) for f, local_path in jobs])
+        report = TransferReport(results)
+        report.extend(conflicts)
+        for files, local_folder in bundled:
+            report.extend(await self._run(
+                bundle.download_bundles, self.commands, files, local_folder, overwrite, self.max_concurrency))
+        return report
+
+    async def download_files(self, gdrive_files, download_to_path, overwrite=Overwrite.NEVER):
+        """See GDriveCommands.download_files"""
+        gdrive_files = list(gdrive_files)
+        os.makedirs(download_to_path, exist_ok=True)
+        await self._run(self.commands._resolve_shortcuts, gdrive_files)
+
+        jobs = []
+        bundled = []
+        for file_ in gdrive_files:
+            if is_folder(file_):
+                folder_jobs, folder_bundled = await self._run(
+                    self.commands._folder_download_jobs, file_, download_to_path, self.max_concurrency)
+                jobs.extend(folder_jobs)
+                bundled.extend(folder_bundled)
+            else:
+                jobs.append((file_, os.path.join(download_to_path, file_["title"])))
+        return await self._run_downloads(jobs, overwrite, bundled)
+
+    async def download_folder(self, gdrive_folder, download_to_path, overwrite=Overwrite.NEVER):
+        """See GDriveCommands.download_folder"""
+        jobs, bundled = await self._run(
+            self.commands._folder_download_jobs, gdrive_folder, download_to_path, self.max_concurrency)
+        return await self._run_downloads(jobs, overwrite, bundled)
+
+    async def upload_file(self, local_file_path, upload_to, uploaded_name=None, overwrite=Overwrite.ON_MD5_CHECKSUM_CHANGE):
+        return await self._run(
+            self.commands.upload_file, local_file_path, upload_to, uploaded_name=uploaded_name, overwrite=overwrite)
+
+    async def upload_folder(
+            self,
+            local_folder_path,
+            upload_to,
+            uploaded_name=None,
+            overwrite_file=Overwrite.ON_MD5_CHECKSUM_CHANGE,
+            overwrite_folder=False,
+            bundle_threshold=None,
+            bundle_size=bundle.DEFAULT_BUNDLE_SIZE,
+            ):
+        """See GDriveCommands.upload_folder
+
+        The folder is uploaded by a single call that runs its own requests max_concurrency at a time.
+        """
+        return await self._run(
+            self.commands.upload_folder,
+            local_folder_path,
+            upload_to,
+            uploaded_name=uploaded_name,
+            overwrite_file=overwrite_file,
+            overwrite_folder=overwrite_folder,
+            max_workers=self.max_concurrency,
+            bundle_threshold=bundle_threshold,
+            bundle_size=bundle_size,
+        )
+
+
+__all__ = ["AsyncGDriveCommands"]
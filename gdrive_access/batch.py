@@ -0,0 +1,170 @@
+"""
+Group google drive metadata requests into multipart batch requests
+"""
+
+import collections
+import time
+
+from googleapiclient import errors
+from pydrive2.files import ApiRequestError, GoogleDriveFile
+
+from .ratelimit import is_rate_limit_error, is_retryable
+from .resumable import get_http
+from .snapshot import FOLDER_MIME_TYPE
+
+
+# The most requests google drive accepts in one batch
+BATCH_LIMIT = 100
+
+
+class BatchResult(collections.namedtuple("BatchResult", ["key", "file", "error"])):
+    """The outcome of one request of a batch
+
+    key: the key the request was added with
+    file (GoogleDriveFile or None): the file returned by the request (None for failed requests)
+    error (ApiRequestError or None): the error of a failed request
+    """
+    def __new__(cls, key, file, error=None):
+        return super().__new__(cls, key, file, error)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class MetadataBatch(object):
+    """Collects metadata requests and sends them to google drive BATCH_LIMIT at a time
+
+    Requests are added with a key (defaults to the request's position) that identifies
+    its BatchResult. execute() returns the results in the order requests were added;
+    a failed request does not affect the others. Requests that fail with retryable
+    errors are retried in a later batch, except that folder creations are only retried
+    after rate limit errors (see RequestScheduler.call). Each request counts against
+    the rate limit.
+
+    Params
+    ======
+    commands (GDriveCommands): the connection to send requests with
+
+    Example
+    =======
+    batch = g.batch()
+    for f in files:
+        batch.rename(f["id"], f["title"].lower(), key=f["id"])
+    for result in batch.execute():
+        if not result.ok:
+            print(result.key, result.error)
+    """
+    def __init__(self, commands):
+        self.commands = commands
+        self._requests = []
+
+    def __len__(self):
+        return len(self._requests)
+
+    def _service(self):
+        auth = self.commands.drive.auth
+        if auth.service is None:
+            auth.Authorize()
+        return auth.service
+
+    def add(self, make_request, key=None, idempotent=True):
+        """Add a request; make_request is called with the drive api service to build it
+
+        idempotent should be False for requests that create files.
+        """
+        self._requests.append((len(self._requests) if key is None else key, make_request, idempotent))
+
+    def get(self, file_id, fields=None, key=None):
+        """Fetch the metadata of a file (all of it, or only fields)"""
+        params = {"fileId": file_id, "supportsAllDrives": True}
+        if fields is not None:
+            params["fields"] = fields
+        self.add(lambda service: service.files().get(**params), key)
+
+    def shortcut_target(self, file_id, key=None):
+        """Fetch the shortcutDetails of a shortcut"""
+        self.get(file_id, fields="id,title,mimeType,shortcutDetails", key=key)
+
+    def create_folder(self, parent_id, title, key=None):
+        body = {"title": title, "parents": [{"id": parent_id}], "mimeType": FOLDER_MIME_TYPE}
+        self.add(lambda service: service.files().insert(body=body, supportsAllDrives=True), key, idempotent=False)
+
+    def trash(self, file_id, key=None):
+        self.add(lambda service: service.files().trash(fileId=file_id, supportsAllDrives=True), key)
+
+    def rename(self, file_id, title, key=None):
+        self.add(
+            lambda service: service.files().patch(fileId=file_id, body={"title": title}, supportsAllDrives=True),
+            key
+        )
+
+    def _send(self, requests):
+        """Send up to BATCH_LIMIT requests in one batch; returns {index: (response, error)}"""
+        responses = {}
+
+        def callback(request_id, response, exception):
+            responses[int(request_id)] = (response, exception)
+
+        service = self._service()
+        batch = service.new_batch_http_request(callback=callback)
+        for i, (_, make_request, _) in requests:
+            batch.add(make_request(service), request_id=str(i))
+
+        def execute():
+            try:
+                batch.execute(http=get_http(self.commands.drive))
+            except errors.HttpError as error:
+                raise ApiRequestError(error)
+        idempotent = all(idempotent for _, (_, _, idempotent) in requests)
+        self.commands._call(execute, kind="batch", cost=len(requests), idempotent=idempotent)
+        return responses
+
+    def execute(self):
+        """Send all requests added so far
+
+        Returns:
+            list of BatchResult, in the order the requests were added
+        """
+        scheduler = self.commands._scheduler
+        requests = list(enumerate(self._requests))
+        self._requests = []
+        pending = requests
+        outcomes = {}
+        attempt = 0
+        while pending:
+            retry = []
+            for start in range(0, len(pending), BATCH_LIMIT):
+                chunk = pending[start:start + BATCH_LIMIT]
+                for i, (response, exception) in self._send(chunk).items():
+                    if isinstance(exception, errors.HttpError):
+                        exception = ApiRequestError(exception)
+                    outcomes[i] = (response, exception)
+                    _, _, idempotent = requests[i][1]
+                    retryable = is_retryable(exception) if idempotent else is_rate_limit_error(exception)
+                    if exception is not None and retryable:
+                        retry.append(i)
+
+            if not retry or attempt >= scheduler.max_retries:
+                break
+            if scheduler.metrics is not None:
+                scheduler.metrics.inc("retries", len(retry), kind="batch_item")
+            if any(is_rate_limit_error(outcomes[i][1]) for i in retry):
+                scheduler._on_rate_limit()
+            time.sleep(scheduler.backoff(attempt))
+            attempt += 1
+            retry = set(retry)
+            pending = [item for item in pending if item[0] in retry]
+
+        results = []
+        for i, (key, _, _) in requests:
+            response, error = outcomes[i]
+            if error is not None:
+                results.append(BatchResult(key, None, error))
+            else:
+                file_ = GoogleDriveFile(auth=self.commands.drive.auth, metadata=response, uploaded=True)
+                results.append(BatchResult(key, file_))
+        return results
+
+
+__all__ = ["BATCH_LIMIT", "BatchResult", "MetadataBatch"]
@@ -0,0 +1,19 @@
+"""
+Benchmarks of GDriveCommands against a local fake google drive
+
+Run them with
+
+    python -m gdrive_access.benchmark --output results.json
+    python -m gdrive_access.benchmark --compare results.json
+    python -m gdrive_access.benchmark --import-time --import-budget 50
+
+or use FakeDriveServer directly to exercise GDriveCommands without network access:
+
+    with FakeDriveServer(latency=0.05) as server:
+        g = GDriveCommands(drive=server.client())
+"""
+
+from .fake_drive import FakeDrive, FakeDriveServer
+from .runner import OPERATIONS, format_results, load_results, run_benchmark, run_benchmarks, save_results
+from .startup import DEFAULT_IMPORT_BUDGET, IMPORTS, format_import_results, measure_import_time, run_import_benchmark
+from .trees import TREES, populate_drive, write_local
@@ -0,0 +1,46 @@
+import argparse
+import sys
+
+from .runner import OPERATIONS, format_results, load_results, run_benchmarks, save_results
+from .startup import DEFAULT_IMPORT_BUDGET, format_import_results, run_import_benchmark
+from .trees import TREES
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Benchmark GDriveCommands against a local fake google drive")
+    parser.add_argument("--trees", nargs="+", choices=list(TREES), default=list(TREES), help="Synthetic trees to use")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS), help="Operations to run")
+    parser.add_argument("--scale", type=int, default=1, help="Size multiplier of the trees")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Bytes per second for file contents")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail with a rate limit error")
+    parser.add_argument("--max-workers", type=int, default=8, help="max_workers of bulk operations")
+    parser.add_argument("--no-memory", action="store_true", help="Don't trace peak memory (faster)")
+    parser.add_argument("--output", type=str, default=None, help="Save the results to this json file")
+    parser.add_argument("--compare", type=str, default=None, help="Json file of earlier results to compare with")
+    parser.add_argument("--import-time", action="store_true", help="Only time importing the package, in fresh interpreters")
+    parser.add_argument("--import-budget", type=float, default=DEFAULT_IMPORT_BUDGET * 1000,
+        help="Milliseconds 'import gdrive_access' may take; --import-time exits with status 1 if it takes longer")
+    args = parser.parse_args()
+
+    if args.import_time:
+        budget = args.import_budget / 1000
+        results = run_import_benchmark(budget=budget)
+        print(format_import_results(results, budget))
+        sys.exit(1 if any(r["over_budget"] for r in results) else 0)
+
+    settings = {
+        "scale": args.scale,
+        "latency": args.latency,
+        "bandwidth": args.bandwidth,
+        "error_rate": args.error_rate,
+        "max_workers": args.max_workers,
+    }
+    results = run_benchmarks(args.trees, args.operations, measure_memory=not args.no_memory, **settings)
+    print(format_results(results, load_results(args.compare) if args.compare else None))
+    if args.output:
+        save_results(results, args.output, settings)
+
+
+if __name__ == "__main__":
+    run()
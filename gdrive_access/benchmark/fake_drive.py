@@ -0,0 +1,694 @@
+"""
+In-process fake of the google drive v2 REST endpoints used by gdrive_access
+
+Serves files.list/get/insert/update/patch/trash, media downloads (with Range
+support), resumable uploads, the changes feed and the batch endpoint over a local
+http server, so that GDriveCommands can be exercised against it with the real
+pydrive2/googleapiclient stack and no network access.
+"""
+
+import collections
+import email.parser
+import email.policy
+import hashlib
+import http.server
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+import uuid
+
+import googleapiclient.discovery_cache
+import httplib2
+from googleapiclient.discovery import build_from_document
+from pydrive2.auth import GoogleAuth
+from pydrive2.drive import GoogleDrive
+
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+SHORTCUT_MIME_TYPE = "application/vnd.google-apps.shortcut"
+
+# The most results google drive returns per page of files.list and changes.list
+MAX_RESULTS = 1000
+
+
+class QueryError(Exception):
+    """The files.list query could not be parsed"""
+
+
+_TOKEN_RE = re.compile(r"""\s*(?:(?P<str>'(?:\\.|[^'\\])*')|(?P<op>!=|<=|>=|=|<|>|\(|\))|(?P<word>[A-Za-z_][A-Za-z0-9_]*))""")
+
+
+def _tokenize(q):
+    tokens = []
+    pos = 0
+    q = q.strip()
+    while pos < len(q):
+        match = _TOKEN_RE.match(q, pos)
+        if not match:
+            raise QueryError("Cannot parse query at {!r}".format(q[pos:]))
+        pos = match.end()
+        if match.group("str") is not None:
+            tokens.append(("str", re.sub(r"\\(.)", r"\1", match.group("str")[1:-1])))
+        elif match.group("op") is not None:
+            tokens.append(("op", match.group("op")))
+        else:
+            tokens.append(("word", match.group("word")))
+    return tokens
+
+
+class _QueryParser(object):
+    """Recursive descent parser for the subset of the drive query language we use"""
+    def __init__(self, q):
+        self.tokens = _tokenize(q)
+        self.pos = 0
+
+    def parse(self):
+        expr = self._or()
+        if self.pos != len(self.tokens):
+            raise QueryError("Unexpected token {}".format(self.tokens[self.pos]))
+        return expr
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _next(self):
+        token = self._peek()
+        self.pos += 1
+        return token
+
+    def _or(self):
+        terms = [self._and()]
+        while self._peek() == ("word", "or"):
+            self._next()
+            terms.append(self._and())
+        return lambda f: any(t(f) for t in terms)
+
+    def _and(self):
+        terms = [self._not()]
+        while self._peek() == ("word", "and"):
+            self._next()
+            terms.append(self._not())
+        return lambda f: all(t(f) for t in terms)
+
+    def _not(self):
+        if self._peek() == ("word", "not"):
+            self._next()
+            term = self._not()
+            return lambda f: not term(f)
+        return self._atom()
+
+    def _atom(self):
+        kind, value = self._next()
+        if (kind, value) == ("op", "("):
+            expr = self._or()
+            if self._next() != ("op", ")"):
+                raise QueryError("Unbalanced parentheses")
+            return expr
+
+        if kind == "str":
+            if self._next() != ("word", "in"):
+                raise QueryError("Expected 'in' after {!r}".format(value))
+            field = self._next()[1]
+            if field != "parents":
+                raise QueryError("Only 'in parents' is supported")
+            return lambda f: any(p["id"] == value for p in f.get("parents", []))
+
+        if kind != "word":
+            raise QueryError("Unexpected token {!r}".format(value))
+
+        field = value
+        if field == "sharedWithMe" and self._peek()[0] != "op":
+            return lambda f: bool(f.get("sharedWithMeDate"))
+
+        op_kind, op = self._next()
+        if op_kind == "word" and op == "contains":
+            operand = self._next()[1]
+            return lambda f: operand.lower() in f.get(field, "").lower()
+        if op_kind != "op":
+            raise QueryError("Expected comparison after {}".format(field))
+
+        operand_kind, operand = self._next()
+        if operand_kind == "word":
+            operand = {"true": True, "false": False}[operand]
+
+        def value_of(f):
+            if field == "sharedWithMe":
+                return bool(f.get("sharedWithMeDate"))
+            if field == "trashed":
+                return f.get("labels", {}).get("trashed", False)
+            return f.get(field)
+
+        comparisons = {
+            "=": lambda a, b: a == b,
+            "!=": lambda a, b: a != b,
+            "<": lambda a, b: a is not None and a < b,
+            "<=": lambda a, b: a is not None and a <= b,
+            ">": lambda a, b: a is not None and a > b,
+            ">=": lambda a, b: a is not None and a >= b,
+        }
+        compare = comparisons[op]
+        return lambda f: compare(value_of(f), operand)
+
+
+def parse_query(q):
+    """Compile a drive v2 query string into a predicate on file metadata dicts"""
+    if not q:
+        return lambda f: True
+    return _QueryParser(q).parse()
+
+
+def _parse_fields(fields):
+    """Parse a partial response fields string into a nested dict (None means all)"""
+    result = {}
+    stack = [result]
+    name = ""
+    for char in fields + ",":
+        if char in ",()":
+            name = name.strip()
+            if name:
+                node = stack[-1]
+                for part in name.split("/")[:-1]:
+                    node = node.setdefault(part, {})
+                node[name.split("/")[-1]] = {} if char == "(" else None
+                if char == "(":
+                    stack.append(node[name.split("/")[-1]])
+            if char == ")":
+                stack.pop()
+            name = ""
+        else:
+            name += char
+    return result
+
+
+def _project(value, spec):
+    if spec is None or "*" in spec:
+        return value
+    if isinstance(value, list):
+        return [_project(v, spec) for v in value]
+    if not isinstance(value, dict):
+        return value
+    result = {}
+    for key, subspec in spec.items():
+        if key in value:
+            result[key] = _project(value[key], subspec) if subspec else value[key]
+    return result
+
+
+def _now():
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+
+
+class FakeDrive(object):
+    """The in-memory state of the fake drive
+
+    Params
+    ======
+    latency (float, default=0): seconds added to every request
+    bandwidth (float, default=None): bytes per second for media downloads and uploads, unlimited if None
+    error_rate (float, default=0): probability that a request fails with a retryable error
+    seed (int, default=0): seed for error injection
+    """
+    ROOT_ID = "0AROOTFOLDER"
+
+    def __init__(self, latency=0.0, bandwidth=None, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self.files = {}
+        self.content = {}
+        self.changes = []
+        self.sessions = {}
+        self.calls = collections.Counter()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.files[self.ROOT_ID] = {
+            "kind": "drive#file",
+            "id": self.ROOT_ID,
+            "title": "My Drive",
+            "mimeType": FOLDER_MIME_TYPE,
+            "parents": [],
+            "labels": {"trashed": False},
+            "modifiedDate": _now(),
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.bytes_sent = 0
+            self.bytes_received = 0
+
+    def _new_id(self):
+        return "fake{:08d}".format(next(self._ids))
+
+    def _record_change(self, file_id):
+        self.changes.append(file_id)
+
+    def _parent_ref(self, parent_id):
+        parent_id = self.ROOT_ID if parent_id == "root" else parent_id
+        return {"kind": "drive#parentReference", "id": parent_id, "isRoot": parent_id == self.ROOT_ID}
+
+    def add_file(self, title, parent_id="root", content=b"", mime_type="application/octet-stream",
+            shared_with_me=False, **metadata):
+        """Create a file directly in the fake drive and return its metadata"""
+        with self._lock:
+            file_id = self._new_id()
+            parents = [self._parent_ref(parent_id)] if parent_id else []
+            meta = {
+                "kind": "drive#file",
+                "id": file_id,
+                "title": title,
+                "mimeType": mime_type,
+                "parents": parents,
+                "labels": {"trashed": False},
+                "modifiedDate": _now(),
+            }
+            if shared_with_me:
+                meta["sharedWithMeDate"] = _now()
+            self.files[file_id] = meta
+            # Folders, shortcuts and google docs have no contents
+            if not mime_type.startswith("application/vnd.google-apps."):
+                self._set_content(file_id, content)
+            meta.update(metadata)
+            self._record_change(file_id)
+            return meta
+
+    def add_folder(self, title, parent_id="root", **metadata):
+        return self.add_file(title, parent_id, mime_type=FOLDER_MIME_TYPE, **metadata)
+
+    def add_shortcut(self, title, target_id, parent_id="root"):
+        return self.add_file(title, parent_id, mime_type=SHORTCUT_MIME_TYPE, shortcutDetails={
+            "targetId": target_id,
+            "targetMimeType": self.files[target_id]["mimeType"],
+        })
+
+    def _set_content(self, file_id, content):
+        self.content[file_id] = content
+        meta = self.files[file_id]
+        meta["fileSize"] = str(len(content))
+        meta["md5Checksum"] = hashlib.md5(content).hexdigest()
+        meta["modifiedDate"] = _now()
+
+    def trash(self, file_id):
+        with self._lock:
+            self.files[file_id]["labels"]["trashed"] = True
+            self._record_change(file_id)
+            return self.files[file_id]
+
+    def update(self, file_id, body=None, content=None):
+        with self._lock:
+            meta = self.files[file_id]
+            for key, value in (body or {}).items():
+                if key == "parents":
+                    meta["parents"] = [self._parent_ref(p["id"]) for p in value]
+                elif key == "labels":
+                    meta["labels"].update(value)
+                elif key != "id":
+                    meta[key] = value
+            if content is not None:
+                self._set_content(file_id, content)
+            meta["modifiedDate"] = _now()
+            self._record_change(file_id)
+            return meta
+
+    def insert(self, body, content=None):
+        body = dict(body or {})
+        parents = body.pop("parents", None) or [{"id": "root"}]
+        mime_type = body.pop("mimeType", None) or "application/octet-stream"
+        title = body.pop("title", "Untitled")
+        with self._lock:
+            meta = self.add_file(title, parents[0]["id"], content=content or b"", mime_type=mime_type, **body)
+            meta["parents"] = [self._parent_ref(p["id"]) for p in parents]
+            return meta
+
+    def get(self, file_id):
+        file_id = self.ROOT_ID if file_id == "root" else file_id
+        return self.files.get(file_id)
+
+    def list(self, q=None):
+        predicate = parse_query(q.replace("'root' in parents", "'{}' in parents".format(self.ROOT_ID)) if q else q)
+        with self._lock:
+            return [f for f in self.files.values() if f["id"] != self.ROOT_ID and predicate(f)]
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def drive(self):
+        return self.server.drive
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        self.drive.bytes_received += len(body)
+        return body
+
+    def _send(self, status, body=b"", content_type="application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _error(self, status, reason, message=""):
+        self._send(status, {"error": {
+            "code": status,
+            "message": message or reason,
+            "errors": [{"domain": "global", "reason": reason, "message": message or reason}],
+        }})
+
+    def _handle(self, method):
+        drive = self.drive
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        body = self._read_body()
+
+        if drive.latency:
+            time.sleep(drive.latency)
+        if drive.bandwidth and url.path.startswith("/upload/"):
+            time.sleep(len(body) / drive.bandwidth)
+
+        if drive.error_rate and url.path != "/batch/drive/v2":
+            with drive._lock:
+                fail = drive._random.random() < drive.error_rate
+            if fail:
+                drive.calls["error"] += 1
+                return self._error(429, "rateLimitExceeded", "Injected rate limit error")
+
+        status, response, content_type, headers = dispatch(drive, method, url.path, query, self.headers, body)
+        if content_type != "application/json" and drive.bandwidth:
+            time.sleep(len(response) / drive.bandwidth)
+        if content_type != "application/json":
+            drive.bytes_sent += len(response)
+        self._send(status, response, content_type, headers)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+def _error_body(status, reason):
+    return status, {"error": {
+        "code": status, "message": reason, "errors": [{"domain": "global", "reason": reason, "message": reason}]
+    }}, "application/json", {}
+
+
+def _json(body, fields=None):
+    if fields:
+        body = _project(body, _parse_fields(fields))
+    return 200, body, "application/json", {}
+
+
+def dispatch(drive, method, path, query, headers, body):
+    """Route a single request; returns (status, body, content_type, headers)"""
+    parts = [p for p in path.split("/") if p]
+
+    if parts[:3] == ["batch", "drive", "v2"]:
+        drive.calls["batch"] += 1
+        return _dispatch_batch(drive, headers, body)
+
+    if parts[:3] == ["upload", "drive", "v2"]:
+        return _dispatch_upload(drive, method, parts[3:], query, headers, body)
+
+    if parts[:2] != ["drive", "v2"]:
+        return _error_body(404, "notFound")
+    parts = parts[2:]
+
+    if parts == ["files"] and method == "GET":
+        drive.calls["files.list"] += 1
+        try:
+            items = drive.list(query.get("q"))
+        except QueryError as e:
+            return _error_body(400, str(e))
+        start = int(query.get("pageToken") or 0)
+        page_size = int(query.get("maxResults") or 100)
+        if not 0 < page_size <= MAX_RESULTS:
+            return _error_body(400, "invalid")
+        page = items[start:start + page_size]
+        result = {"kind": "drive#fileList", "items": page}
+        if start + page_size < len(items):
+            result["nextPageToken"] = str(start + page_size)
+        return _json(result, query.get("fields"))
+
+    if parts == ["files"] and method == "POST":
+        drive.calls["files.insert"] += 1
+        return _json(drive.insert(json.loads(body or b"{}")), query.get("fields"))
+
+    if len(parts) >= 2 and parts[0] == "files":
+        file_ = drive.get(parts[1])
+        if file_ is None:
+            return _error_body(404, "notFound")
+
+        if len(parts) == 3 and parts[2] == "trash" and method == "POST":
+            drive.calls["files.trash"] += 1
+            return _json(drive.trash(file_["id"]))
+
+        if method == "GET" and query.get("alt") == "media":
+            drive.calls["files.get_media"] += 1
+            content = drive.content.get(file_["id"])
+            if content is None:
+                return _error_body(403, "fileNotDownloadable")
+            range_header = headers.get("Range") or headers.get("range")
+            if range_header:
+                start, _, end = range_header.split("=", 1)[1].partition("-")
+                start = int(start)
+                end = min(int(end) if end else len(content) - 1, len(content) - 1)
+                if start >= len(content):
+                    return 416, b"", "application/octet-stream", {"Content-Range": "bytes */{}".format(len(content))}
+                return 206, content[start:end + 1], "application/octet-stream", {
+                    "Content-Range": "bytes {}-{}/{}".format(start, end, len(content))
+                }
+            return 200, content, "application/octet-stream", {}
+
+        if method == "GET":
+            drive.calls["files.get"] += 1
+            return _json(file_, query.get("fields"))
+
+        if method in ("PATCH", "PUT"):
+            drive.calls["files.update"] += 1
+            return _json(drive.update(file_["id"], json.loads(body or b"{}")), query.get("fields"))
+
+        if method == "DELETE":
+            drive.calls["files.delete"] += 1
+            with drive._lock:
+                del drive.files[file_["id"]]
+            return 204, b"", "application/json", {}
+
+    if parts == ["changes", "startPageToken"]:
+        drive.calls["changes.getStartPageToken"] += 1
+        return _json({"startPageToken": str(len(drive.changes))})
+
+    if parts == ["changes"] and method == "GET":
+        drive.calls["changes.list"] += 1
+        start = int(query.get("pageToken") or 0)
+        page_size = int(query.get("maxResults") or 100)
+        if not 0 < page_size <= MAX_RESULTS:
+            return _error_body(400, "invalid")
+        with drive._lock:
+            ids = drive.changes[start:start + page_size]
+            items = [{
+                "kind": "drive#change",
+                "id": str(start + i),
+                "fileId": file_id,
+                "deleted": file_id not in drive.files,
+                "file": drive.files.get(file_id),
+            } for i, file_id in enumerate(ids)]
+            result = {"kind": "drive#changeList", "items": items}
+            if start + page_size < len(drive.changes):
+                result["nextPageToken"] = str(start + page_size)
+            else:
+                result["newStartPageToken"] = str(len(drive.changes))
+        return _json(result, query.get("fields"))
+
+    return _error_body(404, "notFound")
+
+
+def _dispatch_upload(drive, method, parts, query, headers, body):
+    upload_type = query.get("uploadType")
+    session_id = query.get("upload_id")
+
+    if session_id:
+        session = drive.sessions.get(session_id)
+        if session is None:
+            return _error_body(404, "notFound")
+        content_range = headers.get("Content-Range", "")
+        match = re.match(r"bytes (\*|(\d+)-(\d+))/(\*|\d+)", content_range)
+        total = None
+        if match and match.group(4) != "*":
+            total = int(match.group(4))
+        if match and match.group(2) is not None:
+            start = int(match.group(2))
+            if start != len(session["data"]):
+                return _error_body(400, "badContentRange")
+            session["data"] += body
+        elif not content_range:
+            # No Content-Range means the body is the whole (possibly empty) file
+            session["data"] += body
+            total = len(session["data"])
+        if total is None or len(session["data"]) < total:
+            received = len(session["data"])
+            extra = {"Range": "bytes=0-{}".format(received - 1)} if received else {}
+            return 308, b"", "application/json", extra
+        del drive.sessions[session_id]
+        drive.calls["upload.complete"] += 1
+        if session["file_id"]:
+            return _json(drive.update(session["file_id"], session["body"], bytes(session["data"])))
+        return _json(drive.insert(session["body"], bytes(session["data"])))
+
+    file_id = parts[1] if len(parts) > 1 else None
+
+    if upload_type == "resumable":
+        drive.calls["upload.start"] += 1
+        session_id = uuid.uuid4().hex
+        drive.sessions[session_id] = {
+            "body": json.loads(body or b"{}"),
+            "data": bytearray(),
+            "file_id": file_id,
+        }
+        location = "http://{}/upload/drive/v2/files?uploadType=resumable&upload_id={}".format(
+            headers.get("Host"), session_id)
+        return 200, b"", "application/json", {"Location": location}
+
+    if upload_type == "multipart":
+        drive.calls["upload.multipart"] += 1
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b"Content-Type: " + headers.get("Content-Type").encode() + b"\r\n\r\n" + body)
+        meta_part, media_part = list(message.iter_parts())
+        meta = json.loads(meta_part.get_content())
+        content = media_part.get_payload(decode=True)
+        if file_id:
+            return _json(drive.update(file_id, meta, content))
+        return _json(drive.insert(meta, content))
+
+    drive.calls["upload.media"] += 1
+    if file_id:
+        return _json(drive.update(file_id, content=body))
+    return _json(drive.insert({}, body))
+
+
+def _dispatch_batch(drive, headers, body):
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + headers.get("Content-Type").encode() + b"\r\n\r\n" + body)
+    boundary = "batch_" + uuid.uuid4().hex
+    chunks = []
+    for part in message.iter_parts():
+        raw = part.get_payload(decode=True)
+        head, _, sub_body = raw.partition(b"\r\n\r\n")
+        if not _:
+            head, _, sub_body = raw.partition(b"\n\n")
+        lines = head.decode().splitlines()
+        method, target = lines[0].split(" ")[:2]
+        sub_headers = dict(line.split(": ", 1) for line in lines[1:] if ": " in line)
+        url = urllib.parse.urlsplit(target)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        status, response, content_type, extra = dispatch(
+            drive, method, url.path, query, sub_headers, sub_body.rstrip(b"\r\n"))
+        if isinstance(response, (dict, list)):
+            response = json.dumps(response).encode()
+        chunks.append(
+            "--{}\r\nContent-Type: application/http\r\nContent-ID: <response-{}>\r\n\r\n"
+            "HTTP/1.1 {} OK\r\nContent-Type: {}\r\nContent-Length: {}\r\n\r\n".format(
+                boundary, part["Content-ID"].strip("<>"), status, content_type, len(response)
+            ).encode() + response + b"\r\n"
+        )
+    payload = b"".join(chunks) + "--{}--\r\n".format(boundary).encode()
+    return 200, payload, "multipart/mixed; boundary={}".format(boundary), {}
+
+
+class FakeDriveServer(object):
+    """Serve a FakeDrive over http on localhost
+
+    Use as a context manager:
+
+        with FakeDriveServer() as server:
+            g = GDriveCommands(drive=server.client())
+    """
+    def __init__(self, drive=None, **kwargs):
+        self.drive = drive or FakeDrive(**kwargs)
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return "http://{}:{}/".format(*self._server.server_address[:2])
+
+    def start(self):
+        self._server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.drive = self.drive
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def auth(self):
+        return FakeAuth(self.url)
+
+    def client(self):
+        """A pydrive2 GoogleDrive connected to this server"""
+        return GoogleDrive(self.auth())
+
+
+def _build_http():
+    http = httplib2.Http()
+    http.redirect_codes = http.redirect_codes - {308}
+    return http
+
+
+class FakeAuth(GoogleAuth):
+    """A GoogleAuth that talks to a FakeDriveServer instead of google"""
+    def __init__(self, url):
+        super().__init__(settings_file=os.devnull)
+        document = googleapiclient.discovery_cache.get_static_doc("drive", "v2")
+        document = json.loads(document)
+        document["rootUrl"] = url
+        document["baseUrl"] = url + document["servicePath"]
+        self.http = _build_http()
+        self.service = build_from_document(document, http=self.http)
+
+    @property
+    def access_token_expired(self):
+        return False
+
+    def Get_Http_Object(self):
+        return _build_http()
+
+
+__all__ = ["FakeAuth", "FakeDrive", "FakeDriveServer"]
@@ -0,0 +1,174 @@
+"""
+Run GDriveCommands operations against a FakeDriveServer and measure them
+"""
+
+import json
+import logging
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from .fake_drive import FakeDriveServer
+from .trees import TREES, populate_drive, tree_size, write_local
+
+
+OPERATIONS = ("find", "ls", "snapshot", "download_folder", "upload_folder")
+
+
+def _deepest_file(tree):
+    return max((path for path, _ in tree), key=len)
+
+
+def _largest_folder(tree):
+    counts = {}
+    for path, _ in tree:
+        counts[path[:-1]] = counts.get(path[:-1], 0) + 1
+    return max(counts, key=counts.get)
+
+
+def _operation(g, operation, root, tree, workdir, max_workers):
+    """A function that runs the operation once, and the number of files and bytes it handles"""
+    if operation == "find":
+        return lambda: g.find(root, *_deepest_file(tree)), 1, 0
+    if operation == "ls":
+        folder = _largest_folder(tree)
+        return lambda: g.ls(root, *folder), sum(1 for path, _ in tree if path[:-1] == folder), 0
+    if operation == "snapshot":
+        return lambda: g.snapshot(root, max_workers=max_workers), len(tree), 0
+    if operation == "download_folder":
+        return lambda: g.download_folder(root, workdir, max_workers=max_workers), len(tree), tree_size(tree)
+    if operation == "upload_folder":
+        return lambda: g.upload_folder(workdir, root, max_workers=max_workers), len(tree), tree_size(tree)
+    raise ValueError("Unknown operation {}. Choose from {}".format(operation, OPERATIONS))
+
+
+def run_benchmark(
+        tree_name,
+        operation,
+        scale=1,
+        latency=0.0,
+        bandwidth=None,
+        error_rate=0.0,
+        max_workers=8,
+        measure_memory=True,
+        **commands_kwargs
+        ):
+    """Time one operation on one synthetic tree against a fresh fake drive
+
+    The tree is created on the fake drive (or, for upload_folder, in a temporary local folder)
+    before measuring. Peak memory is measured with tracemalloc and includes the fake server,
+    which runs in the same process.
+
+    Params
+    ======
+    tree_name (str): one of trees.TREES
+    operation (str): one of OPERATIONS
+    scale (int, default=1): size multiplier of the tree
+    latency, bandwidth, error_rate: see FakeDrive
+    max_workers (int, default=8): max_workers of the operations that take it
+    measure_memory (bool, default=True): trace memory allocations (makes the operation slower)
+    **commands_kwargs: passed to GDriveCommands (qps defaults to None, no rate limit)
+
+    Returns:
+        dict of measurements
+    """
+    from ..access import GDriveCommands
+
+    tree = TREES[tree_name](scale)
+    workdir = tempfile.mkdtemp(prefix="gdrive_benchmark_")
+    commands_kwargs.setdefault("qps", None)
+    commands_kwargs.setdefault("log_level", logging.WARNING)
+    try:
+        with FakeDriveServer(latency=latency, bandwidth=bandwidth, error_rate=error_rate) as server:
+            if operation == "upload_folder":
+                write_local(tree, workdir)
+                root = server.drive.add_folder("benchmark")
+            else:
+                root = populate_drive(server.drive, tree)
+
+            g = GDriveCommands(drive=server.client(), **commands_kwargs)
+            root = g.find(root["title"])
+            run, n_files, n_bytes = _operation(g, operation, root, tree, workdir, max_workers)
+
+            server.drive.reset_stats()
+            if measure_memory:
+                tracemalloc.start()
+            start = time.perf_counter()
+            run()
+            seconds = time.perf_counter() - start
+            peak_memory = tracemalloc.get_traced_memory()[1] if measure_memory else None
+            if measure_memory:
+                tracemalloc.stop()
+
+            calls = dict(server.drive.calls)
+            transferred = server.drive.bytes_sent + server.drive.bytes_received
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "tree": tree_name,
+        "operation": operation,
+        "files": n_files,
+        "bytes": n_bytes,
+        "api_calls": sum(n for call, n in calls.items() if call != "error"),
+        "calls": calls,
+        "bytes_transferred": transferred,
+        "seconds": seconds,
+        "files_per_second": n_files / seconds if seconds else None,
+        "megabytes_per_second": transferred / seconds / 1e6 if seconds else None,
+        "peak_memory_bytes": peak_memory,
+    }
+
+
+def run_benchmarks(trees=None, operations=None, **kwargs):
+    """Run every operation on every tree; see run_benchmark for the keyword arguments"""
+    results = []
+    for tree_name in trees or TREES:
+        for operation in operations or OPERATIONS:
+            results.append(run_benchmark(tree_name, operation, **kwargs))
+    return results
+
+
+def save_results(results, path, settings=None):
+    """Save results as json, along with the package version and settings they were run with"""
+    from .. import __version__
+
+    with open(path, "w") as f:
+        json.dump({
+            "version": __version__,
+            "python": platform.python_version(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "settings": settings or {},
+            "results": results,
+        }, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def format_results(results, baseline=None):
+    """A text table of results, with the change in time and api calls relative to baseline results if given"""
+    baseline = {(r["tree"], r["operation"]): r for r in baseline or []}
+    header = "{:<12} {:<16} {:>7} {:>10} {:>10} {:>10} {:>10}".format(
+        "tree", "operation", "files", "api calls", "seconds", "MB/s", "peak MB")
+    if baseline:
+        header += " {:>9} {:>9}".format("time", "calls")
+    lines = [header]
+    for r in results:
+        line = "{:<12} {:<16} {:>7} {:>10} {:>10.3f} {:>10.2f} {:>10}".format(
+            r["tree"], r["operation"], r["files"], r["api_calls"], r["seconds"], r["megabytes_per_second"] or 0,
+            "-" if r["peak_memory_bytes"] is None else "{:.1f}".format(r["peak_memory_bytes"] / 1e6))
+        old = baseline.get((r["tree"], r["operation"]))
+        if old is not None:
+            line += " {:>8.2f}x {:>8.2f}x".format(
+                r["seconds"] / old["seconds"] if old["seconds"] else float("nan"),
+                r["api_calls"] / old["api_calls"] if old["api_calls"] else float("nan"))
+        lines.append(line)
+    return "\n".join(lines)
+
+
+__all__ = ["OPERATIONS", "format_results", "load_results", "run_benchmark", "run_benchmarks", "save_results"]
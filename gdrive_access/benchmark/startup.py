@@ -0,0 +1,64 @@
+"""
+How long importing gdrive_access takes in a fresh interpreter
+"""
+
+import statistics
+import subprocess
+import sys
+
+
+# Seconds that "import gdrive_access" should stay under
+DEFAULT_IMPORT_BUDGET = 0.05
+
+# Imports that commonly start a script using gdrive_access
+IMPORTS = (
+    "import gdrive_access",
+    "from gdrive_access import MetadataCache, FileRecord",
+    "from gdrive_access import GDriveCommands",
+)
+
+
+def _run_seconds(code):
+    """Seconds a fresh interpreter takes to run code, timed inside it so interpreter startup isn't counted"""
+    script = "import time; start = time.perf_counter(); {}; print(time.perf_counter() - start)".format(code)
+    output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_import_time(statement="import gdrive_access", runs=5):
+    """Median seconds that statement takes in a fresh interpreter, over several runs"""
+    return statistics.median(_run_seconds(statement) for _ in range(runs))
+
+
+def run_import_benchmark(statements=IMPORTS, runs=5, budget=None):
+    """Measure each import statement
+
+    Params
+    ======
+    statements (tuple of str): the import statements to time
+    runs (int, default=5): fresh interpreters per statement (the median is reported)
+    budget (float, optional): seconds that "import gdrive_access" may take
+
+    Returns:
+        list of {"statement", "seconds", "over_budget"} dicts. Only the plain package import is held to the budget.
+    """
+    results = []
+    for statement in statements:
+        seconds = measure_import_time(statement, runs)
+        results.append({
+            "statement": statement,
+            "seconds": seconds,
+            "over_budget": budget is not None and statement == "import gdrive_access" and seconds > budget,
+        })
+    return results
+
+
+def format_import_results(results, budget=None):
+    lines = ["{:<55} {:>10}".format("statement", "ms")]
+    for r in results:
+        lines.append("{:<55} {:>10.1f}{}".format(
+            r["statement"], r["seconds"] * 1000, "  over budget of {:g} ms".format(budget * 1000) if r["over_budget"] else ""))
+    return "\n".join(lines)
+
+
+__all__ = ["DEFAULT_IMPORT_BUDGET", "IMPORTS", "format_import_results", "measure_import_time", "run_import_benchmark"]
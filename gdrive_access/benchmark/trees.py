@@ -0,0 +1,80 @@
+"""
+Synthetic folder trees for benchmarks
+
+A tree is a list of (path, size) tuples, where path is a tuple of folder names
+ending with the file name. The same tree can be created on a FakeDrive (to
+benchmark listings and downloads) or on the local filesystem (for uploads).
+"""
+
+import os
+
+
+def deep_tree(scale=1):
+    """A chain of 20 * scale nested folders with a few small files at every depth"""
+    tree = []
+    folders = ()
+    for depth in range(20 * scale):
+        folders = folders + ("level{:03d}".format(depth),)
+        tree.extend((folders + ("file{}.txt".format(i),), 1024) for i in range(3))
+    return tree
+
+
+def wide_tree(scale=1):
+    """A single folder with 2000 * scale small files"""
+    return [(("file{:06d}.txt".format(i),), 256) for i in range(2000 * scale)]
+
+
+def many_small_tree(scale=1):
+    """50 * scale folders of 40 files of 4 KB each"""
+    return [
+        (("folder{:04d}".format(folder), "file{:03d}.dat".format(i)), 4 * 1024)
+        for folder in range(50 * scale)
+        for i in range(40)
+    ]
+
+
+def few_huge_tree(scale=1):
+    """4 files of 32 MB * scale each"""
+    return [(("huge{}.bin".format(i),), 32 * 1024 * 1024 * scale) for i in range(4)]
+
+
+TREES = {
+    "deep": deep_tree,
+    "wide": wide_tree,
+    "many_small": many_small_tree,
+    "few_huge": few_huge_tree,
+}
+
+
+def _content(path, size):
+    """Deterministic contents for a file, cheap to generate for large sizes"""
+    block = ("/".join(path) + "\n").encode() * (1024 // (len("/".join(path)) + 1) + 1)
+    return (block * (size // len(block) + 1))[:size]
+
+
+def populate_drive(drive, tree, root_title="benchmark", parent_id="root"):
+    """Create a tree in a FakeDrive under a new folder root_title; returns the root folder's metadata"""
+    root = drive.add_folder(root_title, parent_id)
+    folder_ids = {(): root["id"]}
+    for path, size in tree:
+        for depth in range(1, len(path)):
+            if path[:depth] not in folder_ids:
+                folder_ids[path[:depth]] = drive.add_folder(path[depth - 1], folder_ids[path[:depth - 1]])["id"]
+        drive.add_file(path[-1], folder_ids[path[:-1]], _content(path, size))
+    return root
+
+
+def write_local(tree, local_path):
+    """Write a tree to the local filesystem below local_path"""
+    for path, size in tree:
+        file_path = os.path.join(local_path, *path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, "wb") as f:
+            f.write(_content(path, size))
+
+
+def tree_size(tree):
+    return sum(size for _, size in tree)
+
+
+__all__ = ["TREES", "deep_tree", "few_huge_tree", "many_small_tree", "populate_drive", "wide_tree", "write_local"]
@@ -0,0 +1,220 @@
+"""
+A local content-addressed store of downloaded files, so identical contents are only downloaded once
+"""
+
+import collections
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+
+LINK_METHODS = ("reflink", "hardlink", "copy")
+
+# Hardlinks are left out by default: every file placed from a blob would share one inode, so
+# editing any of them in place would change all the others too
+DEFAULT_LINK_METHODS = ("reflink", "copy")
+
+# ioctl request number for cloning a file's extents (btrfs, xfs, ...) on linux
+FICLONE = 0x40049409
+
+
+def _reflink(src, dst):
+    import fcntl
+
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+
+
+def _hardlink(src, dst):
+    os.link(src, dst)
+
+
+def _copy(src, dst):
+    shutil.copyfile(src, dst)
+
+
+_LINKERS = {"reflink": _reflink, "hardlink": _hardlink, "copy": _copy}
+
+
+class BlobStore(object):
+    """Files downloaded from google drive, stored once per md5 checksum
+
+    Each blob is kept at <path>/<first two hex digits>/<md5> and indexed in a sqlite database
+    (in WAL mode, so several processes can share a store). Blobs are placed at their destinations
+    with the first of the link methods that works: a reflink (a copy-on-write clone, on filesystems
+    that support it), a hardlink (same filesystem; opt in only if the files won't be edited in place,
+    since all the files placed from one blob then share their contents) or a plain copy. Destinations
+    are replaced atomically, never written to in place, so a blob can't be changed through a path it
+    was placed at by a later download. A blob whose size or modification time has changed since it
+    was stored (e.g. a hardlinked copy was edited in place) is discarded.
+
+    Once the store grows beyond max_size bytes, the least recently used blobs are deleted.
+
+    Params
+    ======
+    path (str): folder to keep the blobs and index in (created if it doesn't exist)
+    max_size (int, optional): maximum total size of the blobs in bytes. Unbounded if None
+    link (str or tuple of str, default=("reflink", "copy")): link methods to try, in order, from
+        "reflink", "hardlink" and "copy"
+    """
+    def __init__(self, path, max_size=None, link=DEFAULT_LINK_METHODS):
+        self.path = path = os.path.expanduser(path)
+        self.max_size = max_size
+        self.link_methods = (link,) if isinstance(link, str) else tuple(link)
+        for method in self.link_methods:
+            if method not in _LINKERS:
+                raise ValueError("Unknown link method {}. Choose from {}".format(method, LINK_METHODS))
+
+        os.makedirs(os.path.join(path, "tmp"), exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._md5_locks = collections.defaultdict(threading.Lock)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS blobs ("
+                "md5 TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, last_used REAL)"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.path, "index.db"), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def blob_path(self, md5):
+        return os.path.join(self.path, md5[:2], md5)
+
+    def temp_path(self, md5):
+        """A fixed place to download the contents of md5 to before adding them with put()
+
+        The path is the same every time, so an interrupted resumable download of it can be continued.
+        """
+        return os.path.join(self.path, "tmp", md5)
+
+    def lock(self, md5):
+        """A lock to hold while fetching md5, so threads needing the same contents download it once"""
+        with self._lock:
+            return self._md5_locks[md5]
+
+    def __len__(self):
+        with self._conn() as conn:
+            return conn.execute("SELECT COUNT(*) FROM blobs").fetchone()[0]
+
+    def __contains__(self, md5):
+        return self.get(md5) is not None
+
+    @property
+    def size(self):
+        """Total size of the stored blobs in bytes"""
+        with self._conn() as conn:
+            return conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def get(self, md5):
+        """Path of the blob with this md5 checksum (marking it as used), or None if it isn't stored"""
+        path = self.blob_path(md5)
+        with self._conn() as conn:
+            row = conn.execute("SELECT size, mtime_ns FROM blobs WHERE md5 = ?", (md5,)).fetchone()
+            if row is None:
+                return None
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stat = None
+            if stat is None or (stat.st_size, stat.st_mtime_ns) != tuple(row):
+                conn.execute("DELETE FROM blobs WHERE md5 = ?", (md5,))
+                if stat is not None:
+                    os.remove(path)
+                return None
+            conn.execute("UPDATE blobs SET last_used = ? WHERE md5 = ?", (time.time(), md5))
+        return path
+
+    def put(self, md5, path):
+        """Move the file at path into the store as the blob of md5
+
+        Call evict() afterwards (e.g. once the blob has been materialized) to keep the store under max_size.
+
+        Returns:
+            the path of the blob
+        """
+        blob_path = self.blob_path(md5)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(path, blob_path)
+        stat = os.stat(blob_path)
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?)",
+                (md5, stat.st_size, stat.st_mtime_ns, time.time())
+            )
+        return blob_path
+
+    def materialize(self, md5, dest):
+        """Place the blob of md5 at dest (replacing what is there) if it is stored
+
+        Returns:
+            True if the blob was placed, False if it isn't in the store (including if another
+            process evicted it while it was being placed)
+        """
+        blob_path = self.get(md5)
+        if blob_path is None:
+            return False
+
+        tmp_path = "{}.{}.tmp".format(dest, threading.get_ident())
+        for method in self.link_methods:
+            try:
+                _LINKERS[method](blob_path, tmp_path)
+            except (OSError, ImportError):
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                if not os.path.exists(blob_path):
+                    return False
+                continue
+            os.replace(tmp_path, dest)
+            return True
+        raise OSError("Could not place blob {} at {} with any of {}".format(md5, dest, self.link_methods))
+
+    def evict(self):
+        """Delete the least recently used blobs until the store is no bigger than max_size
+
+        Blobs whose lock is held (being fetched or placed by another thread) are skipped.
+        """
+        if self.max_size is None:
+            return
+        with self._conn() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total <= self.max_size:
+                return
+            for md5, size in conn.execute("SELECT md5, size FROM blobs ORDER BY last_used").fetchall():
+                if total <= self.max_size:
+                    break
+                lock = self.lock(md5)
+                if not lock.acquire(blocking=False):
+                    continue
+                try:
+                    conn.execute("DELETE FROM blobs WHERE md5 = ?", (md5,))
+                    try:
+                        os.remove(self.blob_path(md5))
+                    except FileNotFoundError:
+                        pass
+                finally:
+                    lock.release()
+                total -= size
+
+    def clear(self):
+        with self._conn() as conn:
+            for (md5,) in conn.execute("SELECT md5 FROM blobs").fetchall():
+                try:
+                    os.remove(self.blob_path(md5))
+                except FileNotFoundError:
+                    pass
+            conn.execute("DELETE FROM blobs")
+
+    def __repr__(self):
+        return "<BlobStore {}: {} blobs>".format(self.path, len(self))
+
+
+__all__ = ["BlobStore", "DEFAULT_LINK_METHODS", "LINK_METHODS"]
@@ -0,0 +1,326 @@
+"""
+Bundles: many small files packed into a few compressed tar files, to save a request per file
+
+A bundled folder on google drive holds the bundles (.gdrive_bundle_*.tar.zst, or .tar.gz when the
+zstandard package isn't installed) next to an index (.gdrive_bundles.json) of the files and
+folders in them:
+
+    {
+        "format": 1,
+        "bundles": {bundle title: {"compression": "zstd" or "gzip"}},
+        "files": {relative path: {"bundle": bundle title, "fileSize": str, "md5Checksum": str}},
+        "folders": [relative path, ...]
+    }
+
+Relative paths are "/" separated and relative to the folder holding the index.
+"""
+
+import gzip
+import io
+import json
+import os
+import tarfile
+import uuid
+
+from .records import FileRecord
+from .report import TransferReport, TransferResult, TransferStatus
+from .resumable import partial_path
+
+
+BUNDLE_PREFIX = ".gdrive_bundle_"
+INDEX_NAME = ".gdrive_bundles.json"
+
+# Uncompressed bytes packed into one bundle before starting the next one
+DEFAULT_BUNDLE_SIZE = 256 * 1024 * 1024
+
+# Bytes read from google drive per range request while unpacking a bundle
+READ_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+def default_compression():
+    """zstd if the zstandard package is installed, gzip otherwise"""
+    try:
+        import zstandard
+    except ImportError:
+        return "gzip"
+    return "zstd"
+
+
+def _extension(compression):
+    return {"zstd": ".tar.zst", "gzip": ".tar.gz"}[compression]
+
+
+def _mime_type(compression):
+    return {"zstd": "application/zstd", "gzip": "application/gzip"}[compression]
+
+
+def _compressed_writer(compression, sink):
+    if compression == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor().stream_writer(sink, closefd=False)
+    return gzip.GzipFile(fileobj=sink, mode="wb")
+
+
+def _decompressed_reader(compression, raw):
+    if compression == "zstd":
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(raw)
+    return gzip.GzipFile(fileobj=raw, mode="rb")
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file object that collects what is written until it is taken"""
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        return len(data)
+
+    def take(self):
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def pack(files, compression):
+    """Generate the bytes of a compressed tar of files, one file at a time
+
+    Params
+    ======
+    files (list of (relative path, local path) tuples): the files to pack
+    compression (str): "zstd" or "gzip"
+    """
+    sink = _Sink()
+    compressed = _compressed_writer(compression, sink)
+    with tarfile.open(fileobj=compressed, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+        for rel_path, local_path in files:
+            info = tar.gettarinfo(local_path, arcname=rel_path)
+            with open(local_path, "rb") as f:
+                tar.addfile(info, f)
+            yield sink.take()
+    compressed.close()
+    yield sink.take()
+
+
+def _safe_path(local_folder, rel_path):
+    """Local path of a relative path from an index, or None if it would leave local_folder"""
+    parts = rel_path.split("/")
+    if any(part in ("", ".", "..") for part in parts) or os.path.isabs(rel_path):
+        return None
+    return os.path.join(local_folder, *parts)
+
+
+def read_index(commands, children):
+    """Find and read the bundle index among a folder's children
+
+    Returns:
+        tuple of (index file or None, index dict)
+    """
+    index_files = [f for f in children if f["title"] == INDEX_NAME]
+    if not index_files:
+        return None, {"format": 1, "bundles": {}, "files": {}, "folders": []}
+    index_file = max(index_files, key=lambda f: f.get("modifiedDate", ""))
+    with commands.open(index_file) as f:
+        return index_file, json.loads(f.read().decode("utf-8"))
+
+
+def is_bundled(children):
+    """True if a folder's children include a bundle index"""
+    return any(f["title"] == INDEX_NAME for f in children)
+
+
+def is_bundle_file(file_):
+    return file_["title"] == INDEX_NAME or file_["title"].startswith(BUNDLE_PREFIX)
+
+
+def upload_bundles(
+        commands,
+        gdrive_folder,
+        files,
+        folders,
+        overwrite,
+        bundle_size=DEFAULT_BUNDLE_SIZE,
+        compression=None,
+        max_workers=1,
+        ):
+    """Pack files into bundles in gdrive_folder and update its index
+
+    Files already in the index are skipped or packed again according to the overwrite mode,
+    the same way upload_file treats existing files. Bundles whose files have all been packed again
+    are trashed once the new index is uploaded, as are all earlier index files (an interrupted
+    upload can leave two).
+
+    Params
+    ======
+    commands (GDriveCommands): the connection to upload with
+    gdrive_folder (GoogleDriveFile): the folder to put the bundles and index in
+    files (list of (relative path, local path) tuples): the files to bundle
+    folders (list of str): relative paths of the (possibly empty) folders to recreate on download
+    overwrite (GDriveCommands.Overwrite): overwrite mode for files already in the index
+    bundle_size (int, default=256MB): uncompressed bytes per bundle
+    compression (str, optional): "zstd" or "gzip"; default_compression() if None
+    max_workers (int, default=1): number of bundles to upload at the same time
+
+    Returns:
+        TransferReport with the result of each file
+    """
+    compression = compression or default_compression()
+    children = commands._list_children(gdrive_folder)
+    index_file, index = read_index(commands, children)
+
+    checksums = commands._local_md5s([local_path for _, local_path in files])
+    report = TransferReport()
+    to_pack = []
+    for rel_path, local_path in files:
+        entry = index["files"].get(rel_path)
+        if entry is not None and not commands._check_if_overwrite_okay(
+                overwrite, FileRecord(entry), local_path, checksums[local_path]):
+            report.append(TransferResult(local_path, index_file, TransferStatus.SKIPPED))
+        else:
+            to_pack.append((rel_path, local_path))
+
+    bundles = []
+    batch_id = uuid.uuid4().hex[:8]
+    size = None
+    for rel_path, local_path in to_pack:
+        if size is None or size >= bundle_size:
+            title = "{}{}_{:04d}{}".format(BUNDLE_PREFIX, batch_id, len(bundles), _extension(compression))
+            bundles.append((title, []))
+            size = 0
+        bundles[-1][1].append((rel_path, local_path))
+        size += os.path.getsize(local_path)
+
+    def upload(bundle):
+        title, bundle_files = bundle
+        try:
+            # Bundle titles are new, so there are no existing files to check for
+            result = commands._upload_data(pack(bundle_files, compression), gdrive_folder, title, mime_type=_mime_type(compression))
+        except Exception as e:
+            commands.logger.error("Failed to upload bundle {}: {}".format(title, e))
+            return [TransferResult(local_path, gdrive_folder, TransferStatus.FAILED, e) for _, local_path in bundle_files]
+        for rel_path, local_path in bundle_files:
+            index["files"][rel_path] = {
+                "bundle": title,
+                "fileSize": str(os.path.getsize(local_path)),
+                "md5Checksum": checksums[local_path],
+            }
+        index["bundles"][title] = {"compression": compression}
+        return [TransferResult(local_path, result.gdrive_file, TransferStatus.UPLOADED) for _, local_path in bundle_files]
+
+    for results in commands._map(upload, bundles, max_workers):
+        report.extend(results)
+
+    new_folders = set(folders) - set(index.get("folders", []))
+    index["folders"] = sorted(set(index.get("folders", [])) | new_folders)
+    if bundles or new_folders or index_file is None:
+        used = {entry["bundle"] for entry in index["files"].values()}
+        index["bundles"] = {title: info for title, info in index["bundles"].items() if title in used}
+        # Uploaded next to the existing index files (of which there may be several), which are then trashed
+        commands._upload_data(json.dumps(index).encode("utf-8"), gdrive_folder, INDEX_NAME, mime_type="application/json")
+
+        # The old index and bundles no longer in it are only removed once the new index is in place
+        unused = [
+            f for f in children
+            if f["title"] == INDEX_NAME or (f["title"].startswith(BUNDLE_PREFIX) and f["title"] not in used)
+        ]
+        if unused:
+            batch = commands.batch()
+            for f in unused:
+                batch.trash(f["id"])
+            for result in batch.execute():
+                if not result.ok:
+                    commands.logger.error("Failed to trash old bundle file: {}".format(result.error))
+    return report
+
+
+def download_bundles(commands, children, local_folder, overwrite, max_workers=1):
+    """Unpack the bundled files of a google drive folder into local_folder
+
+    Only bundles holding a file that needs downloading (according to the overwrite mode) are
+    fetched, and they are streamed and unpacked without being saved.
+
+    Params
+    ======
+    commands (GDriveCommands): the connection to download with
+    children (list of GoogleDriveFile): contents of the bundled google drive folder
+    local_folder (str): the local folder corresponding to the google drive folder
+    overwrite (GDriveCommands.Overwrite): overwrite mode for existing local files
+    max_workers (int, default=1): number of bundles to download at the same time
+
+    Returns:
+        TransferReport with the result of each bundled file
+    """
+    index_file, index = read_index(commands, children)
+    bundle_files = {f["title"]: f for f in children if f["title"].startswith(BUNDLE_PREFIX)}
+
+    for rel_path in index.get("folders", []):
+        local_path = _safe_path(local_folder, rel_path)
+        if local_path is not None:
+            os.makedirs(local_path, exist_ok=True)
+
+    report = TransferReport()
+    wanted = {}
+    for rel_path, entry in sorted(index["files"].items()):
+        local_path = _safe_path(local_folder, rel_path)
+        if local_path is None:
+            continue
+        if os.path.exists(local_path) and not commands._check_if_overwrite_okay(overwrite, FileRecord(entry), local_path):
+            report.append(TransferResult(local_path, index_file, TransferStatus.SKIPPED))
+        elif entry["bundle"] not in bundle_files:
+            error = FileNotFoundError("Bundle {} is missing".format(entry["bundle"]))
+            report.append(TransferResult(local_path, index_file, TransferStatus.FAILED, error))
+        else:
+            wanted.setdefault(entry["bundle"], {})[rel_path] = local_path
+
+    def unpack(title):
+        bundle_file = bundle_files[title]
+        remaining = dict(wanted[title])
+        results = []
+        try:
+            with commands.open(bundle_file, block_size=READ_BLOCK_SIZE, read_ahead=1, cache_blocks=2) as raw:
+                stream = _decompressed_reader(index["bundles"][title]["compression"], raw)
+                with tarfile.open(fileobj=stream, mode="r|") as tar:
+                    for member in tar:
+                        local_path = remaining.pop(member.name, None)
+                        if local_path is None or not member.isfile():
+                            continue
+                        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                        tmp_path = partial_path(local_path)
+                        with tar.extractfile(member) as src, open(tmp_path, "wb") as dst:
+                            while True:
+                                data = src.read(1024 * 1024)
+                                if not data:
+                                    break
+                                dst.write(data)
+                        os.utime(tmp_path, (member.mtime, member.mtime))
+                        os.replace(tmp_path, local_path)
+                        results.append(TransferResult(local_path, bundle_file, TransferStatus.DOWNLOADED))
+            if remaining:
+                raise FileNotFoundError("{} files are missing from bundle {}".format(len(remaining), title))
+        except Exception as e:
+            commands.logger.error("Failed to unpack bundle {}: {}".format(title, e))
+            results.extend(
+                TransferResult(local_path, bundle_file, TransferStatus.FAILED, e) for local_path in remaining.values())
+        return results
+
+    for results in commands._map(unpack, sorted(wanted), max_workers):
+        report.extend(results)
+    return report
+
+
+__all__ = [
+    "BUNDLE_PREFIX",
+    "DEFAULT_BUNDLE_SIZE",
+    "INDEX_NAME",
+    "default_compression",
+    "download_bundles",
+    "is_bundle_file",
+    "is_bundled",
+    "pack",
+    "read_index",
+    "upload_bundles",
+]
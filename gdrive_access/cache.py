@@ -0,0 +1,236 @@
+"""
+Caches for google drive lookups
+"""
+
+import collections
+import sqlite3
+import threading
+import time
+
+
+class PathCache(object):
+    """LRU cache mapping resolved google drive paths to file objects
+
+    Entries are keyed on (root_id, path) where path is a tuple of path elements.
+    Each entry also remembers the id of the folder that every path element was
+    looked up in, so that a change inside any folder along the way can
+    invalidate it.
+
+    Params
+    ======
+    ttl (float, default=60): seconds an entry stays valid. A ttl of 0 or None disables the cache
+    max_size (int, default=10000): maximum number of entries before the least recently
+        used ones are evicted
+    """
+    def __init__(self, ttl=60, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return bool(self.ttl) and bool(self.max_size)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, root_id, path):
+        """Return the cached file at path under root_id or None if missing/expired"""
+        entry = self._get_entry(root_id, path)
+        return None if entry is None else entry[1]
+
+    def _get_entry(self, root_id, path):
+        if not self.enabled:
+            return None
+
+        key = (root_id, tuple(path))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1:]
+
+    def longest_prefix(self, root_id, path):
+        """Find the longest cached prefix of path
+
+        Returns a tuple of (n: int, parent_ids: tuple, file: GoogleDriveFile) where n
+        is the number of path elements that were resolved from the cache. Returns
+        (0, (), None) if no prefix is cached.
+        """
+        for n in range(len(path), 0, -1):
+            entry = self._get_entry(root_id, path[:n])
+            if entry is not None:
+                return (n,) + entry
+        return 0, (), None
+
+    def put(self, root_id, path, parent_ids, file_):
+        """Cache a resolved path
+
+        Params
+        ======
+        root_id (str): id of the folder the path was resolved from
+        path (tuple of str): the path elements
+        parent_ids (tuple of str): the id of the folder each path element was found in
+        file_ (GoogleDriveFile): the file the path resolved to
+        """
+        if not self.enabled:
+            return
+
+        key = (root_id, tuple(path))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, tuple(parent_ids), file_)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, folder_id, name=None):
+        """Drop every entry that looked up name inside the folder folder_id
+
+        If name is None, drops every entry that passed through folder_id.
+        """
+        with self._lock:
+            stale = [
+                key for key, (_, parent_ids, _) in self._entries.items()
+                if any(
+                    parent_id == folder_id and (name is None or element == name)
+                    for parent_id, element in zip(parent_ids, key[1])
+                )
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class MetadataCache(object):
+    """Folder listings stored in a sqlite database that several processes can share
+
+    The database is opened in WAL mode so that many processes (and threads, which each get
+    their own connection) can read it while one writes. A cached listing is used while it is
+    younger than max_age seconds; GDriveCommands also checks it against the modifiedDate of the
+    folder's contents on google drive before relying on it. Files added through GDriveCommands
+    are added to the cached listing of their folder rather than dropping it.
+
+    Params
+    ======
+    db_path (str): location of the sqlite database file (created if it doesn't exist)
+    max_age (float, default=300): seconds a listing stays valid
+    """
+    def __init__(self, db_path, max_age=300):
+        self.db_path = db_path
+        self.max_age = max_age
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS listings (folder_id TEXT PRIMARY KEY, listed_at REAL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "folder_id TEXT, id TEXT, title TEXT, mime_type TEXT, file_size TEXT, md5_checksum TEXT, "
+                "modified_date TEXT, shortcut_target_id TEXT, shortcut_target_mime_type TEXT, "
+                "PRIMARY KEY (folder_id, id))"
+            )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_children(self, folder_id):
+        """Return the cached listing of a folder, or None if it is not cached or too old
+
+        Returns:
+            tuple of (time the folder was listed, list of metadata dicts of its contents)
+        """
+        conn = self._conn()
+        listing = conn.execute("SELECT listed_at FROM listings WHERE folder_id = ?", (folder_id,)).fetchone()
+        if listing is None:
+            return None
+        listed_at, = listing
+        if time.time() - listed_at > self.max_age:
+            return None
+
+        rows = conn.execute(
+            "SELECT id, title, mime_type, file_size, md5_checksum, modified_date, "
+            "shortcut_target_id, shortcut_target_mime_type FROM files WHERE folder_id = ?", (folder_id,)
+        ).fetchall()
+        return listed_at, [_row_to_metadata(folder_id, row) for row in rows]
+
+    def put_children(self, folder_id, children):
+        """Store the metadata of a folder's contents, replacing what was cached for it"""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM files WHERE folder_id = ?", (folder_id,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [_metadata_to_row(folder_id, child) for child in children]
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO listings (folder_id, listed_at) VALUES (?, ?)", (folder_id, time.time())
+            )
+
+    def add_child(self, folder_id, metadata):
+        """Add a new (or updated) file to the cached listing of its folder, if the folder is cached"""
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files SELECT ?, ?, ?, ?, ?, ?, ?, ?, ? "
+                "WHERE EXISTS (SELECT 1 FROM listings WHERE folder_id = ?)",
+                _metadata_to_row(folder_id, metadata) + (folder_id,)
+            )
+
+    def remove_child(self, folder_id, file_id):
+        """Remove a trashed file from the cached listing of its folder"""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM files WHERE folder_id = ? AND id = ?", (folder_id, file_id))
+
+    def invalidate(self, folder_id):
+        """Forget the listing of a folder (e.g. because a file was added to it)"""
+        with self._conn() as conn:
+            conn.execute("DELETE FROM listings WHERE folder_id = ?", (folder_id,))
+            conn.execute("DELETE FROM files WHERE folder_id = ?", (folder_id,))
+
+    def clear(self):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM listings")
+            conn.execute("DELETE FROM files")
+
+
+def _metadata_to_row(folder_id, metadata):
+    shortcut = metadata.get("shortcutDetails") or {}
+    return (
+        folder_id,
+        metadata["id"],
+        metadata["title"],
+        metadata.get("mimeType"),
+        metadata.get("fileSize"),
+        metadata.get("md5Checksum"),
+        metadata.get("modifiedDate"),
+        shortcut.get("targetId"),
+        shortcut.get("targetMimeType"),
+    )
+
+
+def _row_to_metadata(folder_id, row):
+    file_id, title, mime_type, file_size, md5_checksum, modified_date, target_id, target_mime_type = row
+    metadata = {
+        "id": file_id,
+        "title": title,
+        "mimeType": mime_type,
+        "parents": [{"id": folder_id}],
+    }
+    for key, value in (("fileSize", file_size), ("md5Checksum", md5_checksum), ("modifiedDate", modified_date)):
+        if value is not None:
+            metadata[key] = value
+    if target_id is not None:
+        metadata["shortcutDetails"] = {"targetId": target_id, "targetMimeType": target_mime_type}
+    return metadata
@@ -0,0 +1,125 @@
+"""
+MD5 checksums of local files, computed in chunks and cached on disk
+"""
+
+import concurrent.futures
+import hashlib
+import os
+import sqlite3
+import threading
+
+
+CHUNK_SIZE = 1024 * 1024
+
+# Files smaller than this in total are hashed in the calling process; a process
+# pool costs more to start than it saves on small batches
+PARALLEL_MIN_BYTES = 64 * 1024 * 1024
+
+
+def md5_file(path, chunk_size=CHUNK_SIZE):
+    """Return the hex md5 checksum of a file, reading at most chunk_size bytes at a time"""
+    md5 = hashlib.md5()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            md5.update(view[:n])
+    return md5.hexdigest()
+
+
+class ChecksumCache(object):
+    """On-disk cache of local file checksums
+
+    Checksums are stored in a sqlite database keyed on the file's absolute path and
+    are only reused while the file's size, modification time and inode are unchanged.
+
+    Params
+    ======
+    db_path (str): location of the sqlite database file (created if it doesn't exist)
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS checksums ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, md5 TEXT)"
+            )
+
+    @staticmethod
+    def _key(path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+    def get(self, path):
+        """Return the cached checksum of path, or None if it is missing or out of date"""
+        abspath, size, mtime_ns, inode = self._key(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT md5 FROM checksums WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+                (abspath, size, mtime_ns, inode)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, path, md5):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?, ?)",
+                self._key(path) + (md5,)
+            )
+
+    def md5(self, path):
+        """Return the checksum of path, hashing it only if the cached value is out of date"""
+        md5 = self.get(path)
+        if md5 is None:
+            md5 = md5_file(path)
+            self.put(path, md5)
+        return md5
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def md5_many(paths, cache: ChecksumCache=None, processes: int=None, executor=None):
+    """Return a dict mapping each path to its md5 checksum
+
+    Checksums found in cache are reused. The remaining files are hashed across a pool
+    of processes (os.cpu_count() if processes is None) when there is enough data to
+    make that worthwhile, and stored back into cache. Pass a ProcessPoolExecutor as
+    executor to reuse it instead of starting a new pool for this call.
+    """
+    result = {}
+    missing = []
+    for path in paths:
+        md5 = cache.get(path) if cache is not None else None
+        if md5 is None:
+            missing.append(path)
+        else:
+            result[path] = md5
+
+    parallel = (
+        len(missing) > 1 and processes != 1
+        and sum(os.path.getsize(path) for path in missing) >= PARALLEL_MIN_BYTES
+    )
+    if parallel and executor is not None:
+        computed = list(executor.map(md5_file, missing))
+    elif parallel:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            computed = list(executor.map(md5_file, missing))
+    else:
+        computed = [md5_file(path) for path in missing]
+
+    for path, md5 in zip(missing, computed):
+        result[path] = md5
+        if cache is not None:
+            cache.put(path, md5)
+
+    return result
+
+
+__all__ = ["ChecksumCache", "md5_file", "md5_many"]
@@ -0,0 +1,182 @@
+"""
+Counters and latency histograms of what a GDriveCommands object spends its time on
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+
+# Upper bounds (in seconds) of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram(object):
+    """Counts of observed values falling into each bucket, plus their count and sum"""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """(upper bound, number of values <= upper bound) pairs, ending with infinity"""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class Metrics(object):
+    """Thread-safe counters and histograms, with hooks that see every update
+
+    Each value is identified by a name and a set of labels, e.g.
+    metrics.inc("api_calls", kind="files.list"). Hooks are called as
+    hook(type, name, value, labels) for every update, where type is "counter" or
+    "histogram", so they can forward metrics to another monitoring system.
+
+    GDriveCommands records:
+    counters: api_calls (by kind), retries (by kind), rate_limited, cache_hits and cache_misses
+        (by cache), bytes_downloaded, bytes_uploaded
+    histograms: api_call_seconds (by kind), method_seconds (by method: find_one_level, find_chain,
+        find_many, ls, download_file, upload_file, upload_data, upload (each file of upload_file and
+        upload_folder), md5 and md5_many)
+
+    Params
+    ======
+    buckets (tuple of float, default=DEFAULT_BUCKETS): upper bounds of histogram buckets in seconds
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._hooks = []
+
+    def add_hook(self, hook):
+        """Call hook(type, name, value, labels) on every update"""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook):
+        self._hooks.remove(hook)
+
+    def _notify(self, type_, name, value, labels):
+        for hook in list(self._hooks):
+            hook(type_, name, value, labels)
+
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        self._notify("counter", name, value, labels)
+
+    def observe(self, name, value, **labels):
+        """Record a value (usually a duration in seconds) in a histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram(self.buckets)
+            self._histograms[key].observe(value)
+        self._notify("histogram", name, value, labels)
+
+    @contextlib.contextmanager
+    def timer(self, name, **labels):
+        """Record the duration of a with block in a histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name, **labels):
+        """Current value of a counter (summed over all labels not given)"""
+        with self._lock:
+            return sum(
+                value for (counter_name, counter_labels), value in self._counters.items()
+                if counter_name == name and set(labels.items()) <= set(counter_labels)
+            )
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def to_json(self):
+        """The current values as a json serializable dict"""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "histograms": [
+                    {
+                        "name": name,
+                        "labels": dict(labels),
+                        "count": h.count,
+                        "sum": h.sum,
+                        "buckets": [[bound if bound != float("inf") else "+Inf", n] for bound, n in h.cumulative()],
+                    }
+                    for (name, labels), h in sorted(self._histograms.items())
+                ],
+            }
+
+    def to_prometheus(self, prefix="gdrive_access_"):
+        """The current values in the prometheus text exposition format"""
+        def format_labels(labels):
+            if not labels:
+                return ""
+            return "{" + ",".join('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels) + "}"
+
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                metric = "{}{}_total".format(prefix, name)
+                if metric not in typed:
+                    lines.append("# TYPE {} counter".format(metric))
+                    typed.add(metric)
+                lines.append("{}{} {}".format(metric, format_labels(labels), value))
+            for (name, labels), h in sorted(self._histograms.items()):
+                metric = prefix + name
+                if metric not in typed:
+                    lines.append("# TYPE {} histogram".format(metric))
+                    typed.add(metric)
+                for bound, n in h.cumulative():
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append("{}_bucket{} {}".format(metric, format_labels(labels + (("le", le),)), n))
+                lines.append("{}_sum{} {}".format(metric, format_labels(labels), h.sum))
+                lines.append("{}_count{} {}".format(metric, format_labels(labels), h.count))
+        return "\n".join(lines) + "\n"
+
+    def export(self, path, format="prometheus"):
+        """Write the current values to a file ("prometheus" text or "json"), replacing it atomically
+
+        A prometheus file can be picked up by node_exporter's textfile collector.
+        """
+        if format == "prometheus":
+            content = self.to_prometheus()
+        elif format == "json":
+            content = json.dumps(self.to_json(), indent=2)
+        else:
+            raise ValueError("Unknown metrics format {}. Use 'prometheus' or 'json'".format(format))
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+__all__ = ["DEFAULT_BUCKETS", "Histogram", "Metrics"]
@@ -0,0 +1,59 @@
+"""
+Upload plans: what will happen to each local file when it is uploaded to a folder
+"""
+
+import collections
+import enum
+
+
+class UploadAction(enum.Enum):
+    UPLOAD = "upload"
+    OVERWRITE = "overwrite"
+    SKIP = "skip"
+    CONFLICT = "conflict"
+
+
+class PlannedUpload(collections.namedtuple("PlannedUpload", ["local_path", "filename", "action", "existing_files"])):
+    """The decision for a single local file
+
+    local_path (str): path of the file on the local filesystem
+    filename (str): name the file will have on google drive
+    action (UploadAction): UPLOAD if nothing by that name exists yet, OVERWRITE if a file exists
+        but the overwrite mode allows uploading again, SKIP if it doesn't and CONFLICT if several
+        files by that name already exist
+    existing_files (list of GoogleDriveFile): files on google drive with the same name
+    """
+    def __repr__(self):
+        return "{}: {} -> {}".format(self.action.value, self.local_path, self.filename)
+
+
+class UploadPlan(list):
+    """List of PlannedUploads into a single google drive folder"""
+    def __init__(self, upload_to, planned=()):
+        super().__init__(planned)
+        self.upload_to = upload_to
+
+    def _with_action(self, *actions):
+        return [p for p in self if p.action in actions]
+
+    @property
+    def to_upload(self):
+        """Files that should be uploaded (new files and allowed overwrites)"""
+        return self._with_action(UploadAction.UPLOAD, UploadAction.OVERWRITE)
+
+    @property
+    def skipped(self):
+        return self._with_action(UploadAction.SKIP)
+
+    @property
+    def conflicts(self):
+        return self._with_action(UploadAction.CONFLICT)
+
+    def __repr__(self):
+        if not len(self):
+            return "<nothing to upload>"
+
+        return "\n".join(repr(p) for p in self) + "\nUploadPlan into {}".format(self.upload_to["title"])
+
+
+__all__ = ["PlannedUpload", "UploadAction", "UploadPlan"]
@@ -0,0 +1,147 @@
+"""
+Rate limiting and retries for google drive api requests
+"""
+
+import http.client
+import random
+import threading
+import time
+
+from googleapiclient import errors
+from pydrive2.files import ApiRequestError
+
+
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+
+def _status_and_reason(error):
+    if isinstance(error, ApiRequestError):
+        return error.error.get("code"), error.GetField("reason")
+    if isinstance(error, errors.HttpError):
+        return error.resp.status, error._get_reason()
+    return None, None
+
+
+def is_rate_limit_error(error):
+    status, reason = _status_and_reason(error)
+    return status == 429 or (status == 403 and reason in RATE_LIMIT_REASONS)
+
+
+def is_retryable(error):
+    """True for errors worth retrying: rate limits, server errors and dropped connections"""
+    status, _ = _status_and_reason(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES or is_rate_limit_error(error)
+    return isinstance(error, (ConnectionError, TimeoutError, http.client.HTTPException))
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket allowing rate requests per second with bursts of up to burst requests"""
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Take tokens, waiting until they are available
+
+        Taking more than burst tokens waits for a full bucket and leaves it in debt, so the
+        requests that follow wait for the difference.
+        """
+        needed = min(tokens, self.burst)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RequestScheduler(object):
+    """Runs api calls at a bounded rate, retrying them with exponential backoff
+
+    One scheduler is shared by all the threads of a GDriveCommands object, so worker pools
+    share a single request budget. When google drive reports a rate limit the allowed rate
+    is halved (down to min_qps), and it recovers gradually as requests succeed again.
+
+    Params
+    ======
+    qps (float, default=20): maximum requests per second. None disables rate limiting
+    max_retries (int, default=5): retries of a failed call before its error is raised
+    backoff_base (float, default=1): seconds to wait before the first retry, doubled for every retry
+    backoff_max (float, default=64): longest wait between retries
+    min_qps (float, default=1): the rate is never lowered below this
+    metrics (Metrics, optional): where to count calls, retries and rate limits and time calls
+    """
+    def __init__(self, qps=20, max_retries=5, backoff_base=1.0, backoff_max=64.0, min_qps=1.0, metrics=None):
+        self.qps = qps
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.min_qps = min(min_qps, qps) if qps else min_qps
+        self._bucket = TokenBucket(qps) if qps else None
+        self.metrics = metrics
+
+    @property
+    def current_qps(self):
+        return self._bucket.rate if self._bucket is not None else None
+
+    def _on_success(self):
+        if self._bucket is not None and self._bucket.rate < self.qps:
+            self._bucket.rate = min(self.qps, self._bucket.rate + 0.05 * self.qps)
+
+    def _on_rate_limit(self):
+        if self._bucket is not None:
+            self._bucket.rate = max(self.min_qps, self._bucket.rate / 2)
+
+    def backoff(self, attempt):
+        """Seconds to wait before retry number attempt (0-based), with full jitter"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _attempt(self, kind, func, args, kwargs):
+        if self.metrics is None:
+            return func(*args, **kwargs)
+        self.metrics.inc("api_calls", kind=kind)
+        with self.metrics.timer("api_call_seconds", kind=kind):
+            return func(*args, **kwargs)
+
+    def call(self, func, *args, kind=None, cost=1, idempotent=True, **kwargs):
+        """Call func(*args, **kwargs) once a request is allowed, retrying retryable errors
+
+        kind names the request in metrics (defaults to the name of func) and cost is the number
+        of requests it counts as (e.g. the size of a batch). Calls that are not idempotent (those
+        creating files) are only retried after rate limit errors, when google drive rejected the
+        request; after server errors and dropped connections the file may have been created.
+        """
+        kind = kind or getattr(func, "__name__", "call")
+        attempt = 0
+        while True:
+            if self._bucket is not None:
+                self._bucket.acquire(cost)
+            try:
+                result = self._attempt(kind, func, args, kwargs)
+            except Exception as e:
+                retryable = is_retryable(e) if idempotent else is_rate_limit_error(e)
+                if attempt >= self.max_retries or not retryable:
+                    raise
+                if self.metrics is not None:
+                    self.metrics.inc("retries", kind=kind)
+                if is_rate_limit_error(e):
+                    if self.metrics is not None:
+                        self.metrics.inc("rate_limited")
+                    self._on_rate_limit()
+                time.sleep(self.backoff(attempt))
+                attempt += 1
+            else:
+                self._on_success()
+                return result
+
+
+__all__ = ["RequestScheduler", "TokenBucket", "is_rate_limit_error", "is_retryable"]
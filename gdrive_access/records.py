@@ -0,0 +1,87 @@
+"""
+Compact, read-mostly records of google drive file metadata for large listings
+"""
+
+
+class FileRecord(object):
+    """The metadata of a google drive file that this package uses, without a GoogleDriveFile
+
+    A GoogleDriveFile keeps the full metadata dict, an auth reference and change tracking for
+    every file. A FileRecord only keeps the fields below in slots, which takes a fraction of the
+    memory when indexing large trees. It supports the same item access as a GoogleDriveFile
+    (record["title"], record.get("fileSize"), "md5Checksum" in record, record.metadata) and can
+    be passed to GDriveCommands methods wherever a GoogleDriveFile is accepted.
+    Missing fields (e.g. the md5Checksum of a google doc) raise KeyError like a dict does.
+
+    Params
+    ======
+    metadata (dict): file metadata as returned by the google drive api
+    """
+    FIELDS = ("id", "title", "mimeType", "fileSize", "md5Checksum", "modifiedDate", "parents", "shortcutDetails")
+    __slots__ = FIELDS
+
+    def __init__(self, metadata):
+        for field in self.FIELDS:
+            setattr(self, field, metadata.get(field))
+        if self.parents is not None:
+            self.parents = tuple(p["id"] for p in self.parents)
+
+    @classmethod
+    def from_file(cls, file_):
+        """Make a record of a GoogleDriveFile (records are returned unchanged)"""
+        if isinstance(file_, FileRecord):
+            return file_
+        from pydrive2.files import GoogleDriveFile
+
+        return cls(file_.metadata if isinstance(file_, GoogleDriveFile) else file_)
+
+    def to_file(self, auth):
+        """The GoogleDriveFile this record describes, for calling pydrive2 methods on it"""
+        from pydrive2.files import GoogleDriveFile
+
+        return GoogleDriveFile(auth=auth, metadata=self.metadata, uploaded=True)
+
+    def _value(self, key):
+        if key == "parents":
+            return [{"id": parent_id} for parent_id in self.parents]
+        return getattr(self, key)
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS or getattr(self, key) is None:
+            raise KeyError(key)
+        return self._value(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError("FileRecord has no field {}".format(key))
+        if key == "parents":
+            value = tuple(p["id"] for p in value)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self):
+        return [field for field in self.FIELDS if getattr(self, field) is not None]
+
+    @property
+    def metadata(self):
+        return {field: self._value(field) for field in self.keys()}
+
+    def __getstate__(self):
+        return self.metadata
+
+    def __setstate__(self, state):
+        self.__init__(state)
+
+    def __repr__(self):
+        try:
+            return "{title}\n\t{mimeType}".format(title=self["title"], mimeType=self.mimeType)
+        except KeyError:
+            return object.__repr__(self)
+
+
+__all__ = ["FileRecord"]
@@ -0,0 +1,75 @@
+"""
+Per-file results of bulk uploads and downloads
+"""
+
+import collections
+import enum
+
+
+class TransferStatus(enum.Enum):
+    DOWNLOADED = "downloaded"
+    UPLOADED = "uploaded"
+    SKIPPED = "skipped"
+    MOVED = "moved"
+    DELETED = "deleted"
+    FAILED = "failed"
+
+
+class TransferResult(collections.namedtuple("TransferResult", ["local_path", "gdrive_file", "status", "error"])):
+    """The outcome of transferring a single file
+
+    local_path (str): path of the file on the local filesystem (None for data uploaded from memory)
+    gdrive_file (GoogleDriveFile): the file on google drive (the folder it was uploaded to
+        if the upload failed before the file was created)
+    status (TransferStatus): what happened to the file
+    error (Exception or None): the error raised if status is FAILED
+    """
+    def __new__(cls, local_path, gdrive_file, status, error=None):
+        return super().__new__(cls, local_path, gdrive_file, status, error)
+
+    def __repr__(self):
+        name = self.local_path if self.local_path is not None else self.gdrive_file["title"]
+        if self.error is not None:
+            return "{}: {} ({})".format(self.status.value, name, self.error)
+        return "{}: {}".format(self.status.value, name)
+
+
+class TransferReport(list):
+    """List of TransferResults returned by bulk uploads and downloads"""
+    def _with_status(self, status):
+        return TransferReport([r for r in self if r.status is status])
+
+    @property
+    def downloaded(self):
+        return self._with_status(TransferStatus.DOWNLOADED)
+
+    @property
+    def uploaded(self):
+        return self._with_status(TransferStatus.UPLOADED)
+
+    @property
+    def skipped(self):
+        return self._with_status(TransferStatus.SKIPPED)
+
+    @property
+    def failed(self):
+        return self._with_status(TransferStatus.FAILED)
+
+    def summary(self):
+        counts = collections.Counter(r.status.value for r in self)
+        return ", ".join("{} {}".format(n, status) for status, n in sorted(counts.items())) or "no files"
+
+    def __repr__(self):
+        if not len(self):
+            return "<no files transferred>"
+
+        return "\n".join(repr(r) for r in self) + "\n{}".format(self.summary())
+
+    def __add__(self, other):
+        if not isinstance(other, TransferReport):
+            raise TypeError("Cannot add object of type {} to TransferReport".format(type(other)))
+
+        return TransferReport(super().__add__(other))
+
+
+__all__ = ["TransferReport", "TransferResult", "TransferStatus"]
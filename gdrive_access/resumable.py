@@ -0,0 +1,318 @@
+"""
+Resumable, chunked uploads and downloads using the google drive REST protocol directly
+
+Downloads are written to a hidden ".<name>.partial" file next to the destination
+with ranged requests, so an interrupted download continues from the bytes already on disk.
+Uploads use a google drive resumable upload session whose url is saved in a state
+directory, so an interrupted upload asks google drive how much it already has and
+continues from there.
+"""
+
+import hashlib
+import json
+import os
+import re
+
+from googleapiclient import errors
+from pydrive2.files import ApiRequestError, GoogleDriveFile
+
+
+# Upload chunks must be a multiple of 256 KB (except for the last one)
+CHUNK_ALIGNMENT = 256 * 1024
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+
+DEFAULT_RESUME_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gdrive_access", "uploads")
+
+
+def _align(chunk_size):
+    return max(CHUNK_ALIGNMENT, chunk_size - chunk_size % CHUNK_ALIGNMENT)
+
+
+def get_http(drive):
+    """Return the authorized http client of the current thread, as pydrive2 does for its own calls"""
+    auth = drive.auth
+    if auth.service is None:
+        auth.Authorize()
+    if not getattr(auth.thread_local, "http", None):
+        auth.thread_local.http = auth.Get_Http_Object()
+    return auth.thread_local.http
+
+
+def api_url(drive, path, upload=False):
+    """Absolute url of a drive api path (e.g. "files/ID") for the service drive is connected to"""
+    service = drive.auth.service
+    if service is None:
+        drive.auth.Authorize()
+        service = drive.auth.service
+    root_desc = service._rootDesc
+    return "{}{}{}{}".format(root_desc["rootUrl"], "upload/" if upload else "", root_desc["servicePath"], path)
+
+
+def request(http, url, method="GET", body=None, headers=None, ok=(200,)):
+    """Make a raw request, raising pydrive2's ApiRequestError for unexpected statuses"""
+    resp, content = http.request(url, method=method, body=body, headers=headers or {})
+    if resp.status not in ok:
+        raise ApiRequestError(errors.HttpError(resp, content or b"{}", uri=url))
+    return resp, content
+
+
+def partial_path(local_path):
+    """Where a download to local_path is written until it is complete
+
+    The name starts with a dot, so upload_folder and sync skip it like other hidden files.
+    """
+    folder, name = os.path.split(local_path)
+    return os.path.join(folder, ".{}.partial".format(name))
+
+
+def _partial_paths(local_path):
+    path = partial_path(local_path)
+    return path, path + ".json"
+
+
+def download(drive, gdrive_file, local_path, chunk_size=DEFAULT_CHUNK_SIZE, callback=None):
+    """Download a file in ranged chunks, resuming a previous partial download if possible
+
+    Params
+    ======
+    drive (GoogleDrive): the drive gdrive_file belongs to
+    gdrive_file (GoogleDriveFile): file to download (its metadata must include fileSize)
+    local_path (str): where to save the file
+    chunk_size (int): bytes requested per range request
+    callback (callable, optional): called with (bytes downloaded, total bytes) after every chunk
+    """
+    partial_path, state_path = _partial_paths(local_path)
+    total = int(gdrive_file["fileSize"])
+    state = {
+        "id": gdrive_file["id"],
+        "fileSize": gdrive_file["fileSize"],
+        "md5Checksum": gdrive_file.get("md5Checksum"),
+    }
+
+    offset = 0
+    if os.path.exists(partial_path) and os.path.exists(state_path):
+        with open(state_path) as f:
+            if json.load(f) == state:
+                offset = os.path.getsize(partial_path)
+    if not offset:
+        with open(state_path, "w") as f:
+            json.dump(state, f)
+
+    http = get_http(drive)
+    url = api_url(drive, "files/{}?alt=media&supportsAllDrives=true".format(gdrive_file["id"]))
+    with open(partial_path, "r+b" if offset else "wb") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        while offset < total:
+            end = min(offset + chunk_size, total) - 1
+            _, content = request(http, url, headers={"Range": "bytes={}-{}".format(offset, end)}, ok=(200, 206))
+            if not content:
+                break
+            f.write(content)
+            f.flush()
+            offset += len(content)
+            if callback:
+                callback(offset, total)
+
+    if offset != total:
+        raise IOError("Download of {} stopped at {} of {} bytes".format(gdrive_file["title"], offset, total))
+    os.replace(partial_path, local_path)
+    os.remove(state_path)
+
+
+class UploadSession(object):
+    """A google drive resumable upload session
+
+    Params
+    ======
+    drive (GoogleDrive): the drive to upload to
+    uri (str): the session url returned by google drive when the session was started
+    """
+    def __init__(self, drive, uri):
+        self.drive = drive
+        self.uri = uri
+
+    @classmethod
+    def start(cls, drive, metadata, size=None, mime_type="application/octet-stream"):
+        """Start a new upload session for a file with the given metadata (and size, if known)"""
+        headers = {
+            "Content-Type": "application/json; charset=UTF-8",
+            "X-Upload-Content-Type": mime_type,
+        }
+        if size is not None:
+            headers["X-Upload-Content-Length"] = str(size)
+        resp, _ = request(
+            get_http(drive),
+            api_url(drive, "files?uploadType=resumable&supportsAllDrives=true", upload=True),
+            method="POST",
+            body=json.dumps(metadata),
+            headers=headers,
+        )
+        return cls(drive, resp["location"])
+
+    def _handle(self, resp, content):
+        """Returns (bytes committed, file metadata if the upload is complete)"""
+        if resp.status in (200, 201):
+            return None, json.loads(content)
+        match = re.match(r"bytes=0-(\d+)", resp.get("range", ""))
+        return (int(match.group(1)) + 1 if match else 0), None
+
+    def query(self, size):
+        """Ask google drive how many bytes it has committed
+
+        Returns a tuple of (offset, metadata) where metadata is the uploaded file's metadata if the
+        upload is already complete. Raises ApiRequestError if the session has expired.
+        """
+        resp, content = request(
+            get_http(self.drive), self.uri, method="PUT",
+            headers={"Content-Range": "bytes */{}".format("*" if size is None else size), "Content-Length": "0"},
+            ok=(200, 201, 308)
+        )
+        return self._handle(resp, content)
+
+    def put(self, data, offset, total=None):
+        """Send bytes starting at offset; total is the file size if known (required for the last chunk)
+
+        Returns a tuple of (offset, metadata) like query()
+        """
+        if data:
+            content_range = "bytes {}-{}/{}".format(offset, offset + len(data) - 1, "*" if total is None else total)
+        else:
+            content_range = "bytes */{}".format(offset if total is None else total)
+        resp, content = request(
+            get_http(self.drive), self.uri, method="PUT", body=bytes(data),
+            headers={"Content-Range": content_range, "Content-Length": str(len(data))},
+            ok=(200, 201, 308)
+        )
+        return self._handle(resp, content)
+
+
+def _state_path(resume_dir, local_path, metadata):
+    key = json.dumps([os.path.abspath(local_path), metadata], sort_keys=True)
+    return os.path.join(resume_dir, hashlib.sha1(key.encode()).hexdigest() + ".json")
+
+
+def upload(drive, local_path, metadata, chunk_size=DEFAULT_CHUNK_SIZE, resume_dir=DEFAULT_RESUME_DIR, callback=None):
+    """Upload a local file in chunks, resuming a previous interrupted upload of it if possible
+
+    Params
+    ======
+    drive (GoogleDrive): the drive to upload to
+    local_path (str): the file to upload
+    metadata (dict): metadata of the new file (e.g. title and parents)
+    chunk_size (int): bytes sent per request (rounded down to a multiple of 256 KB)
+    resume_dir (str): folder where the sessions of unfinished uploads are remembered
+    callback (callable, optional): called with (bytes uploaded, total bytes) after every chunk
+
+    Returns:
+        pydrive2.files.GoogleDriveFile of the uploaded file
+    """
+    chunk_size = _align(chunk_size)
+    stat = os.stat(local_path)
+    total = stat.st_size
+    state_path = _state_path(resume_dir, local_path, metadata)
+    os.makedirs(resume_dir, exist_ok=True)
+
+    session, offset, result = None, 0, None
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        if state["size"] == total and state["mtime_ns"] == stat.st_mtime_ns:
+            session = UploadSession(drive, state["uri"])
+            try:
+                offset, result = session.query(total)
+            except ApiRequestError:
+                session, offset = None, 0
+
+    if session is None:
+        session = UploadSession.start(drive, metadata, size=total)
+        with open(state_path, "w") as f:
+            json.dump({"uri": session.uri, "size": total, "mtime_ns": stat.st_mtime_ns}, f)
+
+    with open(local_path, "rb") as f:
+        while result is None:
+            f.seek(offset)
+            data = f.read(chunk_size)
+            offset, result = session.put(data, offset, total)
+            if callback:
+                callback(total if result is not None else offset, total)
+
+    os.remove(state_path)
+    return GoogleDriveFile(auth=drive.auth, metadata=result, uploaded=True)
+
+
+def _call_once(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+def _put_all(session, data, offset, total, call):
+    """Send data starting at offset until google drive has committed all of it
+
+    If a request fails and call retries it, google drive is asked how much of the data
+    it already has before the rest is sent again.
+
+    Returns a tuple of (offset, metadata) like UploadSession.put()
+    """
+    end = offset + len(data)
+    attempts = []
+
+    def put():
+        start, result = offset, None
+        if attempts:
+            start, result = session.query(total)
+            # Sending nothing would end an upload of unknown size, so stop if all the data arrived
+            if result is not None or start >= end:
+                return start, result
+        attempts.append(start)
+        return session.put(data[start - offset:], start, total)
+
+    committed, result = call(put)
+    while result is None and committed < end:
+        attempts.clear()
+        offset, data = committed, data[committed - offset:]
+        committed, result = call(put)
+    return committed, result
+
+
+def upload_stream(drive, chunks, metadata, size=None, chunk_size=DEFAULT_CHUNK_SIZE, call=_call_once, callback=None):
+    """Upload data from an iterable of bytes in chunks, holding at most about one chunk in memory
+
+    Params
+    ======
+    drive (GoogleDrive): the drive to upload to
+    chunks (iterable of bytes): the data to upload, in pieces of any size
+    metadata (dict): metadata of the new file (e.g. title and parents)
+    size (int, optional): total number of bytes, if known in advance
+    chunk_size (int): bytes sent per request (rounded down to a multiple of 256 KB)
+    call (callable, optional): called as call(func) to make each request, e.g. to retry them
+    callback (callable, optional): called with the number of bytes uploaded after every chunk
+
+    Returns:
+        pydrive2.files.GoogleDriveFile of the uploaded file
+    """
+    chunk_size = _align(chunk_size)
+    session = call(UploadSession.start, drive, metadata, size=size)
+
+    offset, result = 0, None
+    buffer = bytearray()
+    for piece in chunks:
+        buffer += piece
+        while len(buffer) > chunk_size:
+            # Only full chunks are sent before the end of the data is known
+            offset, result = _put_all(session, bytes(buffer[:chunk_size]), offset, size, call)
+            del buffer[:chunk_size]
+            if callback:
+                callback(offset)
+
+    total = offset + len(buffer)
+    if size is not None and size != total:
+        raise ValueError("Expected {} bytes to upload but got {}".format(size, total))
+    offset, result = _put_all(session, bytes(buffer), offset, total, call)
+    if result is None:
+        raise IOError("Upload of {} stopped at {} of {} bytes".format(metadata.get("title"), offset, total))
+    if callback:
+        callback(total)
+    return GoogleDriveFile(auth=drive.auth, metadata=result, uploaded=True)
+
+
+__all__ = ["DEFAULT_CHUNK_SIZE", "UploadSession", "download", "partial_path", "upload", "upload_stream"]
@@ -0,0 +1,119 @@
+"""
+In-memory index of a google drive folder tree
+"""
+
+from .display import PyDriveListWrapper
+from .errors import MultipleFilesError, NotFoundError
+
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+SHORTCUT_MIME_TYPE = "application/vnd.google-apps.shortcut"
+
+# Only request the metadata that the index and the transfer methods use
+SNAPSHOT_FIELDS = (
+    "nextPageToken,"
+    "items(id,title,mimeType,fileSize,md5Checksum,modifiedDate,parents(id,isRoot),shortcutDetails)"
+)
+
+
+def is_folder(file_):
+    """True for folders and for shortcuts that point to folders"""
+    if file_["mimeType"] == SHORTCUT_MIME_TYPE:
+        return file_.get("shortcutDetails", {}).get("targetMimeType") == FOLDER_MIME_TYPE
+    return file_["mimeType"] == FOLDER_MIME_TYPE
+
+
+class DriveSnapshot(object):
+    """A listing of every file below a google drive folder, taken at one point in time
+
+    find(), ls() and exists() work like the GDriveCommands methods of the same name but
+    answer from the index without calling the google drive api. Paths are relative to
+    the snapshot's root folder, or can start with a folder inside the snapshot.
+
+    Params
+    ======
+    root (GoogleDriveFile): the folder the snapshot was taken of
+    """
+    def __init__(self, root):
+        self.root = root
+        self.nodes = {root["id"]: root}
+        self._by_path = {(): [root]}
+        self._children = {}
+        self._path_of = {root["id"]: ()}
+
+    def __len__(self):
+        """Number of files and folders in the snapshot, not counting the root"""
+        return len(self.nodes) - 1
+
+    def add_listing(self, path, children):
+        """Record the contents of the folder at path
+
+        Sibling folders can have the same title, so a path can be listed more than once;
+        the listings of all the folders at a path are kept together.
+        """
+        path = tuple(path)
+        self._children.setdefault(path, []).extend(children)
+        for child in children:
+            child_path = path + (child["title"],)
+            self.nodes[child["id"]] = child
+            self._path_of.setdefault(child["id"], child_path)
+            self._by_path.setdefault(child_path, []).append(child)
+
+    def _to_path(self, *path):
+        if len(path) and not isinstance(path[0], str):
+            if path[0]["id"] not in self._path_of:
+                raise NotFoundError("{} is not part of the snapshot of {}".format(path[0]["title"], self.root["title"]))
+            return self._path_of[path[0]["id"]] + tuple(path[1:])
+        return tuple(path)
+
+    def find(self, *path):
+        """Get the file at a path in the snapshot"""
+        path = self._to_path(*path)
+        matches = self._by_path.get(path, [])
+        if not len(matches):
+            raise NotFoundError("{} not found".format("/".join((self.root["title"],) + path)))
+        if len(matches) > 1:
+            raise MultipleFilesError
+        return matches[0]
+
+    def ls(self, *path):
+        """List the contents of a folder in the snapshot"""
+        path = self._to_path(*path)
+        self.find(*path)
+        if path not in self._children:
+            raise NotFoundError("{} is not a folder".format("/".join((self.root["title"],) + path)))
+        return PyDriveListWrapper(self._children[path])
+
+    def exists(self, *path):
+        try:
+            self.find(*path)
+        except NotFoundError:
+            return False
+        else:
+            return True
+
+    def walk(self, *path):
+        """Walk the snapshot top-down like os.walk
+
+        Yields tuples of (path: tuple of str, folders: list of GoogleDriveFile, files: list of GoogleDriveFile).
+        Sibling folders with the same title are yielded once, with the contents of all of them.
+        """
+        path = self._to_path(*path)
+        pending = [path]
+        queued = {path}
+        while pending:
+            path = pending.pop(0)
+            children = self._children.get(path, [])
+            folders = [f for f in children if is_folder(f)]
+            yield path, folders, [f for f in children if not is_folder(f)]
+            for f in folders:
+                child_path = path + (f["title"],)
+                if child_path in self._children and child_path not in queued:
+                    queued.add(child_path)
+                    pending.append(child_path)
+
+    def __repr__(self):
+        return "<DriveSnapshot of {}: {} files and folders>".format(self.root["title"], len(self))
+
+
+__all__ = ["DriveSnapshot"]
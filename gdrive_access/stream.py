@@ -0,0 +1,121 @@
+"""
+Read google drive files in place with range requests
+"""
+
+import collections
+import io
+
+from .resumable import api_url, get_http, request
+
+
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+class DriveFileReader(io.RawIOBase):
+    """Seekable, read-only raw stream of a google drive file's contents
+
+    The file is fetched in blocks of block_size bytes with http range requests. A request for a
+    block that is not cached also fetches the read_ahead blocks after it, and the most recently
+    used cache_blocks blocks are kept in memory, so reading headers or slices of a large file only
+    transfers the parts that are read. Use GDriveCommands.open() to get a buffered reader.
+
+    Params
+    ======
+    commands (GDriveCommands): the connection to read with (requests go through its rate limiter)
+    file_id (str): id of the file to read
+    size (int): size of the file in bytes
+    name (str, optional): name of the file, for display
+    block_size (int, default=1MB): bytes per cached block
+    cache_blocks (int, default=32): maximum number of blocks kept in memory
+    read_ahead (int, default=4): number of following blocks fetched along with a missing block
+    """
+    def __init__(self, commands, file_id, size, name=None, block_size=DEFAULT_BLOCK_SIZE, cache_blocks=32, read_ahead=4):
+        self.commands = commands
+        self.file_id = file_id
+        self.size = size
+        self.name = name or file_id
+        self.block_size = block_size
+        self.cache_blocks = max(cache_blocks, read_ahead + 1)
+        self.read_ahead = read_ahead
+        self._position = 0
+        self._blocks = collections.OrderedDict()
+        self._url = api_url(commands.drive, "files/{}?alt=media&supportsAllDrives=true".format(file_id))
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError("Invalid whence ({})".format(whence))
+        if position < 0:
+            raise ValueError("Negative seek position {}".format(position))
+        self._position = position
+        return position
+
+    def _fetch(self, first, last):
+        """Request blocks first to last (inclusive) in one range request and cache them"""
+        start = first * self.block_size
+        end = min((last + 1) * self.block_size, self.size) - 1
+        _, content = self.commands._call(
+            request,
+            get_http(self.commands.drive),
+            self._url,
+            headers={"Range": "bytes={}-{}".format(start, end)},
+            ok=(200, 206),
+            kind="files.get_media",
+        )
+        self.commands.metrics.inc("bytes_downloaded", len(content))
+        if len(content) > end - start + 1:
+            # The whole file was returned (e.g. the server ignored the range)
+            content = content[start:end + 1]
+        for i in range(first, last + 1):
+            offset = (i - first) * self.block_size
+            self._blocks[i] = content[offset:offset + self.block_size]
+            self._blocks.move_to_end(i)
+        while len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+
+    def _block(self, index):
+        if index not in self._blocks:
+            last_block = (self.size - 1) // self.block_size
+            last = index
+            while last < min(index + self.read_ahead, last_block) and last + 1 not in self._blocks:
+                last += 1
+            self._fetch(index, last)
+        self._blocks.move_to_end(index)
+        return self._blocks[index]
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast("B")
+        n = 0
+        while n < len(view) and self._position < self.size:
+            block = self._block(self._position // self.block_size)
+            start = self._position % self.block_size
+            chunk = block[start:start + len(view) - n]
+            if not chunk:
+                break
+            view[n:n + len(chunk)] = chunk
+            n += len(chunk)
+            self._position += len(chunk)
+        return n
+
+    def readall(self):
+        return self.read(max(0, self.size - self._position))
+
+    def __repr__(self):
+        return "<DriveFileReader {} ({} bytes)>".format(self.name, self.size)
+
+
+__all__ = ["DriveFileReader"]
@@ -0,0 +1,540 @@
+"""
+Keep a local copy of a google drive folder up to date using the drive changes feed, and
+plan and apply two-way syncs between a local folder and a google drive folder
+"""
+
+import collections
+import datetime
+import enum
+import json
+import os
+import shutil
+
+from googleapiclient import errors
+from pydrive2.files import ApiRequestError, GoogleDriveFile
+
+from .errors import FileExists, MultipleFilesError
+from .report import TransferReport, TransferResult, TransferStatus
+from .resumable import get_http
+from .snapshot import FOLDER_MIME_TYPE, is_folder
+
+
+MANIFEST_NAME = ".gdrive_sync.json"
+
+CHANGE_FIELDS = (
+    "nextPageToken,newStartPageToken,"
+    "items(fileId,deleted,file(id,title,mimeType,fileSize,md5Checksum,modifiedDate,parents(id),labels/trashed,shortcutDetails))"
+)
+
+
+class SyncManifest(object):
+    """What a local mirror of a google drive folder contains, and where in the changes feed it is up to
+
+    entries maps file ids to their metadata (title, parent id, mimeType, md5Checksum, ...).
+    The root folder's entry has no parent. failed lists the ids of files whose download
+    failed, which the next sync downloads again.
+    """
+    def __init__(self, path, root_id=None, page_token=None, entries=None, failed=None):
+        self.path = path
+        self.root_id = root_id
+        self.page_token = page_token
+        self.entries = entries or {}
+        self.failed = failed or []
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path) as f:
+            data = json.load(f)
+        return cls(path, data["root_id"], data["page_token"], data["entries"], data.get("failed"))
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "root_id": self.root_id,
+                "page_token": self.page_token,
+                "entries": self.entries,
+                "failed": self.failed,
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def add(self, file_, parent_id):
+        self.entries[file_["id"]] = {
+            "parent": parent_id,
+            "title": file_["title"],
+            "mimeType": file_["mimeType"],
+            "folder": is_folder(file_),
+            "fileSize": file_.get("fileSize"),
+            "md5Checksum": file_.get("md5Checksum"),
+            "modifiedDate": file_.get("modifiedDate"),
+        }
+
+    def metadata(self, file_id):
+        """The google drive metadata of a file as recorded in the manifest"""
+        entry = self.entries[file_id]
+        metadata = {"id": file_id, "title": entry["title"], "mimeType": entry["mimeType"]}
+        for key in ("fileSize", "md5Checksum", "modifiedDate"):
+            if entry.get(key) is not None:
+                metadata[key] = entry[key]
+        return metadata
+
+    def path_of(self, file_id):
+        """Path of a file relative to the mirror as a tuple of names, or None if it is not in the tree"""
+        path = ()
+        while file_id != self.root_id:
+            entry = self.entries.get(file_id)
+            if entry is None:
+                return None
+            path = (entry["title"],) + path
+            file_id = entry["parent"]
+        return path
+
+    def remove(self, file_id):
+        """Forget a file and everything below it"""
+        self.entries.pop(file_id, None)
+        for child_id in [i for i, e in self.entries.items() if e["parent"] == file_id]:
+            self.remove(child_id)
+
+
+def _execute(commands, request, kind):
+    def execute():
+        try:
+            return request.execute(http=get_http(commands.drive))
+        except errors.HttpError as error:
+            raise ApiRequestError(error)
+    return commands._call(execute, kind=kind)
+
+
+def _service(commands):
+    """The drive api service, authorizing first if no request has been made yet"""
+    auth = commands.drive.auth
+    if auth.service is None:
+        auth.Authorize()
+    return auth.service
+
+
+def _list_changes(commands, page_token):
+    """Return (changes, new start page token) for every change since page_token"""
+    service = _service(commands)
+    changes = []
+    while True:
+        response = _execute(commands, service.changes().list(
+            pageToken=page_token,
+            includeDeleted=True,
+            includeItemsFromAllDrives=True,
+            supportsAllDrives=True,
+            maxResults=1000,
+            fields=CHANGE_FIELDS,
+        ), "changes.list")
+        changes.extend(response.get("items", []))
+        if "newStartPageToken" in response:
+            return changes, response["newStartPageToken"]
+        page_token = response["nextPageToken"]
+
+
+def _start_page_token(commands):
+    request = _service(commands).changes().getStartPageToken(supportsAllDrives=True)
+    return _execute(commands, request, "changes.getStartPageToken")["startPageToken"]
+
+
+def _add_snapshot(manifest, snapshot, root_id):
+    """Add every file of a snapshot to the manifest; returns the files (not folders) in it"""
+    folder_ids = {(): root_id}
+    added = []
+    for path, folders, files in snapshot.walk():
+        for f in folders + files:
+            manifest.add(f, folder_ids[path])
+        for f in folders:
+            folder_ids[path + (f["title"],)] = f["id"]
+        added.extend(files)
+    return added
+
+
+def _download_jobs(manifest, files, local_root):
+    """(gdrive_file, local_path) jobs for files at their current place in the manifest"""
+    jobs = {}
+    for f in files:
+        path = manifest.path_of(f["id"])
+        if path is not None:
+            local_path = os.path.join(local_root, *path)
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            jobs[local_path] = (f, local_path)
+    return list(jobs.values())
+
+
+def _failed_ids(report):
+    """Ids of the files whose download failed in a report"""
+    return sorted({result.gdrive_file["id"] for result in report.failed if result.gdrive_file is not None})
+
+
+def _make_folders(manifest, local_root):
+    for file_id, entry in manifest.entries.items():
+        path = manifest.path_of(file_id)
+        if entry["folder"] and path is not None:
+            os.makedirs(os.path.join(local_root, *path), exist_ok=True)
+
+
+def sync_down(commands, gdrive_folder, download_to_path, overwrite, max_workers=1, delete_removed=True):
+    """See GDriveCommands.sync_down"""
+    local_root = os.path.join(download_to_path, gdrive_folder["title"])
+    os.makedirs(local_root, exist_ok=True)
+    manifest = SyncManifest.load(os.path.join(local_root, MANIFEST_NAME))
+    root_id = commands._to_id(gdrive_folder)
+
+    if manifest.root_id != root_id or manifest.page_token is None:
+        # First sync: remember where the changes feed is before listing, so nothing is missed
+        page_token = _start_page_token(commands)
+        manifest = SyncManifest(manifest.path, root_id)
+        snapshot = commands.snapshot(gdrive_folder, max_workers=max_workers)
+        files = _add_snapshot(manifest, snapshot, root_id)
+        _make_folders(manifest, local_root)
+        report = commands._run_downloads(_download_jobs(manifest, files, local_root), overwrite, max_workers)
+        manifest.failed = _failed_ids(report)
+        manifest.page_token = page_token
+        manifest.save()
+        return report
+
+    changes, new_page_token = _list_changes(commands, manifest.page_token)
+    latest = {}
+    for change in changes:
+        latest[change["fileId"]] = change
+
+    report = TransferReport()
+    files = []
+    pending = list(latest.values())
+    while pending:
+        # A change can only be placed once its parent folder is known, so retry until nothing moves
+        unresolved = []
+        for change in pending:
+            result = _apply_change(commands, manifest, change, local_root, delete_removed, files)
+            if result is None:
+                unresolved.append(change)
+            elif result is not True:
+                report.append(result)
+        if len(unresolved) == len(pending):
+            break
+        pending = unresolved
+
+    # Changes still unresolved are for files outside of the mirrored folder
+
+    # Files that failed to download last time are tried again, unless a change replaced them
+    changed_ids = {f["id"] for f in files}
+    for file_id in manifest.failed:
+        if file_id in manifest.entries and file_id not in changed_ids:
+            files.append(GoogleDriveFile(auth=commands.drive.auth, metadata=manifest.metadata(file_id), uploaded=True))
+
+    _make_folders(manifest, local_root)
+    downloads = commands._run_downloads(_download_jobs(manifest, files, local_root), overwrite, max_workers)
+    report.extend(downloads)
+    manifest.failed = _failed_ids(downloads)
+    manifest.page_token = new_page_token
+    manifest.save()
+    return report
+
+
+def _apply_change(commands, manifest, change, local_root, delete_removed, files):
+    """Apply a single change to the mirror, adding files that need downloading to files
+
+    Returns a TransferResult for moves and deletions, True if the change was handled (or is
+    irrelevant) and None if the file's parent is not known yet.
+    """
+    file_id = change["fileId"]
+    file_ = change.get("file")
+    old_path = manifest.path_of(file_id) if file_id in manifest.entries else None
+
+    removed = change.get("deleted") or file_ is None or file_.get("labels", {}).get("trashed")
+    parent_id = None
+    if not removed:
+        parent_ids = [p["id"] for p in file_.get("parents", [])]
+        parent_id = next((p for p in parent_ids if p == manifest.root_id or p in manifest.entries), None)
+        if parent_id is None and old_path is None:
+            return None
+
+    if removed or parent_id is None:
+        if old_path is None:
+            return True
+        local_path = os.path.join(local_root, *old_path)
+        manifest.remove(file_id)
+        if not delete_removed:
+            return True
+        if os.path.isdir(local_path):
+            shutil.rmtree(local_path)
+        elif os.path.exists(local_path):
+            os.remove(local_path)
+        return TransferResult(local_path, file_, TransferStatus.DELETED)
+
+    file_ = GoogleDriveFile(auth=commands.drive.auth, metadata=file_, uploaded=True)
+    previous = manifest.entries.get(file_id)
+    manifest.add(file_, parent_id)
+    new_path = manifest.path_of(file_id)
+    local_path = os.path.join(local_root, *new_path)
+
+    result = True
+    if old_path is not None and old_path != new_path:
+        old_local_path = os.path.join(local_root, *old_path)
+        if os.path.exists(old_local_path):
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            os.replace(old_local_path, local_path)
+        result = TransferResult(local_path, file_, TransferStatus.MOVED)
+
+    if is_folder(file_):
+        if previous is None:
+            # A new folder (or one moved in from elsewhere) may already have contents
+            files.extend(_add_snapshot(manifest, commands.snapshot(file_), file_id))
+    elif file_["mimeType"] != FOLDER_MIME_TYPE and (
+            previous is None
+            or previous["md5Checksum"] != file_.get("md5Checksum")
+            or not os.path.exists(local_path)):
+        files.append(file_)
+
+    return result
+
+
+class SyncDirection(enum.Enum):
+    UP = "up"
+    DOWN = "down"
+    BOTH = "both"
+
+
+class SyncAction(enum.Enum):
+    UPLOAD = "upload"
+    UPDATE = "update"
+    DOWNLOAD = "download"
+    DELETE_LOCAL = "delete local"
+    DELETE_REMOTE = "delete remote"
+    CONFLICT = "conflict"
+
+
+class SyncItem(collections.namedtuple("SyncItem", ["path", "action", "local_path", "gdrive_files", "reason"])):
+    """A single transfer (or conflict) that a sync needs
+
+    path (tuple of str): path of the file relative to the synced folders
+    action (SyncAction): UPLOAD a file that is only local, UPDATE the contents of the google drive
+        file with the local file, DOWNLOAD the google drive file, DELETE_LOCAL or DELETE_REMOTE
+        (trash) a file that only exists on one side, or CONFLICT if the file can't be synced
+        (several google drive files with its name, or a file on one side and a folder on the other)
+    local_path (str): path of the file on the local filesystem
+    gdrive_files (list of GoogleDriveFile): files on google drive at the path (usually zero or one)
+    reason (str): why the action is needed
+    """
+    def __repr__(self):
+        return "{}: {} ({})".format(self.action.value, "/".join(self.path), self.reason)
+
+
+class SyncPlan(list):
+    """List of SyncItems that would make a local folder and a google drive folder agree
+
+    Files that are already the same on both sides are not in the list; unchanged counts them.
+    """
+    def __init__(self, local_dir, gdrive_folder, direction, items=(), unchanged=0, remote_folders=None):
+        super().__init__(items)
+        self.local_dir = local_dir
+        self.gdrive_folder = gdrive_folder
+        self.direction = direction
+        self.unchanged = unchanged
+        self.remote_folders = remote_folders or {(): gdrive_folder}
+
+    def _with_action(self, *actions):
+        return [item for item in self if item.action in actions]
+
+    @property
+    def uploads(self):
+        return self._with_action(SyncAction.UPLOAD, SyncAction.UPDATE)
+
+    @property
+    def downloads(self):
+        return self._with_action(SyncAction.DOWNLOAD)
+
+    @property
+    def deletions(self):
+        return self._with_action(SyncAction.DELETE_LOCAL, SyncAction.DELETE_REMOTE)
+
+    @property
+    def conflicts(self):
+        return self._with_action(SyncAction.CONFLICT)
+
+    def summary(self):
+        counts = collections.Counter(item.action.value for item in self)
+        counts["unchanged"] = self.unchanged
+        return ", ".join("{} {}".format(n, action) for action, n in sorted(counts.items()))
+
+    def __repr__(self):
+        header = "SyncPlan {} {} {}".format(
+            self.local_dir, {"up": "->", "down": "<-", "both": "<->"}[self.direction.value], self.gdrive_folder["title"])
+        return "\n".join([header] + [repr(item) for item in self] + [self.summary()])
+
+
+def _modified_timestamp(gdrive_file):
+    """POSIX timestamp of a google drive file's modifiedDate"""
+    return datetime.datetime.fromisoformat(gdrive_file["modifiedDate"].replace("Z", "+00:00")).timestamp()
+
+
+def _local_manifest(local_dir):
+    """({path: local path} of every file, set of folder paths) below local_dir, skipping hidden files"""
+    files = {}
+    folders = set()
+    for dirpath, dirnames, filenames in os.walk(local_dir):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        folder_path = tuple(os.path.relpath(dirpath, local_dir).split(os.sep)) if dirpath != local_dir else ()
+        folders.add(folder_path)
+        for filename in filenames:
+            if not filename.startswith("."):
+                files[folder_path + (filename,)] = os.path.join(dirpath, filename)
+    return files, folders
+
+
+def _remote_manifest(snapshot):
+    """({path: [gdrive files]}, {path: gdrive folder}) of everything in a snapshot"""
+    files = {}
+    folders = {(): snapshot.root}
+    for path, subfolders, subfiles in snapshot.walk():
+        for f in subfiles:
+            files.setdefault(path + (f["title"],), []).append(f)
+        for f in subfolders:
+            folders.setdefault(path + (f["title"],), f)
+    return files, folders
+
+
+def plan_sync(commands, local_dir, gdrive_folder, direction, delete_removed=False, max_workers=1):
+    """See GDriveCommands.plan_sync"""
+    direction = SyncDirection(direction)
+    local_files, local_folders = _local_manifest(local_dir)
+    remote_files, remote_folders = _remote_manifest(commands.snapshot(gdrive_folder, max_workers=max_workers))
+
+    # Only files of the same size on both sides need hashing
+    same_size = [
+        local_files[path] for path, matches in remote_files.items()
+        if path in local_files and len(matches) == 1 and matches[0].get("md5Checksum")
+        and int(matches[0].get("fileSize", -1)) == os.path.getsize(local_files[path])
+    ]
+    local_checksums = commands._local_md5s(same_size)
+
+    up = direction in (SyncDirection.UP, SyncDirection.BOTH)
+    down = direction in (SyncDirection.DOWN, SyncDirection.BOTH)
+    items = []
+    unchanged = 0
+    for path in sorted(set(local_files) | set(remote_files)):
+        local_path = local_files.get(path, os.path.join(local_dir, *path))
+        matches = remote_files.get(path, [])
+        # Google docs and shortcuts to files have no contents to compare or transfer
+        transferable = [f for f in matches if "fileSize" in f]
+
+        if path not in local_files:
+            if not transferable:
+                continue
+            if path in local_folders:
+                items.append(SyncItem(path, SyncAction.CONFLICT, local_path, matches, "local folder, remote file"))
+            elif len(matches) > 1:
+                if down or delete_removed:
+                    items.append(SyncItem(path, SyncAction.CONFLICT, local_path, matches, "{} files on google drive".format(len(matches))))
+            elif down:
+                items.append(SyncItem(path, SyncAction.DOWNLOAD, local_path, matches, "not in local folder"))
+            elif delete_removed:
+                items.append(SyncItem(path, SyncAction.DELETE_REMOTE, local_path, matches, "not in local folder"))
+            continue
+
+        if not matches:
+            if path in remote_folders:
+                items.append(SyncItem(path, SyncAction.CONFLICT, local_path, [remote_folders[path]], "local file, remote folder"))
+            elif up:
+                items.append(SyncItem(path, SyncAction.UPLOAD, local_path, [], "not on google drive"))
+            elif delete_removed:
+                items.append(SyncItem(path, SyncAction.DELETE_LOCAL, local_path, [], "not on google drive"))
+            continue
+
+        if len(matches) > 1 or not transferable:
+            reason = "{} files on google drive".format(len(matches)) if len(matches) > 1 else "remote file has no contents"
+            items.append(SyncItem(path, SyncAction.CONFLICT, local_path, matches, reason))
+            continue
+
+        remote = matches[0]
+        if int(remote["fileSize"]) != os.path.getsize(local_path):
+            reason = "size changed"
+        elif remote.get("md5Checksum") and remote["md5Checksum"] != local_checksums.get(local_path):
+            reason = "md5 checksum changed"
+        else:
+            unchanged += 1
+            continue
+
+        if direction is SyncDirection.BOTH:
+            local_is_newer = os.path.getmtime(local_path) > _modified_timestamp(remote)
+            action = SyncAction.UPDATE if local_is_newer else SyncAction.DOWNLOAD
+            reason += ", {} is newer".format("local" if local_is_newer else "remote")
+        else:
+            action = SyncAction.UPDATE if up else SyncAction.DOWNLOAD
+        items.append(SyncItem(path, action, local_path, matches, reason))
+
+    return SyncPlan(local_dir, gdrive_folder, direction, items, unchanged, remote_folders)
+
+
+def apply_sync(commands, plan, max_workers=1):
+    """See GDriveCommands.apply_sync"""
+    report = TransferReport()
+
+    # Create the google drive folders that uploads go into, one depth at a time
+    remote_folders = dict(plan.remote_folders)
+    missing = sorted({
+        item.path[:depth]
+        for item in plan.uploads
+        for depth in range(1, len(item.path))
+        if item.path[:depth] not in remote_folders
+    }, key=len)
+    new_folder_ids = set()
+    for depth in sorted({len(path) for path in missing}):
+        level = [path for path in missing if len(path) == depth]
+        created, created_ids = commands._create_folders(
+            [(remote_folders[path[:-1]], path[-1]) for path in level], max_workers, empty_folder_ids=new_folder_ids)
+        remote_folders.update(zip(level, created))
+        new_folder_ids.update(created_ids)
+
+    trashed = plan._with_action(SyncAction.DELETE_REMOTE)
+    if trashed:
+        batch = commands.batch()
+        for i, item in enumerate(trashed):
+            batch.trash(item.gdrive_files[0]["id"], key=i)
+        for result in batch.execute():
+            item = trashed[result.key]
+            if result.ok:
+                commands._invalidate(
+                    commands._to_id(remote_folders[item.path[:-1]]), item.path[-1], removed=item.gdrive_files[0])
+                report.append(TransferResult(item.local_path, item.gdrive_files[0], TransferStatus.DELETED))
+            else:
+                report.append(TransferResult(item.local_path, item.gdrive_files[0], TransferStatus.FAILED, result.error))
+
+    def transfer(item):
+        try:
+            if item.action is SyncAction.UPLOAD:
+                return commands._upload(item.local_path, remote_folders[item.path[:-1]], item.path[-1])
+            elif item.action is SyncAction.UPDATE:
+                return commands._update_contents(item.gdrive_files[0], item.local_path, remote_folders[item.path[:-1]])
+            elif item.action is SyncAction.DOWNLOAD:
+                os.makedirs(os.path.dirname(item.local_path), exist_ok=True)
+                return commands.download_file(item.gdrive_files[0], item.local_path, overwrite=commands.Overwrite.ALWAYS)
+            else:
+                os.remove(item.local_path)
+                return TransferResult(item.local_path, None, TransferStatus.DELETED)
+        except Exception as e:
+            commands.logger.error("Failed to {} {}: {}".format(item.action.value, item.local_path, e))
+            return TransferResult(item.local_path, (item.gdrive_files or [plan.gdrive_folder])[0], TransferStatus.FAILED, e)
+
+    for item in plan.conflicts:
+        error = MultipleFilesError(item.reason) if len(item.gdrive_files) > 1 else FileExists(item.reason)
+        report.append(TransferResult(item.local_path, item.gdrive_files[0], TransferStatus.FAILED, error))
+
+    jobs = plan._with_action(SyncAction.UPLOAD, SyncAction.UPDATE, SyncAction.DOWNLOAD, SyncAction.DELETE_LOCAL)
+    report.extend(commands._map(transfer, jobs, max_workers))
+    return report
+
+
+__all__ = [
+    "SyncAction",
+    "SyncDirection",
+    "SyncItem",
+    "SyncManifest",
+    "SyncPlan",
+    "apply_sync",
+    "plan_sync",
+    "sync_down",
+]
@@ -8,7 +8,7 @@ setup(
     author="Kevin Yu",
     author_email="kvnyu@berkeley.edu",
     license="MIT License",
-    packages=["gdrive_access"],
+    packages=["gdrive_access", "gdrive_access.benchmark"],
     entry_points={
         "console_scripts": ["setup_gdrive_credentials = gdrive_access.setup_credentials:run"],
     },
@@ -0,0 +1,9 @@
+import pytest
+
+from gdrive_access.benchmark.fake_drive import FakeDriveServer
+
+
+@pytest.fixture
+def server():
+    with FakeDriveServer() as server:
+        yield server
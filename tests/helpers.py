@@ -0,0 +1,26 @@
+"""
+Helpers shared by the tests
+"""
+
+import logging
+import os
+
+from gdrive_access import GDriveCommands
+
+
+def commands(server, **kwargs):
+    """A GDriveCommands talking to a FakeDriveServer, without rate limiting or log noise"""
+    kwargs.setdefault("qps", None)
+    kwargs.setdefault("log_level", logging.CRITICAL)
+    return GDriveCommands(drive=server.client(), **kwargs)
+
+
+def write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
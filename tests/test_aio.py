@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import time
+
+from gdrive_access import AsyncGDriveCommands
+
+from .helpers import commands, read, write
+
+
+def test_calls_run_concurrently_up_to_limit(server):
+    for i in range(8):
+        server.drive.add_folder("folder{}".format(i))
+    g = commands(server)
+    running = []
+    most = []
+    lock = threading.Lock()
+    find = g.find
+
+    def slow_find(*path):
+        with lock:
+            running.append(1)
+            most.append(len(running))
+        time.sleep(0.05)
+        try:
+            return find(*path)
+        finally:
+            with lock:
+                running.pop()
+
+    g.find = slow_find
+
+    async def main():
+        async with AsyncGDriveCommands(g, max_concurrency=3) as a:
+            return await asyncio.gather(*[a.find("folder{}".format(i)) for i in range(8)])
+
+    found = asyncio.run(main())
+
+    assert [f["title"] for f in found] == ["folder{}".format(i) for i in range(8)]
+    assert max(most) == 3
+
+
+def test_transfers(server, tmp_path):
+    top = server.drive.add_folder("top")
+    for i in range(5):
+        server.drive.add_file("file{}".format(i), top["id"], content="{}".format(i).encode())
+    write(str(tmp_path / "upload"), b"uploaded")
+    a = AsyncGDriveCommands(commands(server), max_concurrency=4)
+
+    async def main():
+        folder = await a.find("top")
+        report = await a.download_folder(folder, str(tmp_path / "out"))
+        result = await a.upload_file(str(tmp_path / "upload"), folder)
+        exists = await a.exists_many([("top", "upload"), ("top", "missing")])
+        return report, result, exists
+
+    report, result, exists = asyncio.run(main())
+    a.close()
+
+    assert len(report.downloaded) == 5
+    assert read(str(tmp_path / "out" / "top" / "file3")) == b"3"
+    assert server.drive.content[result.gdrive_file["id"]] == b"uploaded"
+    assert exists == {("top", "upload"): True, ("top", "missing"): False}
@@ -0,0 +1,67 @@
+import pytest
+
+from gdrive_access.batch import BATCH_LIMIT
+from gdrive_access.benchmark import fake_drive
+
+from .helpers import commands
+
+
+@pytest.fixture
+def flaky(monkeypatch):
+    """Makes the first request about each of the returned ids fail with a server error"""
+    ids = set()
+    dispatch = fake_drive.dispatch
+
+    def flaky_dispatch(drive, method, path, query, headers, body):
+        # The requests inside a batch are dispatched one by one after the batch itself
+        if path.startswith("/batch/"):
+            return dispatch(drive, method, path, query, headers, body)
+        for file_id in list(ids):
+            if file_id in path or file_id.encode() in body:
+                ids.discard(file_id)
+                return fake_drive._error_body(503, "backendError")
+        return dispatch(drive, method, path, query, headers, body)
+
+    monkeypatch.setattr(fake_drive, "dispatch", flaky_dispatch)
+    return ids
+
+
+def test_batch_results_in_order(server):
+    files = [server.drive.add_file("file{}".format(i)) for i in range(BATCH_LIMIT + 20)]
+    g = commands(server)
+    batch = g.batch()
+    for f in files:
+        batch.rename(f["id"], f["title"].upper(), key=f["id"])
+    batch.get("missing", key="missing")
+    batch.shortcut_target(files[0]["id"])
+
+    results = batch.execute()
+
+    assert server.drive.calls["batch"] == 2
+    assert [result.key for result in results] == [f["id"] for f in files] + ["missing", len(files) + 1]
+    assert all(result.ok for result in results[:len(files)])
+    assert results[3].file["title"] == "FILE3"
+    assert server.drive.files[files[3]["id"]]["title"] == "FILE3"
+    assert not results[-2].ok and results[-2].error.error["code"] == 404
+    assert results[-1].file["title"] == "FILE0"
+
+
+def test_failed_requests_are_retried(server, flaky):
+    top = server.drive.add_folder("top")
+    files = [server.drive.add_file("file{}".format(i), top["id"]) for i in range(5)]
+    g = commands(server)
+    g._scheduler.backoff_base = 0
+    flaky.update([files[1]["id"], files[3]["id"], "new folder"])
+
+    batch = g.batch()
+    for f in files:
+        batch.trash(f["id"])
+    batch.create_folder(top["id"], "new folder")
+    results = batch.execute()
+
+    assert [result.ok for result in results] == [True] * 5 + [False]
+    assert all(server.drive.files[f["id"]]["labels"]["trashed"] for f in files)
+    assert results[-1].error.error["code"] == 503
+    # Only the failed trash requests were sent again; the folder may have been created
+    assert server.drive.calls["batch"] == 2
+    assert g.metrics.counter("retries", kind="batch_item") == 2
@@ -0,0 +1,24 @@
+from gdrive_access.benchmark import OPERATIONS, format_results, load_results, run_benchmark, run_benchmarks, save_results
+
+
+def test_run_benchmarks(tmp_path):
+    results = run_benchmarks(trees=["deep"], measure_memory=False)
+
+    assert [r["operation"] for r in results] == list(OPERATIONS)
+    by_operation = {r["operation"]: r for r in results}
+    assert by_operation["download_folder"]["files"] == by_operation["upload_folder"]["files"] > 20
+    assert by_operation["download_folder"]["calls"]["files.get_media"] == by_operation["download_folder"]["files"]
+    assert all(r["api_calls"] > 0 and r["seconds"] > 0 for r in results)
+
+    save_results(results, str(tmp_path / "results.json"), settings={"scale": 1})
+    baseline = load_results(str(tmp_path / "results.json"))
+    table = format_results(results, baseline=baseline)
+    assert len(table.splitlines()) == len(results) + 1
+    assert "1.00x" in table
+
+
+def test_benchmark_memory():
+    result = run_benchmark("wide", "ls", compact_listings=True)
+    assert result["files"] == 2000
+    assert result["calls"] == {"files.list": 2}
+    assert result["peak_memory_bytes"] > 0
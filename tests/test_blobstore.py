@@ -0,0 +1,77 @@
+import os
+import threading
+
+from gdrive_access import BlobStore
+
+from .helpers import commands, read, write
+
+
+def test_identical_contents_downloaded_once(server, tmp_path):
+    folder = server.drive.add_folder("folder")
+    for i in range(4):
+        server.drive.add_file("copy{}".format(i), folder["id"], content=b"same contents")
+    server.drive.add_file("other", folder["id"], content=b"other contents")
+    g = commands(server, blob_store=str(tmp_path / "blobs"))
+
+    report = g.download_folder(g.find("folder"), str(tmp_path / "out"), max_workers=4)
+
+    assert len(report.downloaded) == 5
+    assert server.drive.calls["files.get_media"] == 2
+    assert read(str(tmp_path / "out" / "folder" / "copy3")) == b"same contents"
+    assert len(g._blob_store) == 2
+
+    # Later downloads of the same contents come from the store
+    g.download_folder(g.find("folder"), str(tmp_path / "again"))
+    assert server.drive.calls["files.get_media"] == 2
+
+
+def add(store, tmp_path, md5, contents):
+    path = str(tmp_path / "incoming")
+    write(path, contents)
+    return store.put(md5, path)
+
+
+def test_least_recently_used_blobs_evicted(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"), max_size=25)
+    for md5 in ("a0", "b0", "c0"):
+        add(store, tmp_path, md5, b"0123456789")
+    store.get("a0")
+
+    store.evict()
+
+    assert store.size == 20
+    assert "b0" not in store
+    assert "a0" in store and "c0" in store
+    assert not os.path.exists(store.blob_path("b0"))
+
+
+def test_evict_skips_locked_blobs(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"), max_size=15)
+    add(store, tmp_path, "a0", b"0123456789")
+    add(store, tmp_path, "b0", b"0123456789")
+
+    with store.lock("a0"):
+        store.evict()
+        assert store.materialize("a0", str(tmp_path / "dest"))
+
+    assert read(str(tmp_path / "dest")) == b"0123456789"
+    assert "a0" in store and "b0" not in store
+
+
+def test_materialize_evicted_blob_is_a_miss(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"), max_size=0)
+    blob_path = add(store, tmp_path, "a0", b"0123456789")
+    get = store.get
+
+    def get_then_evict(md5):
+        # Another process evicts the blob between looking it up and placing it
+        path = get(md5)
+        other = threading.Thread(target=BlobStore(store.path, max_size=0).evict)
+        other.start()
+        other.join()
+        return path
+
+    store.get = get_then_evict
+    assert not store.materialize("a0", str(tmp_path / "dest"))
+    assert not os.path.exists(blob_path)
+    assert not os.path.exists(str(tmp_path / "dest"))
@@ -0,0 +1,105 @@
+import os
+
+from gdrive_access import GDriveCommands
+from gdrive_access.bundle import BUNDLE_PREFIX, INDEX_NAME
+
+from .helpers import commands, read, write
+
+
+def titles(g, folder):
+    return sorted(f["title"] for f in g.ls(folder))
+
+
+def bundles(g, folder):
+    return [title for title in titles(g, folder) if title.startswith(BUNDLE_PREFIX)]
+
+
+def make_tree(local):
+    for i in range(20):
+        write(str(local / "small" / "file{:02d}".format(i)), "small {:02d}".format(i).encode())
+    write(str(local / "mixed" / "big"), b"x" * 1000)
+    write(str(local / "mixed" / "little"), b"little")
+    os.makedirs(str(local / "empty"))
+
+
+def test_small_files_bundled(server, tmp_path):
+    local = tmp_path / "src"
+    make_tree(local)
+    server.drive.add_folder("dest")
+    g = commands(server)
+
+    report = g.upload_folder(str(local), g.find("dest"), bundle_threshold=100, bundle_size=50)
+
+    assert len(report.uploaded) == 22
+    folder = g.find("dest", "src")
+    # Only the folder of the big file is created, and the small files go in 3 bundles
+    assert titles(g, g.find(folder, "mixed")) == ["big"]
+    assert len(bundles(g, folder)) == 3
+    assert [t for t in titles(g, folder) if not t.startswith(BUNDLE_PREFIX)] == [INDEX_NAME, "mixed"]
+    # Two folders, then big, the bundles and the index
+    assert server.drive.calls["files.insert"] == 2
+    assert server.drive.calls["upload.complete"] == 1 + 3 + 1
+
+    report = g.download_folder(folder, str(tmp_path / "out"))
+
+    assert len(report.downloaded) == 22
+    out = tmp_path / "out" / "src"
+    assert read(str(out / "small" / "file07")) == b"small 07"
+    assert read(str(out / "mixed" / "little")) == b"little"
+    assert read(str(out / "mixed" / "big")) == b"x" * 1000
+    assert os.path.isdir(str(out / "empty"))
+    # The bundles are unpacked, not saved
+    assert not [name for name in os.listdir(str(out)) if name.startswith(BUNDLE_PREFIX)]
+
+
+def test_bundled_files_skipped_or_packed_again(server, tmp_path):
+    local = tmp_path / "src"
+    make_tree(local)
+    server.drive.add_folder("dest")
+    g = commands(server)
+    dest = g.find("dest")
+    g.upload_folder(str(local), dest, bundle_threshold=100, bundle_size=50)
+    folder = g.find(dest, "src")
+    first_bundles = bundles(g, folder)
+
+    write(str(local / "small" / "file00"), b"changed")
+    report = g.upload_folder(
+        str(local), dest, bundle_threshold=100, overwrite_folder=True, overwrite_file=GDriveCommands.Overwrite.NEVER)
+    assert len(report.skipped) == 22
+    assert bundles(g, folder) == first_bundles
+
+    report = g.upload_folder(str(local), dest, bundle_threshold=100, overwrite_folder=True)
+    assert len(report.uploaded) == 1 and len(report.skipped) == 21
+    # The new bundle is added and the old ones are kept, as they still hold other files
+    assert len(bundles(g, folder)) == 4
+
+    out = str(tmp_path / "out")
+    write(os.path.join(out, "src", "small", "file01"), b"local edit")
+    report = g.download_folder(folder, out, overwrite=GDriveCommands.Overwrite.NEVER)
+    assert len(report.skipped) == 1 and len(report.downloaded) == 21
+    assert read(os.path.join(out, "src", "small", "file00")) == b"changed"
+    assert read(os.path.join(out, "src", "small", "file01")) == b"local edit"
+
+
+def test_bundled_upload_with_duplicate_index(server, tmp_path):
+    local = tmp_path / "src"
+    for i in range(5):
+        write(str(local / "sub" / "file{}".format(i)), "v1 {}".format(i).encode())
+    server.drive.add_folder("dest")
+    g = commands(server)
+    dest = g.find("dest")
+    assert len(g.upload_folder(str(local), dest, bundle_threshold=1000).uploaded) == 5
+
+    # An upload interrupted between uploading the new index and trashing the old one leaves two
+    folder = g.find(dest, "src")
+    index, = [f for f in g.ls(folder) if f["title"] == INDEX_NAME]
+    server.drive.add_file(INDEX_NAME, folder["id"], content=server.drive.content[index["id"]])
+
+    write(str(local / "sub" / "file0"), b"v2")
+    report = g.upload_folder(str(local), dest, bundle_threshold=1000, overwrite_folder=True)
+    assert len(report.uploaded) == 1 and len(report.skipped) == 4
+    assert len([f for f in g.ls(folder) if f["title"] == INDEX_NAME]) == 1
+
+    report = g.download_folder(folder, str(tmp_path / "out"))
+    assert len(report.downloaded) == 5
+    assert read(str(tmp_path / "out" / "src" / "sub" / "file0")) == b"v2"
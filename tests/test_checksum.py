@@ -0,0 +1,87 @@
+import hashlib
+import os
+
+from gdrive_access import ChecksumCache, GDriveCommands
+from gdrive_access import checksum
+
+from .helpers import write
+
+
+def test_md5_file_reads_in_chunks(tmp_path):
+    data = os.urandom(10000)
+    write(str(tmp_path / "file"), data)
+    assert checksum.md5_file(str(tmp_path / "file"), chunk_size=999) == hashlib.md5(data).hexdigest()
+
+
+def test_checksum_cache(tmp_path, monkeypatch):
+    path = str(tmp_path / "file")
+    write(path, b"first")
+    cache = ChecksumCache(str(tmp_path / "checksums.db"))
+    assert cache.get(path) is None
+    assert cache.md5(path) == hashlib.md5(b"first").hexdigest()
+
+    # Unchanged files are not hashed again, also by a new cache on the same database
+    hashed = []
+    monkeypatch.setattr(checksum, "md5_file", lambda path: hashed.append(path) or "hashed")
+    cache = ChecksumCache(str(tmp_path / "checksums.db"))
+    assert cache.md5(path) == hashlib.md5(b"first").hexdigest()
+    assert checksum.md5_many([path], cache=cache) == {path: hashlib.md5(b"first").hexdigest()}
+    assert hashed == []
+
+    write(path, b"second, longer")
+    assert cache.get(path) is None
+    assert cache.md5(path) == "hashed"
+    cache.close()
+
+
+def test_md5_many_in_processes(tmp_path, monkeypatch):
+    monkeypatch.setattr(checksum, "PARALLEL_MIN_BYTES", 0)
+    paths = []
+    for i in range(4):
+        path = str(tmp_path / "file{}".format(i))
+        write(path, os.urandom(1000))
+        paths.append(path)
+    cache = ChecksumCache(str(tmp_path / "checksums.db"))
+
+    result = checksum.md5_many(paths, cache=cache, processes=2)
+
+    assert result == {path: checksum.md5_file(path) for path in paths}
+    assert all(cache.get(path) == result[path] for path in paths)
+
+
+def test_hash_pool_is_shared(tmp_path, monkeypatch):
+    monkeypatch.setattr(checksum, "PARALLEL_MIN_BYTES", 0)
+    paths = []
+    for i in range(4):
+        path = str(tmp_path / "file{}".format(i))
+        write(path, os.urandom(1000))
+        paths.append(path)
+    g = GDriveCommands(drive=object(), qps=None, hash_processes=2)
+
+    first = g._local_md5s(paths)
+    pool = g._hash_pool
+    assert g._local_md5s(paths) == first
+    assert g._hash_pool is pool
+    assert first == {path: checksum.md5_file(path) for path in paths}
+    g.close()
+
+
+def test_close_shuts_down_hash_pool(tmp_path, monkeypatch):
+    monkeypatch.setattr(checksum, "PARALLEL_MIN_BYTES", 0)
+    paths = []
+    for i in range(2):
+        path = str(tmp_path / "file{}".format(i))
+        write(path, os.urandom(1000))
+        paths.append(path)
+
+    with GDriveCommands(drive=object(), qps=None, hash_processes=2) as g:
+        g._local_md5s(paths)
+        pool = g._hash_pool
+        processes = list(pool._processes.values())
+    assert g._hash_pool is None
+    assert all(not process.is_alive() for process in processes)
+
+    # Hashing again starts a new pool
+    assert g._local_md5s(paths) == {path: checksum.md5_file(path) for path in paths}
+    assert g._hash_pool is not None and g._hash_pool is not pool
+    g.close()
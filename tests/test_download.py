@@ -0,0 +1,59 @@
+from gdrive_access.errors import MultipleFilesError
+
+from .helpers import commands, read
+
+
+def test_download_folder_concurrently(server, tmp_path):
+    top = server.drive.add_folder("top")
+    sub = server.drive.add_folder("sub", top["id"])
+    for i in range(20):
+        server.drive.add_file("file{}".format(i), top["id"], content="top {}".format(i).encode())
+        server.drive.add_file("file{}".format(i), sub["id"], content="sub {}".format(i).encode())
+    g = commands(server)
+
+    report = g.download_folder(g.find("top"), str(tmp_path), max_workers=8)
+
+    assert len(report.downloaded) == 40 and not report.failed
+    for i in range(20):
+        assert read(str(tmp_path / "top" / "file{}".format(i))) == "top {}".format(i).encode()
+        assert read(str(tmp_path / "top" / "sub" / "file{}".format(i))) == "sub {}".format(i).encode()
+
+    # Existing files are skipped without being downloaded again
+    server.drive.reset_stats()
+    report = g.download_folder(g.find("top"), str(tmp_path), max_workers=8)
+    assert len(report.skipped) == 40
+    assert server.drive.calls["files.get_media"] == 0
+
+
+def test_download_files_reports_failures(server, tmp_path):
+    good = server.drive.add_file("good", content=b"good")
+    bad = server.drive.add_file("bad", content=b"bad")
+    folder = server.drive.add_folder("folder")
+    server.drive.add_file("inner", folder["id"], content=b"inner")
+    # Files without contents fail with 403 fileNotDownloadable
+    del server.drive.content[bad["id"]]
+    g = commands(server)
+
+    report = g.download_files([g.find("good"), g.find("bad"), g.find("folder")], str(tmp_path), max_workers=4)
+
+    assert sorted(result.gdrive_file["title"] for result in report.downloaded) == ["good", "inner"]
+    assert [result.gdrive_file["title"] for result in report.failed] == ["bad"]
+    assert read(str(tmp_path / "good")) == b"good"
+    assert read(str(tmp_path / "folder" / "inner")) == b"inner"
+    assert not (tmp_path / "bad").exists()
+
+
+def test_download_folder_downloads_one_file_per_title(server, tmp_path):
+    folder = server.drive.add_folder("top")
+    for i in range(10):
+        server.drive.add_file("file{}".format(i), folder["id"], content=b"a" * 300000)
+        server.drive.add_file("file{}".format(i), folder["id"], content=b"b" * 100000)
+    g = commands(server)
+
+    report = g.download_folder(g.find("top"), str(tmp_path), max_workers=16)
+
+    assert len(report.downloaded) == 10
+    assert len(report.failed) == 10
+    assert all(isinstance(result.error, MultipleFilesError) for result in report.failed)
+    for i in range(10):
+        assert read(str(tmp_path / "top" / "file{}".format(i))) in (b"a" * 300000, b"b" * 100000)
@@ -0,0 +1,104 @@
+"""
+Tests of the in-process fake google drive server
+"""
+
+import urllib.error
+import urllib.request
+
+import pytest
+from googleapiclient import errors
+
+from gdrive_access.benchmark.fake_drive import FakeDrive, FakeDriveServer, QueryError, parse_query
+
+from .helpers import commands
+
+
+def test_parse_query():
+    drive = FakeDrive()
+    folder = drive.add_folder("folder")
+    a = drive.add_file("a.txt", folder["id"])
+    b = drive.add_file("b.csv", folder["id"])
+    drive.trash(b["id"])
+    shared = drive.add_file("shared.txt", None, shared_with_me=True)
+
+    def titles(q):
+        return sorted(f["title"] for f in drive.list(q))
+
+    assert titles("'{}' in parents".format(folder["id"])) == ["a.txt", "b.csv"]
+    assert titles("'{}' in parents and trashed = false".format(folder["id"])) == ["a.txt"]
+    assert titles("title = 'a.txt' or (title contains 'CSV' and not trashed = false)") == ["a.txt", "b.csv"]
+    assert titles("'root' in parents and mimeType = 'application/vnd.google-apps.folder'") == ["folder"]
+    assert titles("sharedWithMe") == ["shared.txt"]
+    assert titles("title = 'it\\'s'") == []
+    assert parse_query("modifiedDate >= '{}'".format(a["modifiedDate"]))(a)
+    with pytest.raises(QueryError):
+        drive.list("title = 'a' and (")
+
+
+def test_list_page_size_is_limited(server):
+    service = server.auth().service
+    with pytest.raises(errors.HttpError) as e:
+        service.files().list(maxResults=1001).execute()
+    assert e.value.resp.status == 400
+    with pytest.raises(errors.HttpError):
+        service.changes().list(maxResults=1001).execute()
+
+
+def test_list_pages_and_fields(server):
+    folder = server.drive.add_folder("folder")
+    for i in range(250):
+        server.drive.add_file("file{}".format(i), folder["id"], content=b"abc")
+    service = server.auth().service
+
+    response = service.files().list(
+        q="'{}' in parents".format(folder["id"]), maxResults=100, fields="nextPageToken,items(id,title)"
+    ).execute()
+    assert len(response["items"]) == 100
+    assert set(response["items"][0]) == {"id", "title"}
+
+    pages = list(server.client().ListFile({"q": "'{}' in parents".format(folder["id"]), "maxResults": 100}))
+    assert [len(page) for page in pages] == [100, 100, 50]
+    assert pages[0][0]["fileSize"] == "3"
+
+
+def test_media_ranges(server):
+    file_ = server.drive.add_file("file", content=bytes(range(100)))
+    request = urllib.request.Request(
+        "{}drive/v2/files/{}?alt=media".format(server.url, file_["id"]), headers={"Range": "bytes=10-19"}
+    )
+    with urllib.request.urlopen(request) as response:
+        assert response.status == 206
+        assert response.headers["Content-Range"] == "bytes 10-19/100"
+        assert response.read() == bytes(range(10, 20))
+
+    request = urllib.request.Request(
+        "{}drive/v2/files/{}?alt=media".format(server.url, file_["id"]), headers={"Range": "bytes=200-"}
+    )
+    with pytest.raises(urllib.error.HTTPError) as e:
+        urllib.request.urlopen(request)
+    assert e.value.code == 416
+
+
+def test_changes_feed(server):
+    service = server.auth().service
+    token = service.changes().getStartPageToken().execute()["startPageToken"]
+    file_ = server.drive.add_file("file")
+    server.drive.trash(file_["id"])
+
+    response = service.changes().list(pageToken=token).execute()
+    assert [change["fileId"] for change in response["items"]] == [file_["id"], file_["id"]]
+    assert response["items"][-1]["file"]["labels"]["trashed"]
+    assert response["newStartPageToken"] == str(len(server.drive.changes))
+
+
+def test_injected_errors_are_retried():
+    with FakeDriveServer(error_rate=0.3, seed=1) as server:
+        folder = server.drive.add_folder("folder")
+        for i in range(20):
+            server.drive.add_file("file{}".format(i), folder["id"])
+        g = commands(server, cache_ttl=0)
+        g._scheduler.backoff_base = 0
+
+        assert len(g.ls(g.find("folder"))) == 20
+        assert server.drive.calls["error"] > 0
+
@@ -0,0 +1,73 @@
+import pytest
+
+from gdrive_access.errors import MultipleFilesError, NotFoundError
+
+from .helpers import commands
+
+
+@pytest.fixture
+def deep(server):
+    folder = server.drive.add_folder("top")
+    for i in range(8):
+        folder = server.drive.add_folder("level{}".format(i), folder["id"])
+    server.drive.add_file("file", folder["id"], content=b"abc")
+    # Folders elsewhere with the same names
+    other = server.drive.add_folder("other")
+    for i in range(8):
+        server.drive.add_folder("level{}".format(i), other["id"])
+    return ["level{}".format(i) for i in range(8)]
+
+
+def test_find_deep_path_in_one_query(server, deep):
+    g = commands(server, cache_ttl=0)
+
+    found = g.find("top", *deep, "file")
+
+    assert found["fileSize"] == "3"
+    # The root level by title, then everything below it at once
+    assert server.drive.calls["files.list"] == 2
+
+
+def test_find_deep_path_errors(server, deep):
+    top = server.drive.files[server.drive.list("title = 'top'")[0]["id"]]
+    server.drive.add_folder("level0", top["id"])
+    g = commands(server, cache_ttl=0)
+
+    with pytest.raises(MultipleFilesError):
+        g.find("top", *deep, "file")
+    with pytest.raises(NotFoundError):
+        g.find("other", "level1", "missing", "file")
+
+
+def test_find_deep_path_through_shortcuts(server, deep):
+    target = server.drive.list("title = 'level3'")[0]
+    start = server.drive.add_folder("start")
+    server.drive.add_shortcut("link", target["id"], start["id"])
+    g = commands(server, cache_ttl=0)
+    start = g.find("start")
+
+    server.drive.reset_stats()
+    found = g.find(start, "link", *deep[4:], "file")
+
+    assert found["fileSize"] == "3"
+    assert server.drive.calls["files.list"] == 1
+
+
+def test_find_deep_path_with_common_names(server):
+    top = server.drive.add_folder("top")
+    a = server.drive.add_folder("a", top["id"])
+    b = server.drive.add_folder("b", a["id"])
+    server.drive.add_file("file", b["id"], content=b"abc")
+    other = server.drive.add_folder("other")
+    for _ in range(1500):
+        server.drive.add_folder("b", other["id"])
+    g = commands(server, cache_ttl=0)
+    top = g.find("top")
+
+    server.drive.reset_stats()
+    found = g.find(top, "a", "b", "file")
+
+    assert found["fileSize"] == "3"
+    # A page of 1000 candidates with more to come for each attempt to resolve several levels
+    # ("a", "b", "file" and then "b", "file"), then one query per level
+    assert server.drive.calls["files.list"] == 5
@@ -0,0 +1,51 @@
+import pytest
+
+from gdrive_access.errors import MultipleFilesError
+
+from .helpers import commands
+
+
+@pytest.fixture
+def tree(server):
+    top = server.drive.add_folder("top")
+    for i in range(3):
+        folder = server.drive.add_folder("folder{}".format(i), top["id"])
+        for j in range(50):
+            server.drive.add_file("file{}".format(j), folder["id"])
+    server.drive.add_file("same", top["id"])
+    server.drive.add_file("same", top["id"])
+    for i in range(100):
+        server.drive.add_file("shared{}".format(i), None, shared_with_me=True)
+    return top
+
+
+def test_find_many_lists_each_folder_once(server, tree):
+    g = commands(server)
+    paths = [("top", "folder{}".format(i), "file{}".format(j)) for i in range(3) for j in range(50)]
+    paths += [("top", "folder9", "file0"), ("top", "folder0", "file0", "below a file"), ("missing",), ("shared5",)]
+
+    found = g.find_many(paths, max_workers=4)
+
+    assert len(found) == len(paths)
+    assert all(found[path]["title"] == path[-1] for path in paths[:150])
+    assert found[("shared5",)]["title"] == "shared5"
+    assert found[("top", "folder9", "file0")] is None
+    assert found[("top", "folder0", "file0", "below a file")] is None
+    assert found[("missing",)] is None
+    # top, missing and shared5 by title in the root, then top and its 3 folders
+    assert server.drive.calls["files.list"] == 7
+
+    # Found paths are cached for find()
+    server.drive.reset_stats()
+    assert g.find("top", "folder1", "file7")["title"] == "file7"
+    assert server.drive.calls["files.list"] == 0
+
+
+def test_exists_many(server, tree):
+    g = commands(server)
+    top = g.find("top")
+
+    assert g.exists_many([["folder0", "file1"], ["folder0", "nope"]], root=top) == {
+        ("folder0", "file1"): True, ("folder0", "nope"): False}
+    with pytest.raises(MultipleFilesError):
+        g.find_many([("same",)], root=top)
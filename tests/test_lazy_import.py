@@ -0,0 +1,35 @@
+import subprocess
+import sys
+
+import pytest
+
+import gdrive_access
+
+
+def loaded_after(code):
+    """The modules of interest that are loaded after running code in a fresh interpreter"""
+    script = code + (
+        "\nimport sys"
+        "\nprint(sorted(m for m in ('pydrive2', 'googleapiclient', 'gdrive_access.access') if m in sys.modules))"
+    )
+    output = subprocess.run([sys.executable, "-c", script], check=True, stdout=subprocess.PIPE).stdout
+    return output.decode().strip().splitlines()[-1]
+
+
+def test_import_does_not_load_drive_clients():
+    assert loaded_after("import gdrive_access") == "[]"
+    assert loaded_after("from gdrive_access import MetadataCache, FileRecord") == "[]"
+    assert loaded_after("import gdrive_access; gdrive_access.GDriveCommands") == (
+        "['gdrive_access.access', 'googleapiclient', 'pydrive2']")
+
+
+def test_exports():
+    from gdrive_access.access import GDriveCommands
+
+    assert gdrive_access.GDriveCommands is GDriveCommands
+    assert set(gdrive_access.__all__) <= set(dir(gdrive_access))
+    assert "SyncPlan" in dir(gdrive_access)
+    with pytest.raises(AttributeError):
+        gdrive_access.NotAThing
+    with pytest.raises(ImportError):
+        from gdrive_access import NotAThing  # noqa: F401
@@ -0,0 +1,78 @@
+import time
+
+from gdrive_access import MetadataCache
+
+from .helpers import commands, write
+
+
+def test_listings_are_shared_between_processes(server, tmp_path):
+    folder = server.drive.add_folder("top")
+    for i in range(50):
+        server.drive.add_file("file{}".format(i), folder["id"])
+    db_path = str(tmp_path / "metadata.db")
+    top = commands(server).find("top")
+    commands(server, metadata_cache=db_path).ls(top)
+
+    server.drive.reset_stats()
+    g = commands(server, metadata_cache=db_path)
+    assert len(g.ls(top)) == 50
+    assert g.find(top, "file7")["title"] == "file7"
+    assert not g.exists(top, "missing")
+    # Only the check that the listing is current
+    assert server.drive.calls["files.list"] == 1
+    assert g.metrics.counter("cache_hits", cache="metadata") == 3
+
+
+def test_old_listings_are_not_used(server, tmp_path):
+    folder = server.drive.add_folder("top")
+    server.drive.add_file("file", folder["id"])
+    db_path = str(tmp_path / "metadata.db")
+    top = commands(server).find("top")
+    commands(server, metadata_cache=db_path).ls(top)
+
+    # Trashed elsewhere, which the modifiedDate check doesn't see
+    server.drive.trash(server.drive.list("title = 'file'")[0]["id"])
+    assert len(commands(server, metadata_cache=db_path).ls(top)) == 1
+    time.sleep(0.2)
+    assert len(commands(server, metadata_cache=MetadataCache(db_path, max_age=0.1)).ls(top)) == 0
+
+
+def test_root_names_are_looked_up_by_title(server, tmp_path):
+    server.drive.add_folder("top")
+    for i in range(50):
+        server.drive.add_file("shared{}".format(i), None, shared_with_me=True)
+    g = commands(server, metadata_cache=str(tmp_path / "metadata.db"))
+
+    assert g.find("top")["title"] == "top"
+    assert g.find("shared3")["title"] == "shared3"
+    assert server.drive.calls["files.list"] == 2
+    assert g._metadata_cache.get_children("root") is None
+
+
+def test_upload_file_with_metadata_cache_does_not_relist(server, tmp_path):
+    folder = server.drive.add_folder("top")
+    for i in range(1500):
+        server.drive.add_file("file{}".format(i), folder["id"])
+    for i in range(20):
+        write(str(tmp_path / "upload{}".format(i)), str(i).encode())
+    g = commands(server, metadata_cache=str(tmp_path / "metadata.db"))
+    top = g.find("top")
+
+    server.drive.reset_stats()
+    for i in range(20):
+        g.upload_file(str(tmp_path / "upload{}".format(i)), top)
+
+    # Listing the folder once takes 2 pages of 1000
+    assert server.drive.calls["files.list"] == 2
+    assert len(g.ls(top)) == 1520
+
+
+def test_metadata_cache_notices_files_added_elsewhere(server, tmp_path):
+    folder = server.drive.add_folder("top")
+    server.drive.add_file("file", folder["id"])
+    db_path = str(tmp_path / "metadata.db")
+    top = commands(server).find("top")
+    assert len(commands(server, metadata_cache=db_path).ls(top)) == 1
+
+    server.drive.add_file("new file", folder["id"])
+    assert len(commands(server, metadata_cache=db_path).ls(top)) == 2
@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from gdrive_access import Metrics
+
+from .helpers import commands, write
+
+
+def test_prometheus_and_json_export(tmp_path):
+    metrics = Metrics(buckets=(0.1, 1.0))
+    metrics.inc("api_calls", kind="files.list")
+    metrics.inc("api_calls", 2, kind="files.get")
+    metrics.inc("bytes_downloaded", 100)
+    metrics.observe("api_call_seconds", 0.05, kind="files.list")
+    metrics.observe("api_call_seconds", 0.5, kind="files.list")
+    metrics.observe("method_seconds", 2.5, method='say "hi"')
+
+    assert metrics.counter("api_calls") == 3
+    assert metrics.counter("api_calls", kind="files.get") == 2
+
+    lines = metrics.to_prometheus().splitlines()
+    assert lines[:5] == [
+        "# TYPE gdrive_access_api_calls_total counter",
+        'gdrive_access_api_calls_total{kind="files.get"} 2',
+        'gdrive_access_api_calls_total{kind="files.list"} 1',
+        "# TYPE gdrive_access_bytes_downloaded_total counter",
+        "gdrive_access_bytes_downloaded_total 100",
+    ]
+    assert 'gdrive_access_api_call_seconds_bucket{kind="files.list",le="0.1"} 1' in lines
+    assert 'gdrive_access_api_call_seconds_bucket{kind="files.list",le="+Inf"} 2' in lines
+    assert 'gdrive_access_api_call_seconds_count{kind="files.list"} 2' in lines
+    assert 'gdrive_access_method_seconds_sum{method="say \\"hi\\""} 2.5' in lines
+
+    metrics.export(str(tmp_path / "metrics.json"), format="json")
+    with open(str(tmp_path / "metrics.json")) as f:
+        exported = json.load(f)
+    assert exported == metrics.to_json()
+    histogram = exported["histograms"][0]
+    assert histogram["buckets"] == [[0.1, 1], [1.0, 2], ["+Inf", 2]]
+    assert histogram["count"] == 2 and histogram["sum"] == pytest.approx(0.55)
+
+    metrics.export(str(tmp_path / "metrics.prom"))
+    with open(str(tmp_path / "metrics.prom")) as f:
+        assert f.read() == metrics.to_prometheus()
+    with pytest.raises(ValueError):
+        metrics.export(str(tmp_path / "metrics.txt"), format="text")
+
+
+def test_commands_record_metrics(server, tmp_path):
+    server.drive.add_folder("top")
+    write(str(tmp_path / "file"), b"contents")
+    updates = []
+    metrics = Metrics()
+    metrics.add_hook(lambda *update: updates.append(update))
+    g = commands(server, metrics=metrics)
+
+    top = g.find("top")
+    g.find("top")
+    g.upload_file(str(tmp_path / "file"), top)
+    g.download_file(g.find(top, "file"), str(tmp_path / "downloaded"))
+
+    assert metrics.counter("api_calls", kind="files.list") == server.drive.calls["files.list"]
+    assert metrics.counter("cache_hits", cache="path") == 1
+    assert metrics.counter("bytes_uploaded") == metrics.counter("bytes_downloaded") == 8
+    assert any(name == "method_seconds" and labels == {"method": "upload_file"} for _, name, _, labels in updates)
+    assert ("counter", "bytes_uploaded", 8, {}) in updates
+
+    metrics.reset()
+    assert metrics.to_json() == {"counters": [], "histograms": []}
@@ -0,0 +1,97 @@
+import time
+
+import pytest
+
+from gdrive_access.cache import PathCache
+from gdrive_access.errors import MultipleFilesError
+
+from .helpers import commands, write
+
+
+def test_find_reuses_resolved_paths(server):
+    top = server.drive.add_folder("top")
+    sub = server.drive.add_folder("sub", top["id"])
+    server.drive.add_file("file", sub["id"])
+    g = commands(server)
+
+    g.find("top", "sub", "file")
+    server.drive.reset_stats()
+    assert g.find("top", "sub", "file")["title"] == "file"
+    assert g.find("top", "sub")["title"] == "sub"
+    assert server.drive.calls["files.list"] == 0
+
+    # Only the uncached rest of a path is looked up
+    server.drive.add_file("other", sub["id"])
+    assert g.find("top", "sub", "other")["title"] == "other"
+    assert server.drive.calls["files.list"] == 1
+
+
+def test_find_without_cache(server):
+    server.drive.add_folder("top")
+    g = commands(server, cache_ttl=0)
+
+    g.find("top")
+    g.find("top")
+    assert server.drive.calls["files.list"] == 2
+
+
+def test_upload_invalidates_cached_path(server, tmp_path):
+    top = server.drive.add_folder("top")
+    server.drive.add_file("file", top["id"], content=b"old")
+    write(str(tmp_path / "file"), b"new")
+    g = commands(server)
+    folder = g.find("top")
+    g.find(folder, "file")
+
+    g.upload_file(str(tmp_path / "file"), folder)
+
+    # Both files called "file" are seen instead of the cached one
+    with pytest.raises(MultipleFilesError):
+        g.find(folder, "file")
+
+
+def test_clear_cache(server):
+    server.drive.add_folder("top")
+    g = commands(server)
+    g.find("top")
+
+    g.clear_cache()
+    server.drive.reset_stats()
+    g.find("top")
+    assert server.drive.calls["files.list"] == 1
+
+
+def test_path_cache_expires_entries():
+    cache = PathCache(ttl=0.05)
+    cache.put("root", ("a",), ("root",), "file")
+    assert cache.get("root", ("a",)) == "file"
+    time.sleep(0.1)
+    assert cache.get("root", ("a",)) is None
+    assert len(cache) == 0
+
+
+def test_path_cache_evicts_least_recently_used():
+    cache = PathCache(max_size=2)
+    cache.put("root", ("a",), ("root",), "a")
+    cache.put("root", ("b",), ("root",), "b")
+    cache.get("root", ("a",))
+    cache.put("root", ("c",), ("root",), "c")
+    assert cache.get("root", ("a",)) == "a"
+    assert cache.get("root", ("b",)) is None
+
+
+def test_path_cache_longest_prefix_and_invalidate():
+    cache = PathCache()
+    cache.put("root", ("a",), ("root",), "a")
+    cache.put("root", ("a", "b"), ("root", "id-a"), "b")
+    cache.put("root", ("a", "c"), ("root", "id-a"), "c")
+
+    assert cache.longest_prefix("root", ("a", "b", "x")) == (2, ("root", "id-a"), "b")
+    assert cache.longest_prefix("root", ("z",)) == (0, (), None)
+
+    cache.invalidate("id-a", "b")
+    assert cache.get("root", ("a", "b")) is None
+    assert cache.get("root", ("a", "c")) == "c"
+
+    cache.invalidate("root")
+    assert len(cache) == 0
@@ -0,0 +1,48 @@
+import pytest
+
+from gdrive_access import GDriveCommands, UploadAction
+from gdrive_access.errors import FileExists, MultipleFilesError
+
+from .helpers import commands, write
+
+
+@pytest.fixture
+def folder(server):
+    folder = server.drive.add_folder("dest")
+    server.drive.add_file("same", folder["id"], content=b"same")
+    server.drive.add_file("changed", folder["id"], content=b"old")
+    server.drive.add_file("twice", folder["id"], content=b"1")
+    server.drive.add_file("twice", folder["id"], content=b"2")
+    return folder
+
+
+def test_plan_upload_lists_folder_once(server, folder, tmp_path):
+    paths = []
+    for name, content in [("same", b"same"), ("changed", b"new"), ("twice", b"3"), ("new", b"new")]:
+        write(str(tmp_path / name), content)
+        paths.append(str(tmp_path / name))
+    g = commands(server)
+    dest = g.find("dest")
+
+    server.drive.reset_stats()
+    plan = g.plan_upload(paths, dest)
+
+    assert server.drive.calls["files.list"] == 1
+    assert [p.action for p in plan] == [UploadAction.SKIP, UploadAction.OVERWRITE, UploadAction.CONFLICT, UploadAction.UPLOAD]
+    assert [p.filename for p in plan.to_upload] == ["changed", "new"]
+    assert len(plan.conflicts[0].existing_files) == 2
+
+    plan = g.plan_upload(paths, dest, overwrite=GDriveCommands.Overwrite.NEVER, uploaded_names=["a", "same", "c", "d"])
+    assert [p.action for p in plan] == [UploadAction.UPLOAD, UploadAction.SKIP, UploadAction.UPLOAD, UploadAction.UPLOAD]
+
+
+def test_upload_file_follows_plan(server, folder, tmp_path):
+    write(str(tmp_path / "same"), b"same")
+    write(str(tmp_path / "twice"), b"3")
+    g = commands(server)
+    dest = g.find("dest")
+
+    with pytest.raises(FileExists):
+        g.upload_file(str(tmp_path / "same"), dest)
+    with pytest.raises(MultipleFilesError):
+        g.upload_file(str(tmp_path / "twice"), dest)
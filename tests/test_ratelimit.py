@@ -0,0 +1,104 @@
+import json
+import time
+
+import httplib2
+import pytest
+from googleapiclient import errors
+
+from gdrive_access import Metrics
+from gdrive_access.ratelimit import RequestScheduler, TokenBucket, is_rate_limit_error, is_retryable
+
+from .helpers import commands
+
+
+def http_error(status, reason):
+    content = json.dumps({"error": {"code": status, "errors": [{"reason": reason}], "message": reason}})
+    return errors.HttpError(httplib2.Response({"status": status}), content.encode())
+
+
+def test_errors_are_classified():
+    assert is_rate_limit_error(http_error(429, "rateLimitExceeded"))
+    assert is_rate_limit_error(http_error(403, "userRateLimitExceeded"))
+    assert not is_rate_limit_error(http_error(403, "insufficientFilePermissions"))
+    assert is_retryable(http_error(503, "backendError"))
+    assert is_retryable(ConnectionResetError())
+    assert not is_retryable(http_error(404, "notFound"))
+    assert not is_retryable(ValueError())
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(100, burst=1)
+    start = time.monotonic()
+    for _ in range(11):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limits_lower_the_rate_until_requests_succeed():
+    metrics = Metrics()
+    scheduler = RequestScheduler(qps=100, backoff_base=0, metrics=metrics)
+    failures = [http_error(429, "rateLimitExceeded")] * 2
+
+    def call():
+        if failures:
+            raise failures.pop()
+        return "done"
+
+    assert scheduler.call(call, kind="files.list") == "done"
+    assert scheduler.current_qps == 30
+    assert metrics.counter("retries", kind="files.list") == 2
+    assert metrics.counter("rate_limited") == 2
+    assert metrics.counter("api_calls", kind="files.list") == 3
+
+    for _ in range(20):
+        scheduler.call(lambda: None)
+    assert scheduler.current_qps == 100
+
+
+def test_retries_give_up():
+    scheduler = RequestScheduler(qps=None, max_retries=2, backoff_base=0)
+    attempts = []
+
+    def fail(error):
+        attempts.append(1)
+        raise error
+
+    with pytest.raises(errors.HttpError):
+        scheduler.call(fail, http_error(404, "notFound"))
+    assert len(attempts) == 1
+
+    with pytest.raises(errors.HttpError):
+        scheduler.call(fail, http_error(500, "backendError"))
+    assert len(attempts) == 4
+
+
+def test_inserts_are_not_retried_after_dropped_connections():
+    scheduler = RequestScheduler(qps=None, max_retries=3, backoff_base=0)
+    attempts = []
+
+    def fail():
+        attempts.append(1)
+        raise ConnectionError()
+
+    with pytest.raises(ConnectionError):
+        scheduler.call(fail, idempotent=False)
+    assert len(attempts) == 1
+
+    with pytest.raises(ConnectionError):
+        scheduler.call(fail)
+    assert len(attempts) == 5
+
+
+def test_batch_folder_creation_charges_each_request(server):
+    server.drive.add_folder("top")
+    g = commands(server, qps=1000)
+    top = g.find("top")
+    batch = g.batch()
+    for i in range(150):
+        batch.create_folder(top["id"], "folder{}".format(i))
+
+    start = time.monotonic()
+    assert all(result.ok for result in batch.execute())
+    refilled = (time.monotonic() - start) * 1000
+    assert g._scheduler._bucket._tokens <= 1000 - 1 - 150 + refilled
+    assert server.drive.calls["files.insert"] == 150
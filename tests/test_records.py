@@ -0,0 +1,46 @@
+import pickle
+
+import pytest
+
+from gdrive_access import FileRecord
+
+from .helpers import commands, read
+
+
+def test_file_record_acts_like_metadata():
+    record = FileRecord({
+        "id": "abc", "title": "file", "mimeType": "text/plain", "fileSize": "3",
+        "parents": [{"id": "folder", "isRoot": False}], "labels": {"trashed": False},
+    })
+
+    assert record["title"] == "file" and record.get("md5Checksum") is None
+    assert "fileSize" in record and "md5Checksum" not in record and "labels" not in record
+    with pytest.raises(KeyError):
+        record["md5Checksum"]
+    assert record["parents"] == [{"id": "folder"}]
+    record["title"] = "renamed"
+    with pytest.raises(KeyError):
+        record["labels"] = {}
+    assert pickle.loads(pickle.dumps(record)).metadata == record.metadata == {
+        "id": "abc", "title": "renamed", "mimeType": "text/plain", "fileSize": "3", "parents": [{"id": "folder"}]}
+    assert not hasattr(record, "__dict__")
+
+
+def test_compact_listings(server, tmp_path):
+    top = server.drive.add_folder("top")
+    sub = server.drive.add_folder("sub", top["id"])
+    server.drive.add_file("file", sub["id"], content=b"contents")
+    g = commands(server, compact_listings=True)
+
+    folder = g.find("top")
+    assert isinstance(folder, FileRecord)
+    assert all(isinstance(f, FileRecord) for f in g.ls(folder))
+    assert isinstance(g.snapshot(folder).find("sub", "file"), FileRecord)
+
+    # Records are accepted wherever files are
+    g.download_file(g.find(folder, "sub", "file"), str(tmp_path))
+    assert read(str(tmp_path / "file")) == b"contents"
+    with g.open(g.find(folder, "sub", "file")) as f:
+        assert f.read() == b"contents"
+    g.create_folder(g.find(folder, "sub"), "new")
+    assert g.exists("top", "sub", "new")
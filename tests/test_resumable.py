@@ -0,0 +1,83 @@
+import json
+import os
+
+import pytest
+
+from gdrive_access import resumable
+from gdrive_access.resumable import partial_path
+
+from .helpers import commands, read, write
+
+
+CHUNK = resumable.CHUNK_ALIGNMENT
+
+
+def test_download_continues_partial_file(server, tmp_path):
+    data = os.urandom(1000)
+    file_ = server.drive.add_file("big", content=data)
+    g = commands(server, resumable_threshold=1, chunk_size=100)
+    big = g.find("big")
+
+    # An earlier download of the same file stopped after 500 bytes
+    local_path = str(tmp_path / "big")
+    write(partial_path(local_path), data[:500])
+    with open(partial_path(local_path) + ".json", "w") as f:
+        json.dump({"id": file_["id"], "fileSize": "1000", "md5Checksum": file_["md5Checksum"]}, f)
+
+    g.download_file(big, local_path)
+
+    assert read(local_path) == data
+    assert server.drive.calls["files.get_media"] == 5
+    assert os.listdir(str(tmp_path)) == ["big"]
+
+
+def test_download_restarts_partial_file_of_other_contents(server, tmp_path):
+    data = os.urandom(1000)
+    file_ = server.drive.add_file("big", content=data)
+    g = commands(server, resumable_threshold=1, chunk_size=100)
+
+    local_path = str(tmp_path / "big")
+    write(partial_path(local_path), b"x" * 500)
+    with open(partial_path(local_path) + ".json", "w") as f:
+        json.dump({"id": file_["id"], "fileSize": "1000", "md5Checksum": "outdated"}, f)
+
+    g.download_file(g.find("big"), local_path)
+
+    assert read(local_path) == data
+    assert server.drive.calls["files.get_media"] == 10
+
+
+def test_upload_continues_session(server, tmp_path):
+    data = os.urandom(3 * CHUNK)
+    local_path = str(tmp_path / "big")
+    write(local_path, data)
+    resume_dir = str(tmp_path / "resume")
+    top = server.drive.add_folder("top")
+    g = commands(server, resumable_threshold=1, chunk_size=CHUNK, resume_dir=resume_dir)
+
+    def interrupt(uploaded, total):
+        raise ConnectionError("Interrupted after {} bytes".format(uploaded))
+
+    with pytest.raises(ConnectionError):
+        resumable.upload(g.drive, local_path, {"parents": [{"id": top["id"]}], "title": "big"},
+            chunk_size=CHUNK, resume_dir=resume_dir, callback=interrupt)
+    assert len(os.listdir(resume_dir)) == 1
+
+    result = g.upload_file(local_path, g.find("top"))
+
+    assert server.drive.calls["upload.start"] == 1
+    assert server.drive.content[result.gdrive_file["id"]] == data
+    assert os.listdir(resume_dir) == []
+
+
+def test_upload_folder_skips_partial_downloads(server, tmp_path):
+    local = tmp_path / "src"
+    write(str(local / "file"), b"contents")
+    write(partial_path(str(local / "big")), b"half")
+    write(partial_path(str(local / "big")) + ".json", b"{}")
+    server.drive.add_folder("dest")
+    g = commands(server)
+
+    report = g.upload_folder(str(local), g.find("dest"))
+
+    assert [os.path.basename(result.local_path) for result in report] == ["file"]
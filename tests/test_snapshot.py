@@ -0,0 +1,81 @@
+import pytest
+
+from gdrive_access.errors import MultipleFilesError, NotFoundError
+
+from .helpers import commands, read
+
+
+def test_snapshot_answers_without_api_calls(server):
+    top = server.drive.add_folder("top")
+    sub = server.drive.add_folder("sub", top["id"])
+    server.drive.add_file("a", top["id"], content=b"a")
+    server.drive.add_file("b", sub["id"], content=b"b")
+    elsewhere = server.drive.add_folder("elsewhere")
+    server.drive.add_file("c", elsewhere["id"], content=b"c")
+    server.drive.add_shortcut("link", elsewhere["id"], top["id"])
+    g = commands(server)
+
+    snapshot = g.snapshot("top", max_workers=4)
+    server.drive.reset_stats()
+
+    assert len(snapshot) == 5
+    assert snapshot.find("sub", "b")["fileSize"] == "1"
+    assert snapshot.find(snapshot.find("sub"), "b")["title"] == "b"
+    assert snapshot.exists("link", "c")
+    assert not snapshot.exists("sub", "missing")
+    assert sorted(f["title"] for f in snapshot.ls("sub")) == ["b"]
+    with pytest.raises(NotFoundError):
+        snapshot.ls("a")
+    walked = {path: sorted(f["title"] for f in files) for path, _, files in snapshot.walk()}
+    assert walked == {(): ["a"], ("sub",): ["b"], ("link",): ["c"]}
+    assert sum(server.drive.calls.values()) == 0
+
+
+def test_snapshot_skips_duplicate_titles_in_path_cache(server):
+    folder = server.drive.add_folder("top")
+    server.drive.add_file("same", folder["id"])
+    server.drive.add_file("same", folder["id"])
+    server.drive.add_file("unique", folder["id"])
+    g = commands(server)
+    top = g.find("top")
+
+    g.snapshot(top)
+    server.drive.reset_stats()
+    assert g.find(top, "unique")["title"] == "unique"
+    assert server.drive.calls["files.list"] == 0
+    with pytest.raises(MultipleFilesError):
+        g.find(top, "same")
+
+
+@pytest.fixture
+def duplicate_folders(server):
+    top = server.drive.add_folder("top")
+    first = server.drive.add_folder("dup", top["id"])
+    second = server.drive.add_folder("dup", top["id"])
+    server.drive.add_file("x1", first["id"], content=b"1")
+    server.drive.add_file("x2", second["id"], content=b"2")
+    return top
+
+
+def test_snapshot_keeps_contents_of_duplicate_folders(server, duplicate_folders):
+    snapshot = commands(server).snapshot("top")
+
+    walked = [(path, sorted(f["title"] for f in files)) for path, _, files in snapshot.walk()]
+    assert walked == [((), []), (("dup",), ["x1", "x2"])]
+    assert snapshot.find("dup", "x1")["fileSize"] == "1"
+    with pytest.raises(MultipleFilesError):
+        snapshot.ls("dup")
+
+
+def test_download_duplicate_folders(server, duplicate_folders, tmp_path):
+    g = commands(server)
+
+    report = g.download_folder(g.find("top"), str(tmp_path / "download"))
+    assert len(report.downloaded) == 2 and not report.failed
+    assert read(str(tmp_path / "download" / "top" / "dup" / "x1")) == b"1"
+    assert read(str(tmp_path / "download" / "top" / "dup" / "x2")) == b"2"
+
+    report = g.sync_down(g.find("top"), str(tmp_path / "sync"))
+    assert len(report.downloaded) == 2 and not report.failed
+    assert read(str(tmp_path / "sync" / "top" / "dup" / "x1")) == b"1"
+    assert read(str(tmp_path / "sync" / "top" / "dup" / "x2")) == b"2"
@@ -0,0 +1,59 @@
+import io
+import os
+
+import pytest
+
+from .helpers import commands
+
+
+@pytest.fixture
+def data(server):
+    data = os.urandom(1000)
+    file_ = server.drive.add_file("file", content=data)
+    server.drive.add_shortcut("link", file_["id"])
+    server.drive.add_file("doc", mime_type="application/vnd.google-apps.document")
+    return data
+
+
+def test_read_whole_file(server, data):
+    g = commands(server)
+    with g.open(g.find("link"), block_size=64) as f:
+        assert f.read() == data
+        f.seek(-10, io.SEEK_END)
+        assert f.read() == data[-10:]
+        assert f.read() == b""
+
+    with pytest.raises(ValueError):
+        g.open(g.find("file"), "w")
+    with pytest.raises(ValueError):
+        g.open(g.find("doc"))
+
+
+def test_blocks_are_cached_and_read_ahead(server, data):
+    g = commands(server)
+    raw = g.open(g.find("file"), block_size=100, cache_blocks=4, read_ahead=2).raw
+
+    def read(position, n):
+        raw.seek(position)
+        return raw.read(n)
+
+    # Blocks 0-2 in one request
+    assert read(10, 10) == data[10:20]
+    assert read(250, 10) == data[250:260]
+    assert server.drive.calls["files.get_media"] == 1
+
+    # Block 9 is the last one
+    assert read(950, 100) == data[950:]
+    assert server.drive.calls["files.get_media"] == 2
+
+    # Blocks 5-7, evicting the least recently used blocks 0 and 1
+    assert read(550, 200) == data[550:750]
+    assert server.drive.calls["files.get_media"] == 3
+    assert sorted(raw._blocks) == [5, 6, 7, 9]
+
+    # Blocks 3-4, as read ahead stops at the cached block 5
+    assert read(350, 10) == data[350:360]
+    assert server.drive.calls["files.get_media"] == 4
+    assert read(450, 10) == data[450:460]
+    assert server.drive.calls["files.get_media"] == 4
+    assert g.metrics.counter("bytes_downloaded") == 900
@@ -0,0 +1,94 @@
+import pytest
+
+from gdrive_access import SyncAction, SyncPlan, TransferStatus
+
+from .helpers import commands, read, write
+
+
+@pytest.fixture
+def sides(server, tmp_path):
+    """A google drive folder and a local folder that differ"""
+    remote = server.drive.add_folder("remote")
+    server.drive.add_file("same", remote["id"], content=b"same")
+    server.drive.add_file("remote only", remote["id"], content=b"remote only")
+    server.drive.add_file("changed", remote["id"], content=b"old remote", modifiedDate="2000-01-01T00:00:00.000Z")
+    sub = server.drive.add_folder("sub", remote["id"])
+    server.drive.add_file("deep", sub["id"], content=b"deep")
+    server.drive.add_folder("clash", remote["id"])
+
+    local = tmp_path / "local"
+    write(str(local / "same"), b"same")
+    write(str(local / "local only"), b"local only")
+    write(str(local / "changed"), b"new local")
+    write(str(local / "new folder" / "file"), b"new folder")
+    write(str(local / "clash"), b"file, not a folder")
+    write(str(local / ".hidden"), b"hidden")
+    return str(local)
+
+
+def actions(plan):
+    return {"/".join(item.path): item.action for item in plan}
+
+
+def test_plan_both_ways(server, sides):
+    g = commands(server)
+
+    plan = g.sync(sides, g.find("remote"), direction="both", dry_run=True)
+
+    assert isinstance(plan, SyncPlan)
+    assert actions(plan) == {
+        "remote only": SyncAction.DOWNLOAD,
+        "sub/deep": SyncAction.DOWNLOAD,
+        "local only": SyncAction.UPLOAD,
+        "new folder/file": SyncAction.UPLOAD,
+        "changed": SyncAction.UPDATE,
+        "clash": SyncAction.CONFLICT,
+    }
+    assert plan.unchanged == 1
+    assert "1 conflict" in repr(plan) and "1 unchanged" in repr(plan)
+
+    report = g.apply_sync(plan, max_workers=4)
+
+    assert len(report.failed) == 1
+    assert read(sides + "/remote only") == b"remote only"
+    assert read(sides + "/sub/deep") == b"deep"
+    g.clear_cache()
+    assert server.drive.content[g.find("remote", "new folder", "file")["id"]] == b"new folder"
+    assert server.drive.content[g.find("remote", "changed")["id"]] == b"new local"
+    # Only the conflict is left
+    assert actions(g.plan_sync(sides, g.find("remote"))) == {"clash": SyncAction.CONFLICT}
+
+
+def test_sync_up_with_deletes(server, sides):
+    g = commands(server)
+
+    plan = g.plan_sync(sides, g.find("remote"), direction="up", delete_removed=True)
+    assert actions(plan) == {
+        "remote only": SyncAction.DELETE_REMOTE,
+        "sub/deep": SyncAction.DELETE_REMOTE,
+        "local only": SyncAction.UPLOAD,
+        "new folder/file": SyncAction.UPLOAD,
+        "changed": SyncAction.UPDATE,
+        "clash": SyncAction.CONFLICT,
+    }
+
+    report = g.apply_sync(plan)
+    assert sorted(r.local_path for r in report if r.status is TransferStatus.DELETED) == [
+        sides + "/remote only", sides + "/sub/deep"]
+    g.clear_cache()
+    assert not g.exists("remote", "remote only")
+    assert g.exists("remote", "local only")
+
+
+def test_sync_down_with_deletes(server, sides):
+    g = commands(server)
+
+    report = g.sync(sides, g.find("remote"), direction="down", delete_removed=True)
+
+    assert read(sides + "/changed") == b"old remote"
+    assert read(sides + "/remote only") == b"remote only"
+    assert read(sides + "/.hidden") == b"hidden"
+    with pytest.raises(FileNotFoundError):
+        read(sides + "/local only")
+    assert len(report.failed) == 1
+    assert not g.exists("remote", "local only")
@@ -0,0 +1,100 @@
+import os
+
+from gdrive_access import TransferStatus
+
+from .helpers import commands, read
+
+
+def test_sync_down_applies_changes(server, tmp_path):
+    top = server.drive.add_folder("top")
+    sub = server.drive.add_folder("sub", top["id"])
+    moved = server.drive.add_file("moved", top["id"], content=b"moved")
+    renamed = server.drive.add_file("renamed", sub["id"], content=b"renamed")
+    trashed = server.drive.add_file("trashed", top["id"], content=b"trashed")
+    modified = server.drive.add_file("modified", sub["id"], content=b"old")
+    server.drive.add_file("unchanged", top["id"], content=b"unchanged")
+    g = commands(server)
+    folder = g.find("top")
+    local = tmp_path / "top"
+
+    report = g.sync_down(folder, str(tmp_path), max_workers=4)
+    assert len(report.downloaded) == 5
+    assert read(str(local / "sub" / "modified")) == b"old"
+
+    server.drive.update(moved["id"], {"parents": [{"id": sub["id"]}]})
+    server.drive.update(renamed["id"], {"title": "new name"})
+    server.drive.trash(trashed["id"])
+    server.drive.update(modified["id"], content=b"new")
+    new_folder = server.drive.add_folder("new folder", sub["id"])
+    server.drive.add_file("new", new_folder["id"], content=b"new file")
+    server.drive.add_file("outside", content=b"not synced")
+    server.drive.reset_stats()
+
+    report = g.sync_down(folder, str(tmp_path), max_workers=4)
+
+    by_status = {}
+    for result in report:
+        by_status.setdefault(result.status, []).append(os.path.relpath(result.local_path, str(local)))
+    assert sorted(by_status[TransferStatus.MOVED]) == [os.path.join("sub", "moved"), os.path.join("sub", "new name")]
+    assert by_status[TransferStatus.DELETED] == ["trashed"]
+    assert sorted(by_status[TransferStatus.DOWNLOADED]) == [
+        os.path.join("sub", "modified"), os.path.join("sub", "new folder", "new")]
+    assert read(str(local / "sub" / "moved")) == b"moved"
+    assert read(str(local / "sub" / "new name")) == b"renamed"
+    assert read(str(local / "sub" / "modified")) == b"new"
+    assert not (local / "moved").exists() and not (local / "trashed").exists()
+    assert not (tmp_path / "outside").exists()
+    assert server.drive.calls["changes.list"] == 1
+    assert server.drive.calls["files.get_media"] == 2
+
+    assert len(g.sync_down(folder, str(tmp_path))) == 0
+
+
+def test_sync_down_keeps_removed_files(server, tmp_path):
+    top = server.drive.add_folder("top")
+    file_ = server.drive.add_file("file", top["id"], content=b"file")
+    g = commands(server)
+    g.sync_down(g.find("top"), str(tmp_path))
+
+    server.drive.trash(file_["id"])
+    assert len(g.sync_down(g.find("top"), str(tmp_path), delete_removed=False)) == 0
+    assert read(str(tmp_path / "top" / "file")) == b"file"
+
+
+def test_sync_down_authorizes_lazily(server, tmp_path):
+    top = server.drive.add_folder("top")
+    server.drive.add_file("file", top["id"], content=b"file")
+    g = commands(server)
+    folder = g.find("top")
+
+    # As if no request had been made yet with the credentials
+    auth = g.drive.auth
+    service, auth.service = auth.service, None
+    auth.Authorize = lambda: setattr(auth, "service", service)
+
+    assert len(g.sync_down(folder, str(tmp_path)).downloaded) == 1
+    auth.service = None
+    server.drive.add_file("new", top["id"], content=b"new")
+    assert len(g.sync_down(folder, str(tmp_path)).downloaded) == 1
+
+
+def test_sync_down_retries_failed_downloads(server, tmp_path):
+    folder = server.drive.add_folder("top")
+    server.drive.add_file("good.txt", folder["id"], content=b"good")
+    bad = server.drive.add_file("bad.txt", folder["id"], content=b"")
+    # Files without contents fail with 403 fileNotDownloadable
+    del server.drive.content[bad["id"]]
+    g = commands(server)
+    top = g.find("top")
+
+    report = g.sync_down(top, str(tmp_path))
+    assert len(report.downloaded) == 1 and len(report.failed) == 1
+    assert not os.path.exists(str(tmp_path / "top" / "bad.txt"))
+
+    # Fixed without a change in the changes feed
+    server.drive._set_content(bad["id"], b"fixed")
+    report = g.sync_down(top, str(tmp_path))
+    assert len(report.downloaded) == 1
+    assert read(str(tmp_path / "top" / "bad.txt")) == b"fixed"
+
+    assert len(g.sync_down(top, str(tmp_path))) == 0
@@ -0,0 +1,79 @@
+import io
+import os
+
+import pytest
+
+from gdrive_access import GDriveCommands
+from gdrive_access.benchmark import fake_drive
+from gdrive_access.errors import FileExists
+from gdrive_access.resumable import CHUNK_ALIGNMENT
+
+from .helpers import commands
+
+
+CHUNK = CHUNK_ALIGNMENT
+
+
+def test_upload_data_from_bytes_files_and_generators(server):
+    server.drive.add_folder("top")
+    g = commands(server, chunk_size=CHUNK)
+    top = g.find("top")
+    data = os.urandom(2 * CHUNK + 100)
+
+    uploaded = [
+        g.upload_data(data, top, "bytes").gdrive_file,
+        g.upload_data(io.BytesIO(data), top, "file object").gdrive_file,
+        g.upload_data((data[i:i + 1000] for i in range(0, len(data), 1000)), top, "generator").gdrive_file,
+        g.upload_data(b"", top, "empty").gdrive_file,
+    ]
+
+    assert [server.drive.content[f["id"]] for f in uploaded] == [data, data, data, b""]
+    assert server.drive.calls["upload.start"] == 4
+    assert g.metrics.counter("bytes_uploaded") == 3 * len(data)
+
+    with pytest.raises(ValueError):
+        g.upload_data(iter([data]), top, "wrong size", size=len(data) + 1)
+
+
+def test_upload_data_checks_existing_files(server):
+    folder = server.drive.add_folder("top")
+    server.drive.add_file("file", folder["id"], content=b"same")
+    g = commands(server)
+    top = g.find("top")
+
+    with pytest.raises(FileExists):
+        g.upload_data(b"same", top, "file")
+    with pytest.raises(FileExists):
+        g.upload_data(b"different", top, "file", overwrite=GDriveCommands.Overwrite.NEVER)
+    # The size and checksum of a generator are unknown
+    g.upload_data(iter([b"same"]), top, "file")
+    assert len(g.ls(top)) == 2
+
+
+@pytest.mark.parametrize("arrived", [True, False])
+def test_upload_data_resumes_after_failed_chunk(server, monkeypatch, arrived):
+    server.drive.add_folder("top")
+    g = commands(server, chunk_size=CHUNK)
+    g._scheduler.backoff_base = 0
+    top = g.find("top")
+    data = os.urandom(4 * CHUNK)
+    dispatch = fake_drive.dispatch
+    chunks = []
+
+    def fail_second_chunk(drive, method, path, query, headers, body):
+        if method == "PUT" and body:
+            chunks.append(len(body))
+            if len(chunks) == 2:
+                if arrived:
+                    # The chunk arrived, but the response was lost
+                    dispatch(drive, method, path, query, headers, body)
+                return fake_drive._error_body(503, "backendError")
+        return dispatch(drive, method, path, query, headers, body)
+
+    monkeypatch.setattr(fake_drive, "dispatch", fail_second_chunk)
+    result = g.upload_data(io.BytesIO(data), top, "file")
+
+    assert server.drive.content[result.gdrive_file["id"]] == data
+    # Only a chunk that didn't arrive is sent again
+    assert chunks == [CHUNK] * (4 if arrived else 5)
+    assert g.metrics.counter("retries", kind="upload.stream") == 1
@@ -0,0 +1,50 @@
+import pytest
+
+from gdrive_access.errors import FolderExists
+
+from .helpers import commands, write
+
+
+def make_tree(path):
+    for i in range(5):
+        write(str(path / "file{}".format(i)), "top {}".format(i).encode())
+        write(str(path / "a" / "file{}".format(i)), "a {}".format(i).encode())
+        write(str(path / "a" / "b" / "file{}".format(i)), "b {}".format(i).encode())
+    (path / "empty").mkdir()
+
+
+def test_upload_folder_concurrently(server, tmp_path):
+    make_tree(tmp_path / "src")
+    server.drive.add_folder("dest")
+    g = commands(server)
+
+    report = g.upload_folder(str(tmp_path / "src"), g.find("dest"), max_workers=4)
+
+    assert len(report.uploaded) == 15 and not report.failed
+    g.clear_cache()
+    src = g.find("dest", "src")
+    assert sorted(f["title"] for f in g.ls(src)) == ["a", "empty"] + ["file{}".format(i) for i in range(5)]
+    b = g.find(src, "a", "b")
+    assert sorted(f["title"] for f in g.ls(b)) == ["file{}".format(i) for i in range(5)]
+    assert server.drive.content[g.find(b, "file3")["id"]] == b"b 3"
+
+    # Folders can't be uploaded into twice by accident
+    with pytest.raises(FolderExists):
+        g.upload_folder(str(tmp_path / "src"), g.find("dest"))
+
+
+def test_upload_folder_skips_unchanged_files(server, tmp_path):
+    make_tree(tmp_path / "src")
+    server.drive.add_folder("dest")
+    g = commands(server)
+    g.upload_folder(str(tmp_path / "src"), g.find("dest"), max_workers=4)
+
+    write(str(tmp_path / "src" / "a" / "file0"), b"changed")
+    write(str(tmp_path / "src" / "a" / "b" / "new"), b"new")
+    server.drive.reset_stats()
+    report = g.upload_folder(str(tmp_path / "src"), g.find("dest"), overwrite_folder=True, max_workers=4)
+
+    assert sorted(result.local_path for result in report.uploaded) == [
+        str(tmp_path / "src" / "a" / "b" / "new"), str(tmp_path / "src" / "a" / "file0")]
+    assert len(report.skipped) == 14
+    assert server.drive.calls["files.insert"] == 0
@@ -0,0 +1,60 @@
+import datetime
+
+from .helpers import commands
+
+
+def test_iter_ls_pages_and_filters(server):
+    top = server.drive.add_folder("top")
+    for i in range(25):
+        server.drive.add_file("audio{}.wav".format(i), top["id"], content=b"wav", mime_type="audio/wav")
+        server.drive.add_file("notes{}.txt".format(i), top["id"], content=b"txt", mime_type="text/plain")
+    server.drive.add_file("old.wav", top["id"], mime_type="audio/wav", modifiedDate="2000-01-01T00:00:00.000Z")
+    g = commands(server)
+    g.find("top")
+
+    server.drive.reset_stats()
+    files = list(g.iter_ls("top", page_size=10))
+    assert len(files) == 51
+    assert server.drive.calls["files.list"] == 6
+
+    wavs = list(g.iter_ls("top", mime_type="audio/wav", fields="id,fileSize"))
+    assert len(wavs) == 26
+    assert set(wavs[0].metadata) == {"id", "fileSize"}
+    assert len(list(g.iter_ls("top", mime_type=["audio/wav", "text/plain"]))) == 51
+    assert len(list(g.iter_ls("top", title_prefix="notes1", fields="id"))) == 11
+    assert len(list(g.iter_ls("top", modified_after=datetime.datetime(2001, 1, 1), mime_type="audio/wav"))) == 25
+
+
+def test_walk_filters_and_pruning(server):
+    top = server.drive.add_folder("top")
+    keep = server.drive.add_folder("keep", top["id"])
+    skip = server.drive.add_folder("skip", top["id"])
+    inner = server.drive.add_folder("inner", keep["id"])
+    server.drive.add_file("a.wav", keep["id"], mime_type="audio/wav")
+    server.drive.add_file("a.txt", keep["id"], mime_type="text/plain")
+    server.drive.add_file("b.wav", inner["id"], mime_type="audio/wav")
+    server.drive.add_file("c.wav", skip["id"], mime_type="audio/wav")
+    g = commands(server)
+
+    walked = {}
+    for path, folders, files in g.walk("top", mime_type="audio/wav"):
+        walked[path] = sorted(f["title"] for f in files)
+        folders[:] = [f for f in folders if f["title"] != "skip"]
+
+    assert walked == {(): [], ("keep",): ["a.wav"], ("keep", "inner"): ["b.wav"]}
+
+
+def test_walk_follows_shortcuts_once(server):
+    top = server.drive.add_folder("top")
+    sub = server.drive.add_folder("sub", top["id"])
+    server.drive.add_file("file", sub["id"])
+    server.drive.add_shortcut("link to sub", sub["id"], top["id"])
+    server.drive.add_shortcut("link to top", top["id"], sub["id"])
+    g = commands(server)
+    g.find("top")
+
+    server.drive.reset_stats()
+    paths = [path for path, _, _ in g.walk("top", fields="id,title")]
+
+    assert len(paths) == 2 and paths[0] == ()
+    assert server.drive.calls["files.list"] == 2